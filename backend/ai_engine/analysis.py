@@ -0,0 +1,512 @@
+"""
+Static code analysis with pluggable rules.
+
+Python files are parsed with ``ast`` and walked once; every rule registered
+for a node type sees that node along with its ancestors. TypeScript and
+JavaScript files go through a lightweight tokenizer, and token rules see
+the stream once in order. Rules are added with ``@register`` and have a
+version, and the rule set's version (their names and versions, minus
+AI_ANALYSIS_DISABLED_RULES) is part of the result cache key next to the
+content hash, so results of unchanged files are reused until a rule changes.
+"""
+import ast
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from .cache import LRUCache
+from .metrics import Counter, Histogram
+
+analysis_requests = Counter(
+    'ai_analysis_requests_total',
+    'Code analysis requests by language and result (hit, miss).',
+    ('language', 'result'),
+)
+analysis_duration = Histogram(
+    'ai_analysis_seconds',
+    'Time to analyze one file on a cache miss.',
+    ('language',),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+LANGUAGES = {
+    'python': 'python', 'py': 'python',
+    'typescript': 'typescript', 'ts': 'typescript', 'tsx': 'typescript',
+    'javascript': 'typescript', 'js': 'typescript', 'jsx': 'typescript',
+}
+
+# Where findings of each category are listed in the result, besides 'suggestions'.
+CATEGORY_KEYS = {
+    'security': 'security_issues',
+    'performance': 'performance_suggestions',
+    'smell': 'code_smells',
+}
+
+# How much each finding type lowers the maintainability score.
+PENALTIES = {'error': 0.25, 'warning': 0.08, 'suggestion': 0.03, 'optimization': 0.03}
+
+# Cyclomatic complexity at which complexity_score reaches 0.
+MAX_COMPLEXITY = 20
+
+
+class Rule:
+    """A check for one language; subclasses set name, language and version."""
+
+    name = ''
+    language = ''
+    version = 1
+    type = 'warning'
+    category = 'smell'
+    confidence = 0.8
+    message = ''
+
+    def finding(self, line: Optional[int], message: Optional[str] = None,
+                confidence: Optional[float] = None) -> Dict:
+        return {
+            'rule': self.name,
+            'type': self.type,
+            'category': self.category,
+            'message': message or self.message,
+            'line': line,
+            'confidence': self.confidence if confidence is None else confidence,
+        }
+
+
+class PythonRule(Rule):
+    """Sees the AST nodes of node_types, with their ancestors (outermost first)."""
+
+    language = 'python'
+    node_types: Tuple[type, ...] = ()
+
+    def visit(self, node: ast.AST, ancestors: List[ast.AST]) -> Iterable[Dict]:
+        return ()
+
+    def finish(self) -> Iterable[Dict]:
+        return ()
+
+
+class TokenRule(Rule):
+    """Sees every (kind, text, line) token of a TypeScript/JavaScript file in order."""
+
+    language = 'typescript'
+
+    def visit(self, index: int, tokens: List[Tuple[str, str, int]]) -> Iterable[Dict]:
+        return ()
+
+    def finish(self, tokens: List[Tuple[str, str, int]]) -> Iterable[Dict]:
+        return ()
+
+
+RULES: Dict[str, List[type]] = {}
+
+
+def register(rule: type) -> type:
+    """Class decorator adding a rule to its language's rule set."""
+    RULES.setdefault(rule.language, []).append(rule)
+    return rule
+
+
+def active_rules(language: str) -> List[Rule]:
+    disabled = set(settings.AI_ANALYSIS_DISABLED_RULES)
+    return [rule() for rule in RULES.get(language, ()) if rule.name not in disabled]
+
+
+def ruleset_version(language: str) -> str:
+    material = ','.join(sorted(f"{rule.name}:{rule.version}" for rule in active_rules(language)))
+    return hashlib.sha1(material.encode()).hexdigest()[:12]
+
+
+# Python rules
+
+def _dotted(node: ast.AST) -> str:
+    """'models.Model' for an Attribute/Name chain, '' otherwise."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return '.'.join(reversed(parts))
+    return ''
+
+
+@register
+class ModelWithoutStr(PythonRule):
+    name = 'model-without-str'
+    type = 'suggestion'
+    category = 'smell'
+    confidence = 0.8
+    message = 'Add __str__ method to model for better representation'
+    node_types = (ast.ClassDef,)
+
+    def visit(self, node, ancestors):
+        if not any(_dotted(base) in ('models.Model', 'Model') for base in node.bases):
+            return
+        if not any(isinstance(item, ast.FunctionDef) and item.name == '__str__' for item in node.body):
+            yield self.finding(node.lineno, f"Add __str__ method to {node.name} for better representation")
+
+
+@register
+class UnguardedGet(PythonRule):
+    name = 'unguarded-get'
+    confidence = 0.9
+    message = 'Consider using get_object_or_404 or try/except for .get() calls'
+    node_types = (ast.Call,)
+
+    def visit(self, node, ancestors):
+        if not (isinstance(node.func, ast.Attribute) and node.func.attr == 'get'
+                and _dotted(node.func.value).endswith('objects')):
+            return
+        # Inside a try body with a handler, the DoesNotExist case is dealt with.
+        for parent, child in zip(ancestors, ancestors[1:] + [node]):
+            if isinstance(parent, ast.Try) and parent.handlers and child in parent.body:
+                return
+        yield self.finding(node.lineno)
+
+
+@register
+class BareExcept(PythonRule):
+    name = 'bare-except'
+    confidence = 0.85
+    message = 'Catch specific exceptions instead of using a bare except'
+    node_types = (ast.ExceptHandler,)
+
+    def visit(self, node, ancestors):
+        if node.type is None:
+            yield self.finding(node.lineno)
+
+
+@register
+class MutableDefault(PythonRule):
+    name = 'mutable-default'
+    confidence = 0.9
+    message = 'Mutable default argument is shared between calls; default to None instead'
+    node_types = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+    def visit(self, node, ancestors):
+        for default in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            if isinstance(default, (ast.List, ast.Dict, ast.Set)):
+                yield self.finding(default.lineno)
+
+
+@register
+class QueryInLoop(PythonRule):
+    name = 'query-in-loop'
+    type = 'optimization'
+    category = 'performance'
+    confidence = 0.7
+    message = 'Database query inside a loop; fetch in one query or use select_related/prefetch_related'
+    node_types = (ast.Call,)
+
+    def visit(self, node, ancestors):
+        if not (isinstance(node.func, ast.Attribute) and '.objects' in f".{_dotted(node.func.value)}"):
+            return
+        # What runs per iteration: loop bodies and comprehension elements, not the iterable.
+        for parent, child in zip(ancestors, ancestors[1:] + [node]):
+            if isinstance(parent, (ast.For, ast.AsyncFor, ast.While)) and child in parent.body:
+                yield self.finding(node.lineno)
+                return
+            if isinstance(parent, (ast.ListComp, ast.SetComp, ast.GeneratorExp)) and child is parent.elt \
+                    or isinstance(parent, ast.DictComp) and child in (parent.key, parent.value):
+                yield self.finding(node.lineno)
+                return
+
+
+@register
+class DynamicExecution(PythonRule):
+    name = 'dynamic-execution'
+    type = 'error'
+    category = 'security'
+    confidence = 0.9
+    message = 'eval/exec run arbitrary code; avoid them on anything user-controlled'
+    node_types = (ast.Call,)
+
+    def visit(self, node, ancestors):
+        if isinstance(node.func, ast.Name) and node.func.id in ('eval', 'exec'):
+            yield self.finding(node.lineno)
+
+
+@register
+class HighComplexity(PythonRule):
+    name = 'high-complexity'
+    type = 'suggestion'
+    category = 'smell'
+    confidence = 0.75
+    node_types = (ast.FunctionDef, ast.AsyncFunctionDef)
+    limit = 10
+
+    def visit(self, node, ancestors):
+        complexity = function_complexity(node)
+        if complexity > self.limit:
+            yield self.finding(
+                node.lineno, f"{node.name} has cyclomatic complexity {complexity}; consider splitting it"
+            )
+
+
+BRANCHES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler, ast.IfExp, ast.With, ast.AsyncWith,
+            ast.Assert, ast.comprehension)
+
+
+def function_complexity(node: ast.AST) -> int:
+    """McCabe-style complexity of a function, not counting nested functions."""
+    complexity = 1
+    stack = list(ast.iter_child_nodes(node))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        if isinstance(child, BRANCHES) and not isinstance(child, (ast.With, ast.AsyncWith)):
+            complexity += 1
+            if isinstance(child, ast.comprehension):
+                complexity += len(child.ifs)
+        elif isinstance(child, ast.BoolOp):
+            complexity += len(child.values) - 1
+        stack.extend(ast.iter_child_nodes(child))
+    return complexity
+
+
+def analyze_python(code: str, rules: List[PythonRule]) -> Tuple[List[Dict], int]:
+    """Findings and the worst function complexity, in one walk of the tree."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return [{
+            'rule': 'syntax-error', 'type': 'error', 'category': 'smell',
+            'message': f"Syntax error: {e.msg}", 'line': e.lineno, 'confidence': 1.0,
+        }], 0
+
+    by_type: Dict[type, List[PythonRule]] = {}
+    for rule in rules:
+        for node_type in rule.node_types:
+            by_type.setdefault(node_type, []).append(rule)
+
+    findings, worst = [], 1
+    # (node, ancestors) pairs; ancestors lists are shared down each branch.
+    stack = [(tree, [])]
+    while stack:
+        node, ancestors = stack.pop()
+        for rule in by_type.get(type(node), ()):
+            findings.extend(rule.visit(node, ancestors))
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            worst = max(worst, function_complexity(node))
+        path = ancestors + [node]
+        stack.extend((child, path) for child in reversed(list(ast.iter_child_nodes(node))))
+    for rule in rules:
+        findings.extend(rule.finish())
+    return findings, worst
+
+
+# TypeScript / JavaScript
+
+TS_TOKEN_RE = re.compile(r'''
+    (?P<comment>//[^\n]*|/\*[\s\S]*?\*/)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)
+  | (?P<name>[A-Za-z_$][\w$]*)
+  | (?P<number>\d[\w.]*)
+  | (?P<op>===|!==|==|!=|=>|&&|\|\||\?\?|\?\.|\.\.\.|[^\s\w])
+''', re.VERBOSE)
+
+TS_BRANCHES = {'if', 'for', 'while', 'case', 'catch', '&&', '||', '??', '?'}
+
+
+def tokenize(code: str) -> List[Tuple[str, str, int]]:
+    """(kind, text, line) tokens; whitespace is dropped, comments are kept."""
+    tokens, line, position = [], 1, 0
+    for match in TS_TOKEN_RE.finditer(code):
+        line += code.count('\n', position, match.start())
+        tokens.append((match.lastgroup, match.group(), line))
+        line += match.group().count('\n')
+        position = match.end()
+    return tokens
+
+
+@register
+class ExplicitAny(TokenRule):
+    name = 'explicit-any'
+    confidence = 0.9
+    message = 'Avoid using "any" type, use specific types instead'
+    type_positions = {':', '<', ',', '|', '&', 'as', '='}
+
+    def visit(self, index, tokens):
+        kind, text, line = tokens[index]
+        if kind == 'name' and text == 'any' and index and tokens[index - 1][1] in self.type_positions:
+            yield self.finding(line)
+
+
+@register
+class StateWithoutEffect(TokenRule):
+    name = 'state-without-effect'
+    type = 'suggestion'
+    confidence = 0.7
+    message = 'Consider adding useEffect for side effects'
+
+    def finish(self, tokens):
+        names = {text for kind, text, _ in tokens if kind == 'name'}
+        if 'useState' in names and 'useEffect' not in names:
+            line = next(line for kind, text, line in tokens if kind == 'name' and text == 'useState')
+            yield self.finding(line)
+
+
+@register
+class EffectWithoutDependencies(TokenRule):
+    name = 'effect-without-deps'
+    type = 'optimization'
+    category = 'performance'
+    confidence = 0.75
+    message = 'useEffect without a dependency array runs after every render'
+
+    def visit(self, index, tokens):
+        kind, text, line = tokens[index]
+        if text != 'useEffect' or index + 1 >= len(tokens) or tokens[index + 1][1] != '(':
+            return
+        depth, arguments = 0, 1
+        for _, token, _ in tokens[index + 1:]:
+            if token in '([{':
+                depth += 1
+            elif token in ')]}':
+                depth -= 1
+                if depth == 0:
+                    break
+            elif token == ',' and depth == 1:
+                arguments += 1
+        if arguments == 1:
+            yield self.finding(line)
+
+
+@register
+class LooseEquality(TokenRule):
+    name = 'loose-equality'
+    confidence = 0.8
+    message = 'Use === / !== instead of == / != to avoid type coercion'
+
+    def visit(self, index, tokens):
+        kind, text, line = tokens[index]
+        if kind == 'op' and text in ('==', '!='):
+            yield self.finding(line)
+
+
+@register
+class ConsoleLog(TokenRule):
+    name = 'console-log'
+    type = 'suggestion'
+    confidence = 0.6
+    message = 'Remove console.log before shipping'
+
+    def visit(self, index, tokens):
+        if tokens[index][1] == 'console' and [text for _, text, _ in tokens[index + 1:index + 3]] == ['.', 'log']:
+            yield self.finding(tokens[index][2])
+
+
+@register
+class TsIgnore(TokenRule):
+    name = 'ts-ignore'
+    confidence = 0.8
+    message = 'Fix the type error instead of suppressing it with @ts-ignore'
+
+    def visit(self, index, tokens):
+        kind, text, line = tokens[index]
+        if kind == 'comment' and '@ts-ignore' in text:
+            yield self.finding(line)
+
+
+@register
+class DangerousHtml(TokenRule):
+    name = 'dangerous-html'
+    type = 'error'
+    category = 'security'
+    confidence = 0.9
+    message = 'dangerouslySetInnerHTML can inject scripts; sanitize the HTML or render it as text'
+
+    def visit(self, index, tokens):
+        kind, text, line = tokens[index]
+        if kind == 'name' and text == 'dangerouslySetInnerHTML':
+            yield self.finding(line)
+
+
+def analyze_tokens(code: str, rules: List[TokenRule]) -> Tuple[List[Dict], int]:
+    """Findings and the average branching per function, in one pass over the tokens."""
+    tokens = tokenize(code)
+    findings, branches, functions = [], 0, 0
+    for index, (kind, text, _) in enumerate(tokens):
+        if kind != 'comment' and text in TS_BRANCHES:
+            branches += 1
+        elif kind != 'comment' and text in ('function', '=>'):
+            functions += 1
+        for rule in rules:
+            findings.extend(rule.visit(index, tokens))
+    for rule in rules:
+        findings.extend(rule.finish(tokens))
+    return findings, 1 + round(branches / max(functions, 1))
+
+
+# Results
+
+def summarize(language: str, findings: List[Dict], complexity: int) -> Dict:
+    findings.sort(key=lambda finding: (finding['line'] or 0, finding['rule']))
+    penalty = sum(PENALTIES.get(finding['type'], 0.03) for finding in findings)
+    result = {
+        'language': language,
+        'complexity': complexity,
+        'complexity_score': round(max(0.0, 1 - (complexity - 1) / (MAX_COMPLEXITY - 1)), 2),
+        'maintainability_score': round(max(0.0, 1 - penalty), 2),
+        'security_issues': [],
+        'performance_suggestions': [],
+        'code_smells': [],
+        'suggestions': findings,
+        f'{language}_suggestions': findings,
+    }
+    for finding in findings:
+        key = CATEGORY_KEYS.get(finding['category'])
+        if key:
+            result[key].append(finding)
+    return result
+
+
+def analyze(code: str, file_type: str) -> Dict:
+    """Analyze code of file_type (e.g. 'python', 'typescript', 'tsx'), cached by content and rule set."""
+    language = LANGUAGES.get(file_type.lower().lstrip('.'))
+    if language is None:
+        return summarize(file_type, [], 1)
+
+    cache = get_analysis_cache()
+    digest = hashlib.sha256(code.encode()).hexdigest()
+    key = f"{language}:{ruleset_version(language)}:{digest}"
+    cached = cache.get(key)
+    if cached is not None:
+        analysis_requests.inc(language=language, result='hit')
+        return json.loads(cached)
+
+    analysis_requests.inc(language=language, result='miss')
+    start = time.perf_counter()
+    rules = active_rules(language)
+    if language == 'python':
+        findings, complexity = analyze_python(code, rules)
+    else:
+        findings, complexity = analyze_tokens(code, rules)
+    result = summarize(language, findings, complexity)
+    analysis_duration.observe(time.perf_counter() - start, language=language)
+    cache.set(key, json.dumps(result))
+    return result
+
+
+_analysis_cache: Optional[LRUCache] = None
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> LRUCache:
+    """Return the process-wide analysis result cache."""
+    global _analysis_cache
+    if _analysis_cache is None:
+        with _analysis_cache_lock:
+            if _analysis_cache is None:
+                _analysis_cache = LRUCache(
+                    settings.AI_ANALYSIS_CACHE_MAX_ENTRIES,
+                    settings.AI_ANALYSIS_CACHE_MAX_BYTES,
+                    settings.AI_ANALYSIS_CACHE_TTL,
+                )
+    return _analysis_cache
@@ -0,0 +1,22 @@
+"""
+App configuration for the AI engine.
+"""
+from django.apps import AppConfig
+
+
+class AiEngineConfig(AppConfig):
+    """AI engine app."""
+
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'ai_engine'
+
+    def ready(self):
+        import threading
+        from django.conf import settings
+        from . import signals  # noqa: F401
+
+        if settings.AI_LOCAL_PRELOAD:
+            # Off the startup path: loading weights can take a while.
+            from .backends import warm_local_models
+
+            threading.Thread(target=warm_local_models, name='ai-local-warm', daemon=True).start()
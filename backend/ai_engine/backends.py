@@ -0,0 +1,388 @@
+"""
+Inference backend selection and the local CPU backend.
+
+Each active AIModel chooses where it runs through
+``configuration['backend']``: ``'remote'`` (the default) calls the inference
+API, ``'local'`` runs the model in-process with transformers/torch. Local
+models are loaded once into a shared worker pool and stay warm.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+from django.conf import settings
+
+from .prefix_cache import PrefixCache, sequence_axes
+from .router import ModelRegistry, get_model_registry
+from .telemetry import observe_call, observe_payload, queue_wait
+
+logger = logging.getLogger(__name__)
+
+
+class BackendSelector:
+    """Configuration of the active AIModels, keyed by Hugging Face model id."""
+
+    def __init__(self, registry: ModelRegistry):
+        self.registry = registry
+
+    def config(self, model_name: str) -> Dict:
+        """Return the AIModel configuration for model_name ({} if unknown)."""
+        return _configuration(self.registry.models().get(model_name))
+
+    async def aconfig(self, model_name: str) -> Dict:
+        """Like config(), but refreshes off the event loop."""
+        return _configuration((await self.registry.amodels()).get(model_name))
+
+    def local_config(self, model_name: str) -> Optional[Dict]:
+        """Return the AIModel configuration if model_name runs locally."""
+        return _local(self.config(model_name))
+
+    async def alocal_config(self, model_name: str) -> Optional[Dict]:
+        """Like local_config(), but refreshes off the event loop."""
+        return _local(await self.aconfig(model_name))
+
+    def local_models(self) -> Dict[str, Dict]:
+        return {
+            model_name: _configuration(model)
+            for model_name, model in self.registry.models().items()
+            if _local(_configuration(model)) is not None
+        }
+
+
+def _configuration(model) -> Dict:
+    return (model.configuration or {}) if model is not None else {}
+
+
+def _local(configuration: Dict) -> Optional[Dict]:
+    return configuration if configuration.get('backend') == 'local' else None
+
+
+class _LoadedModel:
+    __slots__ = ('tokenizer', 'model', 'is_encoder_decoder')
+
+    def __init__(self, tokenizer, model, is_encoder_decoder):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.is_encoder_decoder = is_encoder_decoder
+
+
+class LocalBackend:
+    """Runs models in-process on CPU from a shared, warm worker pool."""
+
+    def __init__(self):
+        import torch
+
+        self.workers = settings.AI_LOCAL_WORKERS
+        num_threads = settings.AI_LOCAL_NUM_THREADS or max(1, (os.cpu_count() or 1) // self.workers)
+        torch.set_num_threads(num_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Only settable before torch starts parallel work.
+            pass
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ai-local')
+        self._models: Dict[str, _LoadedModel] = {}
+        self._load_lock = threading.Lock()
+        self.prefix_cache = None
+        if settings.AI_PREFIX_CACHE_ENABLED:
+            self.prefix_cache = PrefixCache(settings.AI_PREFIX_CACHE_MAX_BYTES)
+
+    def load(self, model_name: str, configuration: Optional[Dict] = None) -> _LoadedModel:
+        """Load (once) and return the model and tokenizer for model_name."""
+        loaded = self._models.get(model_name)
+        if loaded is not None:
+            return loaded
+
+        with self._load_lock:
+            loaded = self._models.get(model_name)
+            if loaded is None:
+                loaded = self._models[model_name] = self._load(model_name, configuration or {})
+        return loaded
+
+    def warm(self, models: Dict[str, Dict]):
+        """Load every model up front so the first request does not pay for it."""
+        for model_name, configuration in models.items():
+            try:
+                self.load(model_name, configuration)
+            except Exception as e:
+                logger.error(f"Error loading local model {model_name}: {str(e)}")
+
+    def submit(self, model_name: str, inputs: List[str], parameters: Dict,
+               configuration: Optional[Dict] = None, scope: Optional[str] = None,
+               cancelled: Optional[threading.Event] = None, operation: str = 'generate') -> Future:
+        """Run generate() on the worker pool."""
+        enqueued_at = time.perf_counter()
+
+        def run():
+            queue_wait.observe(time.perf_counter() - enqueued_at, model=model_name, operation=operation)
+            return self.generate(model_name, inputs, parameters, configuration, scope, cancelled, operation)
+
+        return self._executor.submit(run)
+
+    def generate(self, model_name: str, inputs: List[str], parameters: Dict,
+                 configuration: Optional[Dict] = None, scope: Optional[str] = None,
+                 cancelled: Optional[threading.Event] = None,
+                 operation: str = 'generate') -> List[Optional[str]]:
+        """
+        Generate continuations for a batch of prompts.
+
+        A single prompt with a scope (e.g. session and file) reuses the
+        key/value states of earlier prompts in that scope. Setting cancelled
+        stops generation after the current token.
+        """
+        import torch
+
+        loaded = self.load(model_name, configuration)
+        start = time.perf_counter()
+        if scope is not None and len(inputs) == 1:
+            encoded = self._prefill(model_name, loaded, inputs[0], scope)
+        else:
+            encoded = loaded.tokenizer(inputs, return_tensors='pt', padding=True)
+        with torch.inference_mode():
+            output = loaded.model.generate(**encoded, **self._generate_kwargs(loaded, parameters, cancelled))
+
+        output = self._new_tokens(loaded, encoded, output)
+        texts = loaded.tokenizer.batch_decode(output, skip_special_tokens=True)
+        observe_call(
+            model_name, operation, 'local', time.perf_counter() - start,
+            int((output != loaded.tokenizer.pad_token_id).sum())
+        )
+        observe_payload(
+            model_name, operation,
+            sum(len(text.encode()) for text in inputs), sum(len(text.encode()) for text in texts)
+        )
+        return [text.strip() or None for text in texts]
+
+    def stream(self, model_name: str, prompt: str, parameters: Dict,
+               configuration: Optional[Dict] = None, scope: Optional[str] = None) -> Iterator[str]:
+        """
+        Yield text for one prompt as the model produces it.
+
+        Closing the generator early stops generation after the current token.
+        """
+        import torch
+        from transformers import TextIteratorStreamer
+
+        loaded = self.load(model_name, configuration)
+        streamer = TextIteratorStreamer(
+            loaded.tokenizer, skip_prompt=True, skip_special_tokens=True,
+            timeout=settings.AI_LOCAL_TIMEOUT,
+        )
+        cancelled = threading.Event()
+        enqueued_at = time.perf_counter()
+
+        def run():
+            start = time.perf_counter()
+            queue_wait.observe(start - enqueued_at, model=model_name, operation='stream')
+            try:
+                if scope is not None:
+                    encoded = self._prefill(model_name, loaded, prompt, scope)
+                else:
+                    encoded = loaded.tokenizer([prompt], return_tensors='pt')
+                with torch.inference_mode():
+                    output = loaded.model.generate(
+                        **encoded, streamer=streamer, **self._generate_kwargs(loaded, parameters, cancelled)
+                    )
+            except BaseException:
+                # Unblock the reader; the error surfaces from future.result().
+                streamer.end()
+                raise
+            output = self._new_tokens(loaded, encoded, output)
+            observe_call(
+                model_name, 'stream', 'local', time.perf_counter() - start,
+                int((output != loaded.tokenizer.pad_token_id).sum())
+            )
+
+        future = self._executor.submit(run)
+        received = 0
+        try:
+            for text in streamer:
+                if text:
+                    received += len(text.encode())
+                    yield text
+        finally:
+            cancelled.set()
+        future.result()
+        observe_payload(model_name, 'stream', len(prompt.encode()), received)
+
+    def _prefill(self, model_name: str, loaded: _LoadedModel, prompt: str, scope: str) -> Dict:
+        """
+        Tokenize prompt and encode it up to its last token, reusing cached states.
+
+        Returns generate() inputs carrying past_key_values so generation only
+        feeds the final prompt token. Encoder-decoder models re-encode their
+        whole input, so they skip the cache.
+        """
+        import torch
+
+        encoded = loaded.tokenizer([prompt], return_tensors='pt')
+        input_ids = encoded['input_ids']
+        tokens = input_ids[0].tolist()
+        if self.prefix_cache is None or loaded.is_encoder_decoder or len(tokens) < 2:
+            return encoded
+
+        state, reused = self.prefix_cache.lookup(model_name, scope, tokens)
+        end = len(tokens) - 1
+        axes = None
+        if reused < end:
+            with torch.inference_mode():
+                output = loaded.model(input_ids=input_ids[:, reused:end], past_key_values=state, use_cache=True)
+            state = output.past_key_values
+            from_cache_class = hasattr(state, 'to_legacy_cache')
+            if from_cache_class:
+                # Tuples are never updated in place, so cached entries stay valid.
+                state = state.to_legacy_cache()
+            axes = sequence_axes(loaded.model.config.model_type, from_cache_class)
+
+        self.prefix_cache.store(model_name, scope, tokens[:end], state, axes)
+        self.prefix_cache.record_tokens(model_name, reused, len(tokens) - reused)
+        return {
+            'input_ids': input_ids,
+            'attention_mask': encoded['attention_mask'],
+            'past_key_values': state,
+        }
+
+    def _load(self, model_name: str, configuration: Dict) -> _LoadedModel:
+        import torch
+        from transformers import AutoConfig, AutoModelForCausalLM, AutoModelForSeq2SeqLM, AutoTokenizer
+
+        trust_remote_code = configuration.get('trust_remote_code', False)
+        config = AutoConfig.from_pretrained(model_name, trust_remote_code=trust_remote_code)
+        is_encoder_decoder = bool(getattr(config, 'is_encoder_decoder', False))
+        model_class = AutoModelForSeq2SeqLM if is_encoder_decoder else AutoModelForCausalLM
+
+        start = time.perf_counter()
+        tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=trust_remote_code)
+        if not is_encoder_decoder:
+            tokenizer.padding_side = 'left'
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        model = model_class.from_pretrained(
+            model_name, torch_dtype=torch.float32, low_cpu_mem_usage=True,
+            trust_remote_code=trust_remote_code,
+        )
+        model.eval()
+        if configuration.get('quantize', settings.AI_LOCAL_QUANTIZE):
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        logger.info(f"Loaded local model {model_name} in {time.perf_counter() - start:.1f}s")
+        return _LoadedModel(tokenizer, model, is_encoder_decoder)
+
+    @staticmethod
+    def _new_tokens(loaded: _LoadedModel, encoded: Dict, output):
+        if loaded.is_encoder_decoder:
+            return output
+        # Causal models echo the (left-padded) prompt before the new tokens.
+        return output[:, encoded['input_ids'].shape[1]:]
+
+    @staticmethod
+    def _generate_kwargs(loaded: _LoadedModel, parameters: Dict,
+                         cancelled: Optional[threading.Event] = None) -> Dict:
+        kwargs = {
+            'max_new_tokens': parameters.get('max_new_tokens', 100),
+            'do_sample': parameters.get('do_sample', False),
+            'pad_token_id': loaded.tokenizer.pad_token_id,
+        }
+        if cancelled is not None:
+            kwargs['stopping_criteria'] = _cancellation_criteria(cancelled)
+        if kwargs['do_sample']:
+            kwargs['temperature'] = parameters.get('temperature', 1.0)
+            if 'top_p' in parameters:
+                kwargs['top_p'] = parameters['top_p']
+        return kwargs
+
+
+def _cancellation_criteria(cancelled: threading.Event):
+    """Stopping criteria that end generate() once cancelled is set."""
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class Cancelled(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs) -> bool:
+            return cancelled.is_set()
+
+    return StoppingCriteriaList([Cancelled()])
+
+
+async def aiter_in_thread(factory: Callable[[], Iterable]) -> AsyncIterator:
+    """
+    Consume a blocking iterable on a thread and yield its items on the event loop.
+
+    If the async consumer stops early (or is cancelled), the iterable is
+    closed on its thread once it yields its next item.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def produce():
+        iterator = iter(factory())
+        try:
+            for item in iterator:
+                if stopped.is_set():
+                    break
+                put(item)
+        except BaseException as e:
+            put(e)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+            put(done)
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+    await producer
+
+
+_selector = BackendSelector(get_model_registry())
+_local_backend = None
+_local_backend_lock = threading.Lock()
+
+
+def get_backend_selector() -> BackendSelector:
+    return _selector
+
+
+def get_local_backend() -> LocalBackend:
+    """Return the process-wide local backend, creating it on first use."""
+    global _local_backend
+    if _local_backend is None:
+        with _local_backend_lock:
+            if _local_backend is None:
+                _local_backend = LocalBackend()
+    return _local_backend
+
+
+def warm_local_models():
+    """Load the local models named in settings.AI_MODELS into the shared pool."""
+    try:
+        configured = set(settings.AI_MODELS.values())
+        models = {
+            model_name: configuration
+            for model_name, configuration in _selector.local_models().items()
+            if model_name in configured
+        }
+        if models:
+            get_local_backend().warm(models)
+    except Exception as e:
+        logger.error(f"Error warming local models: {str(e)}")
@@ -0,0 +1,132 @@
+"""
+Micro-batching scheduler for code completion requests.
+
+Completions for the same model and parameters are held for at most
+AI_BATCH_MAX_WAIT_MS (or until AI_BATCH_MAX_SIZE requests are waiting) and
+then sent upstream as a single batched ``inputs`` list; results are scattered
+back to the waiting callers.
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .metrics import Histogram
+from .telemetry import queue_wait
+
+batch_size = Histogram(
+    'ai_batch_size',
+    'Number of completion requests sent per upstream call.',
+    ('model',),
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+SendBatch = Callable[[str, List[str], Dict], List[Optional[str]]]
+
+
+class _Pending:
+    __slots__ = ('inputs', 'future', 'enqueued_at')
+
+    def __init__(self, inputs: str):
+        self.inputs = inputs
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class _Queue:
+    """Pending requests sharing a model and parameters, with their collector."""
+
+    def __init__(self, model: str, parameters: Dict):
+        self.model = model
+        self.parameters = parameters
+        self.items: List[_Pending] = []
+        self.cond = threading.Condition()
+
+
+class CompletionBatcher:
+    """Collects completion requests into batches and sends them via send_batch."""
+
+    def __init__(self, send_batch: SendBatch, max_batch_size: int, max_wait: float,
+                 max_concurrency: int):
+        self.send_batch = send_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='ai-batch')
+        self._lock = threading.Lock()
+        self._queues: Dict[str, _Queue] = {}
+
+    def submit_future(self, model: str, parameters: Dict, inputs: str) -> Future:
+        """Enqueue one request and return a future for its completion."""
+        queue = self._queue_for(model, parameters)
+        pending = _Pending(inputs)
+        with queue.cond:
+            queue.items.append(pending)
+            queue.cond.notify()
+        return pending.future
+
+    def submit(self, model: str, parameters: Dict, inputs: str) -> Optional[str]:
+        return self.submit_future(model, parameters, inputs).result()
+
+    async def asubmit(self, model: str, parameters: Dict, inputs: str) -> Optional[str]:
+        return await asyncio.wrap_future(self.submit_future(model, parameters, inputs))
+
+    def _queue_for(self, model: str, parameters: Dict) -> _Queue:
+        key = json.dumps([model, parameters], sort_keys=True)
+        queue = self._queues.get(key)
+        if queue is None:
+            with self._lock:
+                queue = self._queues.get(key)
+                if queue is None:
+                    queue = self._queues[key] = _Queue(model, parameters)
+                    threading.Thread(
+                        target=self._collect, args=(queue,), name=f'ai-batch-{model}', daemon=True
+                    ).start()
+        return queue
+
+    def _collect(self, queue: _Queue):
+        while True:
+            with queue.cond:
+                while not queue.items:
+                    queue.cond.wait()
+
+                deadline = queue.items[0].enqueued_at + self.max_wait
+                while len(queue.items) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    queue.cond.wait(remaining)
+
+                batch = queue.items[:self.max_batch_size]
+                del queue.items[:self.max_batch_size]
+
+            # Send on the pool so the next batch can form while this one is in flight.
+            self._executor.submit(self._dispatch, queue, batch)
+
+    def _dispatch(self, queue: _Queue, batch: List[_Pending]):
+        # Requests cancelled while queued are dropped rather than sent.
+        batch = [pending for pending in batch if pending.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        now = time.monotonic()
+        for pending in batch:
+            queue_wait.observe(now - pending.enqueued_at, model=queue.model, operation='complete')
+        batch_size.observe(len(batch), model=queue.model)
+
+        try:
+            results = self.send_batch(queue.model, [pending.inputs for pending in batch], queue.parameters)
+        except Exception as e:
+            for pending in batch:
+                pending.future.set_exception(e)
+            return
+
+        if len(results) != len(batch):
+            error = ValueError(f"Expected {len(batch)} results from {queue.model}, got {len(results)}")
+            for pending in batch:
+                pending.future.set_exception(error)
+            return
+
+        for pending, result in zip(batch, results):
+            pending.future.set_result(result)
@@ -0,0 +1,198 @@
+"""
+Two-tier cache for model outputs keyed by prompt fingerprint.
+
+An in-process LRU bounded by entry count and bytes sits in front of Redis;
+both tiers expire entries after AI_CACHE_TTL. Only deterministic or
+low-temperature calls are cached, since sampled output at higher
+temperatures is expected to differ between calls.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from .metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+prompt_cache_requests = Counter(
+    'ai_prompt_cache_requests_total',
+    'Prompt cache lookups by model and result (hit_local, hit_remote, miss).',
+    ('model', 'result'),
+)
+
+# Seconds to skip the Redis tier after it fails.
+REDIS_RETRY_INTERVAL = 30
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Unify line endings only. Whitespace is kept: a completion prompt ends at
+    the cursor, so "def f():\n    " and "def f():" need different output.
+    """
+    return prompt.replace('\r\n', '\n').replace('\r', '\n')
+
+
+class LRUCache:
+    """Thread-safe LRU with TTL, bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        cost = len(value)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self.size += cost
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        value, _ = self._entries.pop(key)
+        self.size -= len(value)
+
+
+class PromptCache:
+    """Cache of generated text keyed on (model, normalized prompt, parameters)."""
+
+    def __init__(self):
+        self.local = LRUCache(
+            settings.AI_CACHE_MAX_ENTRIES, settings.AI_CACHE_MAX_BYTES, settings.AI_CACHE_TTL
+        )
+        self.ttl = settings.AI_CACHE_TTL
+        self.max_temperature = settings.AI_CACHE_MAX_TEMPERATURE
+        self._redis = None
+        self._redis_down_until = 0.0
+        if settings.AI_CACHE_REDIS_URL:
+            import redis
+
+            self._redis = redis.Redis.from_url(
+                settings.AI_CACHE_REDIS_URL, socket_timeout=0.1, socket_connect_timeout=0.1
+            )
+
+    def is_cacheable(self, parameters: Dict) -> bool:
+        """Greedy decoding and low-temperature sampling are cacheable."""
+        if not parameters.get('do_sample', False):
+            return True
+        return parameters.get('temperature', 1.0) <= self.max_temperature
+
+    @staticmethod
+    def fingerprint(model_name: str, prompt: str, parameters: Dict) -> str:
+        material = json.dumps(
+            [model_name, normalize_prompt(prompt), parameters], sort_keys=True, separators=(',', ':')
+        )
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def get(self, model_name: str, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is not None:
+            prompt_cache_requests.inc(model=model_name, result='hit_local')
+            return value
+
+        value = self._redis_get(key)
+        if value is not None:
+            self.local.set(key, value)
+            prompt_cache_requests.inc(model=model_name, result='hit_remote')
+            return value
+
+        prompt_cache_requests.inc(model=model_name, result='miss')
+        return None
+
+    def set(self, model_name: str, key: str, value: str):
+        self.local.set(key, value)
+        self._redis_set(key, value)
+
+    async def aget(self, model_name: str, key: str) -> Optional[str]:
+        """Like get(), but keeps the Redis round trip off the event loop."""
+        value = self.local.get(key)
+        if value is not None:
+            prompt_cache_requests.inc(model=model_name, result='hit_local')
+            return value
+        if self._redis is None:
+            prompt_cache_requests.inc(model=model_name, result='miss')
+            return None
+        return await asyncio.to_thread(self.get, model_name, key)
+
+    async def aset(self, model_name: str, key: str, value: str):
+        self.local.set(key, value)
+        if self._redis is not None:
+            await asyncio.to_thread(self._redis_set, key, value)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-model lookup counts and hit rate for this process."""
+        stats = {}
+        for labels, count in prompt_cache_requests.samples():
+            model = stats.setdefault(labels['model'], {'hit_local': 0, 'hit_remote': 0, 'miss': 0})
+            model[labels['result']] = count
+        for model in stats.values():
+            total = model['hit_local'] + model['hit_remote'] + model['miss']
+            model['hit_rate'] = (model['hit_local'] + model['hit_remote']) / total if total else 0.0
+        return stats
+
+    def _redis_available(self) -> bool:
+        return self._redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, e: Exception):
+        logger.warning(f"Prompt cache Redis tier unavailable: {str(e)}")
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+
+    def _redis_get(self, key: str) -> Optional[str]:
+        if not self._redis_available():
+            return None
+        try:
+            value = self._redis.get(f"ai:prompt:{key}")
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+        return value.decode() if value is not None else None
+
+    def _redis_set(self, key: str, value: str):
+        if not self._redis_available():
+            return
+        try:
+            self._redis.set(f"ai:prompt:{key}", value.encode(), ex=self.ttl)
+        except Exception as e:
+            self._redis_failed(e)
+
+
+_prompt_cache = None
+_prompt_cache_lock = threading.Lock()
+
+
+def get_prompt_cache() -> Optional[PromptCache]:
+    """Return the process-wide prompt cache, or None if disabled."""
+    global _prompt_cache
+    if not settings.AI_CACHE_ENABLED:
+        return None
+    if _prompt_cache is None:
+        with _prompt_cache_lock:
+            if _prompt_cache is None:
+                _prompt_cache = PromptCache()
+    return _prompt_cache
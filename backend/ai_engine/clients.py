@@ -0,0 +1,174 @@
+"""
+Pooled HTTP clients for the inference API.
+
+One keep-alive session is shared by the whole process, so generations reuse
+warm TCP/TLS connections instead of handshaking on every call. Requests that
+hit 429/503 or fail to connect are retried with jittered exponential backoff.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 503}
+
+
+def _retry_delay(attempt: int, backoff: float, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than Retry-After when present."""
+    delay = random.uniform(0, backoff * (2 ** attempt))
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), settings.HUGGINGFACE_READ_TIMEOUT))
+        except ValueError:
+            pass
+    return delay
+
+
+class InferenceClient:
+    """Thread-safe, keep-alive HTTP client for sync callers."""
+
+    def __init__(self):
+        self.timeout = (settings.HUGGINGFACE_CONNECT_TIMEOUT, settings.HUGGINGFACE_READ_TIMEOUT)
+        self.max_retries = settings.HUGGINGFACE_MAX_RETRIES
+        self.backoff = settings.HUGGINGFACE_RETRY_BACKOFF
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=settings.HUGGINGFACE_POOL_CONNECTIONS,
+            pool_maxsize=settings.HUGGINGFACE_POOL_MAXSIZE,
+            max_retries=0,
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def post(self, url: str, headers: dict, payload: dict, stream: bool = False,
+             timeout=None) -> requests.Response:
+        """POST JSON, retrying on 429/503 and connection failures."""
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(
+                    url, headers=headers, json=payload, stream=stream,
+                    timeout=timeout or self.timeout,
+                )
+            except requests.ConnectionError:
+                # Connect failures and dropped keep-alive connections; read
+                # timeouts are not retried since the upstream is busy.
+                if attempt >= self.max_retries:
+                    raise
+                delay = _retry_delay(attempt, self.backoff)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = _retry_delay(attempt, self.backoff, response.headers.get('Retry-After'))
+                response.close()
+
+            attempt += 1
+            logger.warning(f"Retrying inference request to {url} in {delay:.2f}s (attempt {attempt})")
+            time.sleep(delay)
+
+
+class AsyncInferenceClient:
+    """Keep-alive HTTP client for async callers such as WebSocket consumers."""
+
+    def __init__(self):
+        import httpx
+
+        self.max_retries = settings.HUGGINGFACE_MAX_RETRIES
+        self.backoff = settings.HUGGINGFACE_RETRY_BACKOFF
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.HUGGINGFACE_READ_TIMEOUT,
+                connect=settings.HUGGINGFACE_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.HUGGINGFACE_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HUGGINGFACE_POOL_MAXSIZE,
+            ),
+        )
+
+    async def post(self, url: str, headers: dict, payload: dict, timeout: Optional[float] = None):
+        """POST JSON, retrying on 429/503 and connection failures."""
+        import httpx
+
+        options = {}
+        if timeout:
+            options['timeout'] = httpx.Timeout(timeout, connect=settings.HUGGINGFACE_CONNECT_TIMEOUT)
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.post(url, headers=headers, json=payload, **options)
+            except (httpx.ConnectError, httpx.RemoteProtocolError):
+                if attempt >= self.max_retries:
+                    raise
+                delay = _retry_delay(attempt, self.backoff)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = _retry_delay(attempt, self.backoff, response.headers.get('Retry-After'))
+
+            attempt += 1
+            logger.warning(f"Retrying inference request to {url} in {delay:.2f}s (attempt {attempt})")
+            await asyncio.sleep(delay)
+
+
+    async def open_stream(self, url: str, headers: dict, payload: dict):
+        """
+        Send a streaming POST and return the response once headers arrive.
+
+        Retries like post() before any body is read. The caller must close
+        the response with ``await response.aclose()``.
+        """
+        import httpx
+
+        attempt = 0
+        while True:
+            request = self.client.build_request('POST', url, headers=headers, json=payload)
+            try:
+                response = await self.client.send(request, stream=True)
+            except (httpx.ConnectError, httpx.RemoteProtocolError):
+                if attempt >= self.max_retries:
+                    raise
+                delay = _retry_delay(attempt, self.backoff)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = _retry_delay(attempt, self.backoff, response.headers.get('Retry-After'))
+                await response.aclose()
+
+            attempt += 1
+            logger.warning(f"Retrying inference stream to {url} in {delay:.2f}s (attempt {attempt})")
+            await asyncio.sleep(delay)
+
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_inference_client() -> InferenceClient:
+    """Return the process-wide sync client."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = InferenceClient()
+    return _client
+
+
+def get_async_inference_client() -> AsyncInferenceClient:
+    """Return the async client bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncInferenceClient()
+    return client
@@ -0,0 +1,220 @@
+"""
+Token-budgeted prompts.
+
+Contexts longer than a model's input budget (AIModel.configuration
+["max_input_tokens"], else AI_CONTEXT_MAX_TOKENS) are cut down line by line:
+the cursor line and the lines nearest before it come first, then imports
+and symbol definitions from above the kept window, then a little of what
+follows the cursor. The window start moves in steps of WINDOW_ALIGN lines,
+so consecutive keystrokes keep the same prefix and local prefix reuse still
+hits. Generation prompts may also get related examples from the retrieval
+index in front. Tokenizers are loaded once per model; without transformers
+(or when AI_CONTEXT_HF_TOKENIZERS is off) an approximate tokenizer is used.
+"""
+import logging
+import re
+import threading
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+input_tokens = Histogram(
+    'ai_input_tokens',
+    'Prompt tokens sent per call after trimming.',
+    ('model', 'operation'),
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+trimmed_tokens = Counter(
+    'ai_context_trimmed_tokens_total',
+    'Prompt tokens dropped to fit the input budget.',
+    ('model', 'operation'),
+)
+
+# The window start snaps to multiples of this many lines.
+WINDOW_ALIGN = 16
+
+# Shares of the budget for imports/definitions above the window and for
+# lines after the cursor.
+STRUCTURE_SHARE = 0.25
+SUFFIX_SHARE = 0.1
+
+# Share of the budget retrieved examples may take in generation prompts.
+EXAMPLE_SHARE = 0.3
+
+IMPORT_RE = re.compile(
+    r'^\s*(?:import\s|from\s+\S+\s+import\s|#include\b|using\s|require\(|'
+    r'(?:const|let|var)\s+\S+\s*=\s*require\()'
+)
+DEFINITION_RE = re.compile(
+    r'^\s*(?:(?:export\s+)?(?:default\s+)?(?:async\s+)?(?:def|class|function|interface|enum|struct|fn|func)\s|'
+    r'(?:export\s+)?type\s+\w+\s*=|(?:export\s+)?(?:const|let)\s+\w+\s*=\s*(?:async\s*)?\(|@\w+)'
+)
+PIECE_RE = re.compile(r'\w+|[^\w\s]|\s+')
+
+
+class ApproximateTokenizer:
+    """Counts words, punctuation and whitespace runs as tokens."""
+
+    def count(self, texts: List[str]) -> List[int]:
+        return [len(PIECE_RE.findall(text)) for text in texts]
+
+    def skip(self, text: str, tokens: int) -> str:
+        return ''.join(PIECE_RE.findall(text)[tokens:])
+
+    def tail(self, text: str, tokens: int) -> str:
+        pieces = PIECE_RE.findall(text)
+        return ''.join(pieces[-tokens:]) if tokens else ''
+
+
+class ModelTokenizer:
+    """A Hugging Face tokenizer behind the same interface."""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def count(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False)['input_ids']
+        return [len(ids) for ids in encoded]
+
+    def skip(self, text: str, tokens: int) -> str:
+        ids = self.tokenizer(text, add_special_tokens=False)['input_ids']
+        return self.tokenizer.decode(ids[tokens:], skip_special_tokens=True)
+
+    def tail(self, text: str, tokens: int) -> str:
+        ids = self.tokenizer(text, add_special_tokens=False)['input_ids']
+        return self.tokenizer.decode(ids[-tokens:], skip_special_tokens=True) if tokens else ''
+
+
+_tokenizers: Dict[str, object] = {}
+_tokenizers_lock = threading.Lock()
+
+
+def get_tokenizer(model_name: str):
+    """Return the cached tokenizer for model_name, loading it on first use."""
+    tokenizer = _tokenizers.get(model_name)
+    if tokenizer is not None:
+        return tokenizer
+
+    with _tokenizers_lock:
+        tokenizer = _tokenizers.get(model_name)
+        if tokenizer is None:
+            tokenizer = _tokenizers[model_name] = _load_tokenizer(model_name)
+    return tokenizer
+
+
+def _load_tokenizer(model_name: str):
+    if not settings.AI_CONTEXT_HF_TOKENIZERS:
+        return ApproximateTokenizer()
+    try:
+        from transformers import AutoTokenizer
+
+        return ModelTokenizer(AutoTokenizer.from_pretrained(model_name, use_fast=True))
+    except Exception as e:
+        logger.warning(f"Using approximate token counts for {model_name}: {str(e)}")
+        return ApproximateTokenizer()
+
+
+class PromptContext:
+    """A prompt trimmed to its model's budget, with its token counts."""
+
+    __slots__ = ('text', 'input_tokens', 'original_tokens')
+
+    def __init__(self, text: str, input_tokens: int, original_tokens: int):
+        self.text = text
+        self.input_tokens = input_tokens
+        self.original_tokens = original_tokens
+
+    @property
+    def trimmed(self) -> bool:
+        return self.input_tokens < self.original_tokens
+
+    def usage(self) -> Dict[str, int]:
+        return {'input_tokens': self.input_tokens, 'context_tokens': self.original_tokens}
+
+
+def build_context(text: str, budget: int, tokenizer, cursor_line: Optional[int] = None) -> PromptContext:
+    """Trim text to at most budget tokens around cursor_line (default: the last line)."""
+    lines = text.split('\n')
+    counts = tokenizer.count([line + '\n' for line in lines])
+    total = sum(counts)
+    if total <= budget:
+        return PromptContext(text, total, total)
+
+    cursor = len(lines) - 1 if cursor_line is None else max(0, min(cursor_line, len(lines) - 1))
+    if counts[cursor] >= budget:
+        # A single huge line: keep its end, next to the cursor.
+        tail = tokenizer.tail(lines[cursor], budget)
+        return PromptContext(tail, tokenizer.count([tail])[0], total)
+
+    imports = [i for i in range(cursor) if IMPORT_RE.match(lines[i])]
+    definitions = [i for i in range(cursor) if DEFINITION_RE.match(lines[i]) and i not in imports]
+    reserve = min(sum(counts[i] for i in imports + definitions), int(budget * STRUCTURE_SHARE))
+
+    # Lines after the cursor, nearest first.
+    end, used = cursor + 1, counts[cursor]
+    suffix_budget = int(budget * SUFFIX_SHARE)
+    while end < len(lines) and used + counts[end] - counts[cursor] <= suffix_budget:
+        used += counts[end]
+        end += 1
+
+    # Lines before the cursor, as many as fit.
+    start = cursor
+    while start > 0 and used + counts[start - 1] <= budget - reserve:
+        start -= 1
+        used += counts[start]
+    # Snap the start forward so the prefix stays put while the user types.
+    aligned = -(-start // WINDOW_ALIGN) * WINDOW_ALIGN
+    if start > 0 and aligned < cursor:
+        used -= sum(counts[start:aligned])
+        start = aligned
+
+    # Imports, then the definitions nearest the window, within the reserve
+    # only, so they don't change as the window grows or shrinks.
+    kept, structure_used = [], 0
+    for i in imports + sorted(definitions, key=lambda i: -i):
+        if i < start and structure_used + counts[i] <= reserve:
+            kept.append(i)
+            structure_used += counts[i]
+    kept = sorted(kept) + list(range(start, end))
+
+    trimmed = '\n'.join(lines[i] for i in kept)
+    return PromptContext(trimmed, tokenizer.count([trimmed])[0], total)
+
+
+def add_examples(prompt: PromptContext, examples: List[str], budget: int, tokenizer) -> PromptContext:
+    """Put the examples that fit in the rest of budget in front of prompt, best first."""
+    room = min(budget - prompt.input_tokens, int(budget * EXAMPLE_SHARE))
+    blocks = []
+    for example in examples:
+        block = f"Example:\n{example.strip()}\n\n"
+        cost = tokenizer.count([block])[0]
+        if cost <= room:
+            blocks.append(block)
+            room -= cost
+    if not blocks:
+        return prompt
+    text = ''.join(blocks) + prompt.text
+    added = tokenizer.count([text])[0] - prompt.input_tokens
+    return PromptContext(text, prompt.input_tokens + added, prompt.original_tokens + added)
+
+
+def strip_prompt(generated: str, prompt: str, tokenizer) -> str:
+    """
+    Remove the echoed prompt from generated text.
+
+    The echo is cut by character offset when it matches exactly, otherwise
+    by the prompt's token count; text that doesn't start with the prompt's
+    first line is returned as is.
+    """
+    if generated.startswith(prompt):
+        return generated[len(prompt):]
+    first_line = prompt.lstrip().split('\n', 1)[0].strip()
+    if not first_line or not generated.lstrip().startswith(first_line):
+        return generated
+    return tokenizer.skip(generated, tokenizer.count([prompt])[0])
@@ -0,0 +1,332 @@
+"""
+Near-duplicate detection for TrainingData.
+
+Snippets are compared after normalization: comments and whitespace are
+dropped and the names a snippet binds itself (definitions, assignment
+targets, parameters, loop variables) are renamed in order of first
+appearance, so reformatted or renamed copies give the same token stream.
+Identical streams share a fingerprint. Similar ones are found through
+MinHash signatures over token shingles, whose LSH bands are stored in
+TrainingDataBand, and confirmed when the estimated Jaccard similarity
+reaches AI_DEDUP_THRESHOLD. A duplicate is merged into the row it matches
+by adding to that row's usage_count.
+
+Inserts through ingest() (which TrainingDataSerializer uses) are checked
+when they happen, serialized per fingerprint and band on PostgreSQL so
+concurrent copies of one snippet cannot both be created. Rows created any other way, such as with the ORM directly
+or from fixtures, are only signed by the post_save hook; the
+dedup_training_data command is what merges those.
+"""
+import hashlib
+import keyword
+import re
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+from .metrics import Counter
+from .models import TrainingData, TrainingDataBand
+
+ingested = Counter(
+    'ai_training_data_ingested_total',
+    'TrainingData inserts by result (created, merged).',
+    ('result',),
+)
+
+PRIME = (1 << 31) - 1
+
+STRING = r'"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`'
+TOKEN = r'(?P<name>[A-Za-z_$][\w$]*)|(?P<other>\d[\w.]*|[^\s\w])'
+PYTHON_TOKEN_RE = re.compile(rf'(?P<string>{STRING})|(?P<comment>#[^\n]*)|{TOKEN}')
+C_STYLE_TOKEN_RE = re.compile(rf'(?P<string>{STRING})|(?P<comment>//[^\n]*|/\*[\s\S]*?\*/|#[^\n]*)|{TOKEN}')
+
+# Tokens after which the next name is bound by the snippet itself.
+BINDERS = {
+    'def', 'class', 'function', 'const', 'let', 'var', 'as', 'for', 'interface', 'type', 'enum',
+    'lambda', 'struct', 'fn', 'func',
+}
+
+
+def tokens(content: str, language: str = '') -> List[str]:
+    """The normalized token stream of content."""
+    pattern = PYTHON_TOKEN_RE if language.lower() == 'python' else C_STYLE_TOKEN_RE
+    stream = []
+    for match in pattern.finditer(content):
+        if match.lastgroup != 'comment':
+            stream.append(match.group())
+
+    bound = set()
+    depth, in_signature = 0, False
+    for index, token in enumerate(stream):
+        previous = stream[index - 1] if index else ''
+        following = stream[index + 1] if index + 1 < len(stream) else ''
+        if token in ('def', 'function', 'lambda', 'fn', 'func'):
+            in_signature, depth = True, 0
+        elif in_signature and token in '([':
+            depth += 1
+        elif in_signature and token in ')]':
+            depth -= 1
+            in_signature = depth > 0
+        elif in_signature and token == ':' and depth == 0:
+            in_signature = False  # lambda parameters end here
+        if not _is_name(token):
+            continue
+        if previous in BINDERS:
+            bound.add(token)
+        elif following == '=' and index + 2 < len(stream) and stream[index + 2] != '=':
+            # In "x: int = 5" the target is x, not the annotation.
+            target = _annotated_name(stream, index)
+            bound.add(token if target is None else stream[target])
+        elif in_signature and previous in ('(', ',', '*', 'lambda') and depth <= 1:
+            bound.add(token)
+
+    names: Dict[str, str] = {}
+    return [names.setdefault(token, f"v{len(names)}") if token in bound else token for token in stream]
+
+
+def _is_name(token: str) -> bool:
+    return token[0].isalpha() or token[0] in '_$'
+
+
+def _annotated_name(stream: List[str], index: int) -> Optional[int]:
+    """Index of the name annotated by a type annotation ending at index, if it is one."""
+    start = index
+    while start > 0 and (_is_name(stream[start - 1]) or stream[start - 1] in '.[],|'):
+        start -= 1
+    if start < 2 or stream[start - 1] != ':' or not _is_name(stream[start - 2]) \
+            or keyword.iskeyword(stream[start - 2]):
+        return None
+    # Not "if x: y = 1", "for a in b: c = 1" or "if a.b: c = 1".
+    before = stream[start - 3] if start >= 3 else ''
+    if before == '.' or keyword.iskeyword(before) and before not in ('True', 'False', 'None'):
+        return None
+    return start - 2
+
+
+def fingerprint(stream: List[str]) -> str:
+    return hashlib.sha256(' '.join(stream).encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _permutations() -> Tuple[np.ndarray, np.ndarray]:
+    # Fixed seed: stored signatures must stay comparable across processes.
+    rng = np.random.default_rng(1)
+    count = settings.AI_DEDUP_PERMUTATIONS
+    return (rng.integers(1, PRIME, count, dtype=np.uint64).reshape(-1, 1),
+            rng.integers(0, PRIME, count, dtype=np.uint64).reshape(-1, 1))
+
+
+def minhash(stream: List[str]) -> np.ndarray:
+    """MinHash signature of the token shingles of stream."""
+    size = settings.AI_DEDUP_SHINGLE_SIZE
+    shingles = {
+        zlib.crc32('\x00'.join(stream[i:i + size]).encode())
+        for i in range(max(1, len(stream) - size + 1))
+    }
+    values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles)).reshape(1, -1)
+    a, b = _permutations()
+    return ((a * values + b) % PRIME).min(axis=1).astype(np.uint32)
+
+
+def signature(content: str, language: str = '') -> Tuple[str, np.ndarray]:
+    """(fingerprint, MinHash signature) of content."""
+    stream = tokens(content, language)
+    return fingerprint(stream), minhash(stream)
+
+
+def bands(signature: np.ndarray) -> List[str]:
+    """The LSH band keys of a signature."""
+    rows = len(signature) // settings.AI_DEDUP_BANDS
+    keys = []
+    for band in range(settings.AI_DEDUP_BANDS):
+        digest = hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8)
+        keys.append(f"{band:02d}{digest.hexdigest()}")
+    return keys
+
+
+def similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    if len(first) != len(second):
+        return 0.0
+    return float(np.mean(first == second))
+
+
+def load_signature(value) -> Optional[np.ndarray]:
+    if value is None:
+        return None
+    return np.frombuffer(bytes(value), dtype=np.uint32)
+
+
+def find_duplicate(digest: str, signature: np.ndarray, threshold: Optional[float] = None,
+                   exclude=None) -> Optional[TrainingData]:
+    """The stored row content with this fingerprint or signature duplicates, if any."""
+    threshold = settings.AI_DEDUP_THRESHOLD if threshold is None else threshold
+    exact = TrainingData.objects.filter(fingerprint=digest).exclude(pk=exclude).first()
+    if exact is not None:
+        return exact
+
+    candidates = (
+        TrainingDataBand.objects.filter(band__in=bands(signature)).exclude(training_data_id=exclude)
+        .values_list('training_data_id', flat=True).distinct()[:settings.AI_DEDUP_MAX_CANDIDATES]
+    )
+    best, best_score = None, threshold
+    for row in TrainingData.objects.filter(id__in=list(candidates)):
+        score = similarity(signature, load_signature(row.minhash))
+        if score >= best_score:
+            best, best_score = row, score
+    return best
+
+
+def ingest(content: str, data_type: str, language: str, tags: Optional[List] = None,
+           quality_score: float = 0.0) -> Tuple[TrainingData, bool]:
+    """
+    Store a snippet unless a near-duplicate exists; returns (row, created).
+
+    A duplicate bumps the matching row's usage_count and keeps the higher
+    quality_score instead of adding a row.
+    """
+    digest, signature_value = signature(content, language)
+    with transaction.atomic():
+        _lock_keys([digest] + bands(signature_value))
+        duplicate = find_duplicate(digest, signature_value)
+        if duplicate is not None:
+            TrainingData.objects.filter(pk=duplicate.pk).update(
+                usage_count=F('usage_count') + 1,
+                quality_score=Greatest('quality_score', Value(float(quality_score))),
+            )
+            duplicate.refresh_from_db(fields=['usage_count', 'quality_score'])
+            ingested.inc(result='merged')
+            return duplicate, False
+
+        row = TrainingData.objects.create(
+            data_type=data_type, content=content, language=language, tags=tags or [],
+            quality_score=quality_score, fingerprint=digest, minhash=signature_value.tobytes(),
+        )
+        _save_bands(row.pk, signature_value)
+    ingested.inc(result='created')
+    return row, True
+
+
+def _lock_keys(keys: List[str]):
+    """
+    Hold transaction-scoped advisory locks on keys until commit.
+
+    Any row ingest() could match shares the fingerprint or a band with the
+    new one, so locking both makes the check and the insert atomic across
+    processes. Locks are taken in a fixed order to avoid deadlocks. Other
+    databases (SQLite in development) go without; a duplicate that slips
+    through there is merged by the dedup_training_data command.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    ids = sorted({int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big', signed=True)
+                  for key in keys})
+    with connection.cursor() as cursor:
+        for lock_id in ids:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [lock_id])
+
+
+def store_signature(row: TrainingData):
+    """(Re)compute the fingerprint, signature and bands of a saved row."""
+    digest, signature_value = signature(row.content, row.language)
+    with transaction.atomic():
+        TrainingData.objects.filter(pk=row.pk).update(fingerprint=digest, minhash=signature_value.tobytes())
+        TrainingDataBand.objects.filter(training_data_id=row.pk).delete()
+        _save_bands(row.pk, signature_value)
+    row.fingerprint, row.minhash = digest, signature_value.tobytes()
+
+
+def _save_bands(pk, signature_value: np.ndarray):
+    TrainingDataBand.objects.bulk_create(
+        [TrainingDataBand(band=key, training_data_id=pk) for key in bands(signature_value)]
+    )
+
+
+def sign_missing(chunk_size: int = 1000, everything: bool = False) -> int:
+    """Store signatures for rows without one (or for every row), a chunk at a time."""
+    signed, last = 0, None
+    rows = TrainingData.objects.order_by('pk').only('id', 'content', 'language')
+    if not everything:
+        rows = rows.filter(minhash__isnull=True)
+    while True:
+        chunk = list((rows.filter(pk__gt=last) if last is not None else rows)[:chunk_size])
+        if not chunk:
+            return signed
+        for row in chunk:
+            store_signature(row)
+        signed += len(chunk)
+        last = chunk[-1].pk
+
+
+def deduplicate(chunk_size: int = 1000, threshold: Optional[float] = None,
+                dry_run: bool = False) -> Dict[str, int]:
+    """
+    Merge near-duplicate rows that share an LSH band.
+
+    Buckets are read a page at a time in band order, so memory is bounded by
+    chunk_size and AI_DEDUP_MAX_CANDIDATES whatever the table size. Within a
+    bucket, rows are kept best first (quality_score, usage_count, age) and
+    each later row matching a kept one is merged into it.
+    """
+    threshold = settings.AI_DEDUP_THRESHOLD if threshold is None else threshold
+    stats = {'signed': sign_missing(chunk_size), 'buckets': 0, 'merged': 0}
+    # A dry run deletes nothing, so the same pair shows up in several buckets.
+    skipped = set() if dry_run else None
+    last = ''
+    while True:
+        page = list(
+            TrainingDataBand.objects.filter(band__gt=last).values('band').annotate(rows=Count('id'))
+            .filter(rows__gt=1).order_by('band').values_list('band', flat=True)[:chunk_size]
+        )
+        if not page:
+            return stats
+        for band in page:
+            stats['buckets'] += 1
+            stats['merged'] += _merge_bucket(band, threshold, skipped)
+        last = page[-1]
+
+
+def _merge_bucket(band: str, threshold: float, skipped: Optional[set]) -> int:
+    ids = TrainingDataBand.objects.filter(band=band).values_list('training_data_id', flat=True)
+    rows = TrainingData.objects.filter(id__in=list(ids[:settings.AI_DEDUP_MAX_CANDIDATES])).order_by(
+        '-quality_score', '-usage_count', 'created_at'
+    ).only('id', 'usage_count', 'minhash')
+
+    kept: List[Tuple[TrainingData, np.ndarray, int]] = []
+    merged = []
+    for row in rows:
+        signature_value = load_signature(row.minhash)
+        if signature_value is None or (skipped is not None and row.pk in skipped):
+            continue
+        for index, (target, target_signature, added) in enumerate(kept):
+            if similarity(signature_value, target_signature) >= threshold:
+                # The duplicate row counts as one more use, on top of its own.
+                kept[index] = (target, target_signature, added + row.usage_count + 1)
+                merged.append(row.pk)
+                break
+        else:
+            kept.append((row, signature_value, 0))
+
+    if skipped is not None:
+        skipped.update(merged)
+    elif merged:
+        with transaction.atomic():
+            for target, _, added in kept:
+                if added:
+                    TrainingData.objects.filter(pk=target.pk).update(usage_count=F('usage_count') + added)
+            TrainingData.objects.filter(pk__in=merged).delete()
+    return len(merged)
+
+
+def needs_signature(row: TrainingData) -> bool:
+    """True if row was saved without a signature or its content changed since."""
+    if row.minhash is None:
+        return True
+    return row.fingerprint != fingerprint(tokens(row.content, row.language))
+
@@ -0,0 +1,235 @@
+"""
+Local stand-in for the Hugging Face inference API.
+
+Serves ``POST /models/<model id>`` with a canned completion so benchmarks can
+exercise the AI path without the real service. Latency is drawn per request
+from a fixed, lognormal or exponential distribution around ``latency``, a
+share of requests can fail with HTTP 500, and ``"stream": true`` requests
+get server-sent token events. Uses only the standard library and can be run
+on its own::
+
+    python -m ai_engine.fake_inference --port 8765 --latency 0.05 --distribution lognormal
+"""
+import argparse
+import json
+import math
+import random
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+COMPLETION = "\n    return None\n"
+COMPLETION_TOKENS = ["\n", "    ", "return", " None", "\n"]
+
+DISTRIBUTIONS = ('fixed', 'lognormal', 'exponential')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, a keep-alive
+    # client's delayed ACK holds the second one back by ~40ms.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.stats_increment('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': 'Invalid JSON'})
+            return
+
+        self.server.stats_increment('requests')
+        self.server.enter()
+        try:
+            delay = self.server.sample_latency()
+            if delay:
+                time.sleep(delay)
+            if self.server.should_fail():
+                self.server.stats_increment('errors')
+                self._send_json(500, {'error': 'Injected failure'})
+                return
+            if payload.get('stream'):
+                self._send_stream(payload.get('inputs', ''))
+                return
+        finally:
+            self.server.exit()
+
+        inputs = payload.get('inputs', '')
+        if isinstance(inputs, list):
+            # Batched calls get one list of generations per input.
+            self._send_json(200, [[self._generation(text)] for text in inputs])
+        else:
+            self._send_json(200, [self._generation(inputs)])
+
+    @staticmethod
+    def _generation(inputs: str) -> dict:
+        return {
+            'generated_text': f"{inputs}{COMPLETION}",
+            'details': {'generated_tokens': len(COMPLETION_TOKENS)},
+        }
+
+    def _send_stream(self, inputs: str):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for index, text in enumerate(COMPLETION_TOKENS):
+            if index and self.server.token_latency:
+                time.sleep(self.server.token_latency)
+            event = {'token': {'id': index, 'text': text, 'special': False}}
+            if index == len(COMPLETION_TOKENS) - 1:
+                event['generated_text'] = COMPLETION
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+        self._write_chunk(b'')
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open hundreds of connections at once.
+    request_queue_size = 1024
+
+    def __init__(self, address, latency: float, distribution: str = 'fixed', sigma: float = 0.5,
+                 error_rate: float = 0.0, token_latency: float = 0.0, seed: Optional[int] = None):
+        super().__init__(address, _Handler)
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}")
+        self.latency = latency
+        self.distribution = distribution
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.token_latency = token_latency
+        self.stats = {'connections': 0, 'requests': 0, 'errors': 0, 'in_flight': 0, 'peak_in_flight': 0}
+        self._stats_lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def sample_latency(self) -> float:
+        """Seconds to wait: latency itself, or drawn with that median (lognormal) or mean (exponential)."""
+        if not self.latency:
+            return 0.0
+        with self._random_lock:
+            if self.distribution == 'lognormal':
+                return self._random.lognormvariate(math.log(self.latency), self.sigma)
+            if self.distribution == 'exponential':
+                return self._random.expovariate(1 / self.latency)
+        return self.latency
+
+    def should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+    def stats_increment(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def enter(self):
+        with self._stats_lock:
+            self.stats['in_flight'] += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+
+    def exit(self):
+        with self._stats_lock:
+            self.stats['in_flight'] -= 1
+
+
+class FakeInferenceServer:
+    """Threaded fake inference server, optionally behind TLS."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 certfile: Optional[str] = None, keyfile: Optional[str] = None,
+                 distribution: str = 'fixed', sigma: float = 0.5, error_rate: float = 0.0,
+                 token_latency: float = 0.0, seed: Optional[int] = None):
+        self._server = _Server((host, port), latency, distribution, sigma, error_rate, token_latency, seed)
+        self.scheme = 'http'
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+            self.scheme = 'https'
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as HUGGINGFACE_API_URL."""
+        host, port = self._server.server_address[:2]
+        return f"{self.scheme}://{host}:{port}/models"
+
+    @property
+    def stats(self) -> dict:
+        """Connections accepted, requests served and failed, and concurrent requests (current and peak)."""
+        with self._server._stats_lock:
+            return dict(self._server.stats)
+
+    def reset_stats(self):
+        with self._server._stats_lock:
+            for name in self._server.stats:
+                self._server.stats[name] = 0
+
+    def start(self) -> 'FakeInferenceServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='fixed')
+    parser.add_argument('--sigma', type=float, default=0.5, help='Shape of the lognormal distribution.')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--token-latency', type=float, default=0.0,
+                        help='Seconds between streamed tokens.')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--certfile')
+    parser.add_argument('--keyfile')
+    args = parser.parse_args()
+
+    server = FakeInferenceServer(
+        args.host, args.port, args.latency, args.certfile, args.keyfile,
+        distribution=args.distribution, sigma=args.sigma, error_rate=args.error_rate,
+        token_latency=args.token_latency, seed=args.seed,
+    )
+    print(f"Serving fake inference API at {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
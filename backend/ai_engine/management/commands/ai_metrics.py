@@ -0,0 +1,166 @@
+"""
+Print a live summary of the AI call telemetry of a running server.
+"""
+import re
+import time
+from collections import defaultdict
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_engine.metrics import bucket_quantile
+
+SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+LABEL_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+# Histograms shown in the table, with the unit their quantiles are printed in.
+SUMMARY_HISTOGRAMS = (
+    ('ai_queue_wait_seconds', 'ms'),
+    ('ai_call_duration_seconds', 'ms'),
+    ('ai_time_to_first_token_seconds', 'ms'),
+    ('ai_output_tokens_per_second', 'tok/s'),
+    ('ai_payload_bytes', 'B'),
+    ('ai_retrieval_query_seconds', 'ms'),
+    ('ai_analysis_seconds', 'ms'),
+)
+
+
+def parse_exposition(text):
+    """
+    Parse Prometheus text into histograms and counters.
+
+    Histograms map name -> labels -> (bounds, per-bucket counts); counters
+    map name -> labels -> value. Labels are sorted (name, value) tuples.
+    """
+    buckets = defaultdict(lambda: defaultdict(list))
+    counters = defaultdict(dict)
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        match = SAMPLE_RE.match(line)
+        if not match:
+            continue
+        name, raw_labels, value = match.groups()
+        labels = {
+            key: val.replace('\\"', '"').replace('\\n', '\n').replace('\\\\', '\\')
+            for key, val in LABEL_RE.findall(raw_labels or '')
+        }
+        if name.endswith('_bucket') and 'le' in labels:
+            bound = float(labels.pop('le'))
+            buckets[name[:-len('_bucket')]][tuple(sorted(labels.items()))].append((bound, float(value)))
+        elif name.endswith('_total'):
+            counters[name][tuple(sorted(labels.items()))] = float(value)
+
+    histograms = {}
+    for name, series in buckets.items():
+        histograms[name] = {}
+        for labels, cumulative in series.items():
+            cumulative.sort()
+            bounds = tuple(bound for bound, _ in cumulative[:-1])
+            counts, previous = [], 0.0
+            for _, running in cumulative:
+                counts.append(running - previous)
+                previous = running
+            histograms[name][labels] = (bounds, counts)
+    return histograms, counters
+
+
+class Command(BaseCommand):
+    help = 'Scrape the AI metrics endpoint and print a refreshing summary table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000/api/ai/metrics/')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds between refreshes.')
+        parser.add_argument('--once', action='store_true', help='Print one summary and exit.')
+
+    def handle(self, *args, **options):
+        headers = {}
+        if settings.AI_METRICS_TOKEN:
+            headers['Authorization'] = f'Bearer {settings.AI_METRICS_TOKEN}'
+
+        previous = {}
+        while True:
+            try:
+                response = requests.get(options['url'], headers=headers, timeout=10)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise CommandError(f"Error scraping {options['url']}: {str(e)}")
+
+            histograms, counters = parse_exposition(response.text)
+            if not options['once'] and self.stdout.isatty():
+                self.stdout.write('\x1b[2J\x1b[H', ending='')
+            self.stdout.write(time.strftime('%H:%M:%S') + f"  {options['url']}\n")
+            previous = self._write_table(histograms, previous, options['interval'])
+            self._write_cache(counters)
+            self._write_scaffolding(counters)
+            self._write_reuse(counters)
+
+            if options['once']:
+                return
+            time.sleep(options['interval'])
+
+    def _write_table(self, histograms, previous, interval):
+        header = f"{'metric':<32}{'model':<32}{'operation':<11}{'labels':<18}{'count':>8}{'rate/s':>9}" \
+                 f"{'p50':>10}{'p95':>10}{'p99':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        counts = {}
+        for name, unit in SUMMARY_HISTOGRAMS:
+            scale = 1000 if unit == 'ms' else 1
+            for labels, (bounds, buckets) in sorted(histograms.get(name, {}).items()):
+                values = dict(labels)
+                model = values.pop('model', '')
+                operation = values.pop('operation', '')
+                extra = ','.join(values.values())
+                count = sum(buckets)
+                counts[(name, labels)] = count
+                rate = (count - previous.get((name, labels), count)) / interval
+                quantiles = [bucket_quantile(q, bounds, buckets) * scale for q in (0.5, 0.95, 0.99)]
+                self.stdout.write(
+                    f"{name[3:]:<32}{model[-31:]:<32}{operation:<11}{extra:<18}{int(count):>8}{rate:>9.1f}"
+                    + ''.join(f"{value:>10.1f}" for value in quantiles)
+                    + f" {unit}"
+                )
+        return counts
+
+    def _write_cache(self, counters):
+        results = counters.get('ai_prompt_cache_requests_total', {})
+        totals = defaultdict(lambda: defaultdict(float))
+        for labels, value in results.items():
+            values = dict(labels)
+            totals[values.get('model', '')][values.get('result', '')] += value
+        if not totals:
+            return
+
+        self.stdout.write('\nprompt cache')
+        for model, by_result in sorted(totals.items()):
+            lookups = sum(by_result.values())
+            hits = lookups - by_result.get('miss', 0)
+            self.stdout.write(f"  {model:<40}{int(lookups):>8} lookups  {hits / lookups:>6.1%} hit")
+
+    def _write_scaffolding(self, counters):
+        totals = defaultdict(lambda: defaultdict(float))
+        for labels, value in counters.get('ai_scaffold_requests_total', {}).items():
+            values = dict(labels)
+            totals[values.get('kind', '')][values.get('path', '')] += value
+        if not totals:
+            return
+
+        self.stdout.write('\ngeneration fast path')
+        for kind, by_path in sorted(totals.items()):
+            requests_total = sum(by_path.values())
+            share = by_path.get('scaffold', 0) / requests_total
+            self.stdout.write(f"  {kind:<40}{int(requests_total):>8} requests  {share:>6.1%} templated")
+
+    def _write_reuse(self, counters):
+        results = {dict(labels).get('result', ''): value
+                   for labels, value in counters.get('ai_suggestion_reuse_total', {}).items()}
+        lookups = sum(results.values())
+        if not lookups:
+            return
+        self.stdout.write(
+            f"\naccepted suggestion reuse\n  {int(lookups):>8} lookups  {results.get('hit', 0) / lookups:>6.1%} reused"
+        )
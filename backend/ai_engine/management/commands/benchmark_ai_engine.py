@@ -0,0 +1,313 @@
+"""
+Benchmark the AI layer against the local inference stand-in.
+
+Drives CodeGenerationService, CodeAnalysisService and the live suggestion
+WebSocket at each concurrency level, reports requests per second and
+latency percentiles (the median of several repeats), and compares them with
+a JSON baseline so regressions fail the command. A change counts as a
+regression only past both the relative tolerance and an absolute latency
+floor, so sub-millisecond scenarios don't fail on noise. Requests per
+second count successful requests only, and a baseline with errors is not
+saved.
+"""
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from ai_engine.fake_inference import DISTRIBUTIONS, FakeInferenceServer
+from ai_engine.services import CodeAnalysisService, CodeGenerationService, get_huggingface_service
+
+SCENARIOS = ('generation', 'analysis', 'suggestions')
+
+ANALYSIS_SAMPLE = '''from django.db import models
+
+
+class Invoice(models.Model):
+    number = models.CharField(max_length=32)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+
+
+def load(number):
+    return Invoice.objects.get(number=number)
+'''
+
+
+def median_summary(summaries):
+    """Per-metric median of the summaries of repeated runs."""
+    return {
+        key: round(statistics.median(summary[key] for summary in summaries), 2)
+        for key in summaries[0]
+    }
+
+
+def request_ms(summary, level):
+    """Wall-clock milliseconds per request at this concurrency, so req/s gets the same floor as p95."""
+    return int(level) * 1000 / summary['rps'] if summary['rps'] else float('inf')
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(q * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        'requests': total,
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Measure AI layer throughput and latency and check them against a stored baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f"Comma-separated subset of {', '.join(SCENARIOS)}.")
+        parser.add_argument('--concurrency', default='1,8,32',
+                            help='Comma-separated concurrency levels.')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per scenario and concurrency level.')
+        parser.add_argument('--repeats', type=int, default=3,
+                            help='Runs per scenario and concurrency level; the median of each metric is reported.')
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help='Simulated inference latency in seconds.')
+        parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='fixed')
+        parser.add_argument('--sigma', type=float, default=0.5, help='Shape of the lognormal distribution.')
+        parser.add_argument('--error-rate', type=float, default=0.0)
+        parser.add_argument('--token-latency', type=float, default=0.0,
+                            help='Seconds between streamed tokens.')
+        parser.add_argument('--stream', action='store_true', help='Request streamed suggestions.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline', default=str(Path(settings.BASE_DIR) / 'benchmarks' / 'ai_engine.json'))
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Write these results as the new baseline instead of checking them.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative drop in req/s or rise in p95 before failing.')
+        parser.add_argument('--latency-floor', type=float, default=2.0,
+                            help='Milliseconds p95 or per-request time must also rise by before failing.')
+        parser.add_argument('--output', help='Also write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        total = options['requests']
+
+        environment = {
+            'latency': options['latency'],
+            'distribution': options['distribution'],
+            'sigma': options['sigma'],
+            'error_rate': options['error_rate'],
+            'token_latency': options['token_latency'],
+            'stream': options['stream'],
+            'requests': total,
+            'repeats': options['repeats'],
+        }
+        results = {}
+        service = get_huggingface_service()
+        original_url = service.api_url
+        try:
+            with FakeInferenceServer(
+                latency=options['latency'], distribution=options['distribution'], sigma=options['sigma'],
+                error_rate=options['error_rate'], token_latency=options['token_latency'], seed=options['seed'],
+            ) as server:
+                service.api_url = server.url
+                for scenario in scenarios:
+                    results[scenario] = {}
+                    for level in levels:
+                        runs = []
+                        for _ in range(max(1, options['repeats'])):
+                            # Distinct prompts per run, so the prompt cache doesn't answer them.
+                            run_id = f"{scenario}-{level}-{time.monotonic_ns()}"
+                            runs.append(getattr(self, f'_run_{scenario}')(run_id, total, level, options))
+                        summary = median_summary(runs)
+                        results[scenario][str(level)] = summary
+                        self._write_row(scenario, level, summary)
+        finally:
+            service.api_url = original_url
+
+        report = {'environment': environment, 'results': results}
+        if options['output']:
+            self._save(Path(options['output']), report)
+
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline']:
+            failing = [
+                f"{scenario} c={level}"
+                for scenario, levels in results.items()
+                for level, summary in levels.items() if summary['errors']
+            ]
+            if failing:
+                raise CommandError(f"Not saving a baseline with errors: {', '.join(failing)}")
+            self._save(baseline_path, report)
+            self.stdout.write(f"Baseline written to {baseline_path}")
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f"No baseline at {baseline_path}; run with --update-baseline to create one.")
+            return
+        self._check(json.loads(baseline_path.read_text()), report, options['tolerance'],
+                    options['latency_floor'])
+
+    def _run_generation(self, run_id, total, concurrency, options):
+        service = CodeGenerationService()
+
+        def one(i):
+            return service.generate_react_component(f"Benchmark component {run_id} {i}") is not None
+
+        return self._run_threads(one, total, concurrency)
+
+    def _run_analysis(self, run_id, total, concurrency, options):
+        service = CodeAnalysisService()
+
+        def one(i):
+            return bool(service.analyze_file(f"# {run_id} {i}\n{ANALYSIS_SAMPLE}", 'python'))
+
+        return self._run_threads(one, total, concurrency)
+
+    def _run_suggestions(self, run_id, total, concurrency, options):
+        from collaboration.routing import websocket_urlpatterns
+
+        application = URLRouter(websocket_urlpatterns)
+        layers = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+        user = User.objects.create_user(username=f'benchmark-{uuid.uuid4().hex[:12]}')
+
+        async def client(worker, indexes, latencies, errors):
+            communicator = WebsocketCommunicator(application, f"/ws/ai-suggestions/bench-{run_id}-{worker}/")
+            # The consumer only accepts authenticated sockets.
+            communicator.scope['user'] = user
+            connected, _ = await communicator.connect()
+            if not connected:
+                errors.append(len(indexes))
+                return
+            try:
+                for i in indexes:
+                    start = time.perf_counter()
+                    try:
+                        message = await self._suggest(communicator, {
+                            'type': 'request_suggestions',
+                            'request_id': str(i),
+                            'file_path': f"bench_{worker}.py",
+                            'context': f"# {run_id} {i}\ndef handler(request):",
+                            'stream': options['stream'],
+                        })
+                    except Exception:
+                        message = {}
+                    if message.get('suggestions'):
+                        latencies.append(time.perf_counter() - start)
+                    else:
+                        errors.append(1)
+            finally:
+                await communicator.disconnect()
+
+        async def run():
+            latencies, errors = [], []
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                client(worker, range(worker, total, concurrency), latencies, errors)
+                for worker in range(concurrency)
+            ))
+            return summarize(latencies, sum(errors), time.perf_counter() - start)
+
+        # The benchmark runs in one process, so it does not need Redis.
+        try:
+            with override_settings(CHANNEL_LAYERS=layers):
+                return asyncio.run(run())
+        finally:
+            user.delete()
+
+    @staticmethod
+    async def _suggest(communicator, request):
+        """Send one request and wait for its final reply, skipping streamed deltas."""
+        await communicator.send_json_to(request)
+        while True:
+            message = await communicator.receive_json_from(timeout=settings.HUGGINGFACE_READ_TIMEOUT)
+            if message.get('type') == 'ai_suggestions':
+                return message
+
+    @staticmethod
+    def _run_threads(one, total, concurrency):
+        latencies, errors = [], 0
+
+        def timed(i):
+            start = time.perf_counter()
+            try:
+                ok = one(i)
+            except Exception:
+                ok = False
+            return ok, time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for ok, latency in executor.map(timed, range(total)):
+                if ok:
+                    latencies.append(latency)
+                else:
+                    errors += 1
+        return summarize(latencies, errors, time.perf_counter() - start)
+
+    def _write_row(self, scenario, level, summary):
+        self.stdout.write(
+            f"{scenario:<12} c={level:<4} {summary['rps']:>9.1f} req/s  "
+            f"p50 {summary['p50_ms']:>8.1f}ms  p95 {summary['p95_ms']:>8.1f}ms  "
+            f"p99 {summary['p99_ms']:>8.1f}ms  errors {summary['errors']}"
+        )
+
+    def _check(self, baseline, report, tolerance, floor_ms):
+        if baseline.get('environment') != report['environment']:
+            self.stdout.write(self.style.WARNING(
+                "Baseline was recorded with different settings; comparison may not be meaningful."
+            ))
+
+        regressions = []
+        for scenario, levels in report['results'].items():
+            for level, summary in levels.items():
+                expected = baseline.get('results', {}).get(scenario, {}).get(level)
+                if expected is None:
+                    continue
+                rise_ms = request_ms(summary, level) - request_ms(expected, level)
+                if summary['rps'] < expected['rps'] * (1 - tolerance) and rise_ms > floor_ms:
+                    regressions.append(
+                        f"{scenario} c={level}: {summary['rps']:.1f} req/s, baseline {expected['rps']:.1f}"
+                    )
+                if (summary['p95_ms'] > expected['p95_ms'] * (1 + tolerance)
+                        and summary['p95_ms'] - expected['p95_ms'] > floor_ms):
+                    regressions.append(
+                        f"{scenario} c={level}: p95 {summary['p95_ms']:.1f}ms, baseline {expected['p95_ms']:.1f}ms"
+                    )
+                # Baselines are saved error-free, so any error fails here.
+                if summary['errors'] > expected['errors'] * (1 + tolerance):
+                    regressions.append(
+                        f"{scenario} c={level}: {summary['errors']} errors, baseline {expected['errors']}"
+                    )
+
+        if regressions:
+            raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"Within {tolerance:.0%} (or {floor_ms:g}ms) of baseline."))
+
+    @staticmethod
+    def _save(path, report):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2, sort_keys=True) + '\n')
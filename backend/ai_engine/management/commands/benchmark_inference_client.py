@@ -0,0 +1,81 @@
+"""
+Compare per-call requests.post against the pooled inference client.
+"""
+import statistics
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+from ai_engine.clients import InferenceClient
+from ai_engine.fake_inference import FakeInferenceServer
+
+
+class Command(BaseCommand):
+    help = 'Measure connection handshake savings of the pooled client against a local stand-in server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--latency', type=float, default=0.0,
+                            help='Simulated inference latency in seconds.')
+        parser.add_argument('--certfile', help='Serve over TLS with this certificate.')
+        parser.add_argument('--keyfile')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        concurrency = options['concurrency']
+        payload = {'inputs': 'def handler(request):', 'parameters': {'max_new_tokens': 16}}
+        headers = {'Content-Type': 'application/json'}
+        verify = not options['certfile']
+        if not verify:
+            warnings.filterwarnings('ignore', message='Unverified HTTPS request')
+
+        with FakeInferenceServer(latency=options['latency'], certfile=options['certfile'],
+                                 keyfile=options['keyfile']) as server:
+            url = f"{server.url}/benchmark"
+            client = InferenceClient()
+            client.session.verify = verify
+
+            def fresh():
+                return requests.post(url, headers=headers, json=payload, timeout=client.timeout, verify=verify)
+
+            def pooled():
+                return client.post(url, headers=headers, payload=payload)
+
+            # Warm the pool so the pooled run measures steady state.
+            for _ in range(concurrency):
+                pooled()
+
+            for name, call in (('per-call', fresh), ('pooled', pooled)):
+                server.reset_stats()
+                latencies, elapsed = self._run(call, total, concurrency)
+                stats = server.stats
+                self.stdout.write(
+                    f"{name:<9} {total / elapsed:8.1f} req/s  "
+                    f"mean {statistics.mean(latencies) * 1000:7.2f} ms  "
+                    f"p50 {self._percentile(latencies, 50) * 1000:7.2f} ms  "
+                    f"p95 {self._percentile(latencies, 95) * 1000:7.2f} ms  "
+                    f"connections {stats['connections']}"
+                )
+
+    @staticmethod
+    def _run(call, total, concurrency):
+        def timed(_):
+            start = time.perf_counter()
+            response = call()
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed, range(total)))
+        return latencies, time.perf_counter() - start
+
+    @staticmethod
+    def _percentile(values, percent):
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+        return ordered[index]
@@ -0,0 +1,39 @@
+"""
+Rebuild the retrieval index from TrainingData and accepted suggestions.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_engine.retrieval import get_retrieval_index, indexed_items
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the retrieval index, optionally partitioned into IVF lists for large tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ivf-lists', type=int, default=0,
+                            help='Partition into this many lists (about sqrt(rows) works well); 0 scans all rows.')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows read and embedded per batch.')
+        parser.add_argument('--query', help='Print the closest keys for this text after building.')
+
+    def handle(self, *args, **options):
+        index = get_retrieval_index()
+        if index is None:
+            raise CommandError('The retrieval index is disabled (AI_RETRIEVAL_ENABLED).')
+
+        start = time.perf_counter()
+        count = index.rebuild(indexed_items(options['chunk_size']), options['ivf_lists'], options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} records in {time.perf_counter() - start:.1f}s at {settings.AI_RETRIEVAL_DIR}"
+        ))
+
+        if options['query']:
+            start = time.perf_counter()
+            hits = index.search(options['query'], 5)
+            elapsed = (time.perf_counter() - start) * 1000
+            for key, score in hits:
+                self.stdout.write(f"  {score:.3f}  {key}")
+            self.stdout.write(f"Query took {elapsed:.2f}ms")
@@ -0,0 +1,34 @@
+"""
+Merge near-duplicate TrainingData rows into their best copy's usage_count.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from ai_engine.dedup import deduplicate, sign_missing
+
+
+class Command(BaseCommand):
+    help = 'Find near-duplicate TrainingData rows with MinHash/LSH and merge them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Rows signed and LSH buckets read per query.')
+        parser.add_argument('--threshold', type=float,
+                            help='Estimated Jaccard similarity to merge at (default AI_DEDUP_THRESHOLD).')
+        parser.add_argument('--resign', action='store_true',
+                            help='Recompute every signature first, e.g. after changing the dedup settings.')
+        parser.add_argument('--dry-run', action='store_true', help='Report merges without applying them.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['resign']:
+            resigned = sign_missing(options['chunk_size'], everything=True)
+            self.stdout.write(f"Re-signed {resigned} rows")
+
+        stats = deduplicate(options['chunk_size'], options['threshold'], options['dry_run'])
+        verb = 'Would merge' if options['dry_run'] else 'Merged'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {stats['merged']} duplicates from {stats['buckets']} shared buckets "
+            f"(signed {stats['signed']} new rows) in {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,70 @@
+"""
+Load-test the async generation endpoint against a slow stand-in upstream.
+"""
+import asyncio
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from django.urls import reverse
+
+from ai_engine.fake_inference import FakeInferenceServer
+from ai_engine.services import get_huggingface_service
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent requests at the async generate endpoint and check they overlap upstream.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--latency', type=float, default=2.0,
+                            help='Simulated inference latency in seconds.')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        latency = options['latency']
+        service = get_huggingface_service()
+        original_url = service.api_url
+        user = User.objects.create_user(username=f'loadtest-{uuid.uuid4().hex[:12]}')
+
+        try:
+            with FakeInferenceServer(latency=latency) as server:
+                service.api_url = server.url
+                client = AsyncClient()
+                client.force_login(user)
+                statuses, latencies, elapsed = asyncio.run(self._run(client, total))
+                stats = server.stats
+        finally:
+            service.api_url = original_url
+            user.delete()
+
+        ok = statuses.count(200)
+        self.stdout.write(
+            f"{total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s), {ok} OK, "
+            f"peak upstream concurrency {stats['peak_in_flight']}"
+        )
+        self.stdout.write(
+            f"latency p50 {statistics.median(latencies):.2f}s  max {max(latencies):.2f}s  "
+            f"(upstream {latency:.2f}s; serial would take {total * latency:.0f}s)"
+        )
+        if ok != total:
+            raise CommandError(f"{total - ok} requests failed")
+
+    async def _run(self, client, total):
+        url = reverse('agenerate_model')
+
+        async def one(i):
+            start = time.perf_counter()
+            # Distinct descriptions so the prompt cache and single-flight don't collapse them.
+            response = await client.post(
+                url, {'description': f'Load test model {i}'}, content_type='application/json'
+            )
+            return response.status_code, time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+        return [status for status, _ in results], [latency for _, latency in results], elapsed
@@ -0,0 +1,187 @@
+"""
+In-process metrics for the AI engine.
+
+Metrics are labelled by name/value pairs and registered in REGISTRY on
+creation so they can be listed in one place; render_prometheus() exposes
+them to scrapers.
+"""
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+
+REGISTRY: List['Metric'] = []
+
+
+class Metric:
+    """Base class for labelled metrics."""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def labelsets(self) -> List[Dict[str, str]]:
+        """Return every label combination seen so far."""
+        with self._lock:
+            keys = list(self._values)
+        return [dict(zip(self.labelnames, key)) for key in keys]
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    """Value that can go up and down."""
+
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    """Distribution of observations over fixed upper-bound buckets."""
+
+    type = 'histogram'
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[Tuple[Dict[str, str], Tuple[List[Tuple[float, int]], float, int]]]:
+        """Return (labels, (cumulative buckets, sum, count)) per label set."""
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+
+        samples = []
+        for key, (counts, total, count) in items:
+            cumulative, running = [], 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                running += bucket_count
+                cumulative.append((bound, running))
+            samples.append((dict(zip(self.labelnames, key)), (cumulative, total, count)))
+        return samples
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state is not None else 0
+
+    def quantile(self, q: float, **labels) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None or not state[2]:
+                return 0.0
+            counts = list(state[0])
+        return bucket_quantile(q, self.buckets, counts)
+
+
+def bucket_quantile(q: float, bounds: Tuple[float, ...], counts: List[int]) -> float:
+    """
+    Estimate a quantile from per-bucket counts.
+
+    counts has one entry per bound plus a final +Inf bucket; values in the
+    +Inf bucket are reported as the largest finite bound.
+    """
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = q * total
+    running, lower = 0, 0.0
+    for bound, bucket_count in zip(tuple(bounds) + (float('inf'),), counts):
+        if bucket_count and running + bucket_count >= rank:
+            if bound == float('inf'):
+                return lower
+            return lower + (bound - lower) * (rank - running) / bucket_count
+        running += bucket_count
+        lower = bound
+    return lower
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if value == float('-inf'):
+        return '-Inf'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def render_prometheus(registry: Optional[List[Metric]] = None) -> str:
+    """Render metrics in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for metric in REGISTRY if registry is None else registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        if isinstance(metric, Histogram):
+            for labels, (cumulative, total, count) in metric.samples():
+                for bound, running in cumulative:
+                    bucket_labels = dict(labels, le=_format_value(bound))
+                    lines.append(f"{metric.name}_bucket{_format_labels(bucket_labels)} {running}")
+                lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{_format_labels(labels)} {count}")
+        else:
+            for labels, value in metric.samples():
+                lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
@@ -80,6 +80,9 @@ class TrainingData(models.Model):
     tags = models.JSONField(default=list)
     quality_score = models.FloatField(default=0.0)
     usage_count = models.IntegerField(default=0)
+    # Near-duplicate detection (see ai_engine.dedup)
+    fingerprint = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
+    minhash = models.BinaryField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -87,3 +90,54 @@ class TrainingData(models.Model):
     
     def __str__(self):
         return f"{self.data_type} - {self.language}"
+
+
+class TrainingDataBand(models.Model):
+    """One LSH band of a TrainingData MinHash signature."""
+    
+    band = models.CharField(max_length=32, db_index=True)
+    training_data = models.ForeignKey(TrainingData, on_delete=models.CASCADE, related_name='bands')
+    
+    def __str__(self):
+        return f"{self.band} -> {self.training_data_id}"
+
+
+class GenerationJob(models.Model):
+    """Code generation run in the background by a Celery worker."""
+    
+    JOB_KINDS = [
+        ('completion', 'Code Completion'),
+        ('django_model', 'Django Model'),
+        ('react_component', 'React Component'),
+        ('api_endpoint', 'API Endpoint'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='generation_jobs')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=JOB_KINDS)
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True)
+    parameters = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    result = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+    suggestion = models.ForeignKey(CodeSuggestion, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_generation_job_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} job {self.id} ({self.status})"
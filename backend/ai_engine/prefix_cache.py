@@ -0,0 +1,200 @@
+"""
+Key/value state reuse for incremental completions on local models.
+
+Consecutive completion contexts from one editor share almost all of their
+tokens. After encoding a prompt, the attention key/value states are kept per
+(model, session, file) scope so the next prompt only has to encode the tokens
+after the longest shared prefix; states of one model never reach another,
+even when the router switches models within an editor. Entries are evicted least-recently-used once
+AI_PREFIX_CACHE_MAX_BYTES is exceeded.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .metrics import Counter
+
+prefix_cache_lookups = Counter(
+    'ai_prefix_cache_lookups_total',
+    'Local prefix cache lookups by model and result (hit, miss).',
+    ('model', 'result'),
+)
+prefix_cache_tokens = Counter(
+    'ai_prefix_cache_tokens_total',
+    'Prompt tokens seen by the local prefix cache, by model and kind (reused, encoded).',
+    ('model', 'kind'),
+)
+
+
+def tensor_bytes(state) -> int:
+    """Total size of the tensors in a (possibly nested) past_key_values."""
+    if isinstance(state, (tuple, list)):
+        return sum(tensor_bytes(item) for item in state)
+    return state.element_size() * state.nelement()
+
+
+# Sequence axis of each tensor in a layer's past_key_values, as laid out by
+# transformers' Cache classes: (batch, heads, seq, head_dim).
+CACHE_SEQUENCE_AXES = (2, 2)
+# Legacy tuple layouts that differ, by model_type.
+LEGACY_SEQUENCE_AXES = {
+    'bloom': (2, 1),  # keys (batch * heads, head_dim, seq), values (batch * heads, seq, head_dim)
+    'gpt_bigcode': (1,),  # one fused (batch, seq, 2 * head_dim) tensor per layer
+}
+
+
+def sequence_axes(model_type: str, from_cache_class: bool) -> Tuple[int, ...]:
+    """Sequence axes of a model's per-layer key/value tensors."""
+    if from_cache_class:
+        return CACHE_SEQUENCE_AXES
+    return LEGACY_SEQUENCE_AXES.get(model_type, CACHE_SEQUENCE_AXES)
+
+
+def crop(state, length: int, axes: Tuple[int, ...]):
+    """Keep the first length positions of every layer in past_key_values."""
+    layers = []
+    for layer in state:
+        if isinstance(layer, (tuple, list)):
+            layers.append(type(layer)(
+                tensor.narrow(axes[min(index, len(axes) - 1)], 0, length) for index, tensor in enumerate(layer)
+            ))
+        else:
+            layers.append(layer.narrow(axes[0], 0, length))
+    return type(state)(layers)
+
+
+class _Entry:
+    __slots__ = ('scope', 'tokens', 'state', 'size')
+
+    def __init__(self, scope: str, tokens: Tuple[int, ...], state, size: int):
+        self.scope = scope
+        self.tokens = tokens
+        self.state = state
+        self.size = size
+
+
+class PrefixCache:
+    """LRU of key/value states by token-prefix hash, bounded by memory."""
+
+    def __init__(self, max_bytes: int, entries_per_scope: int = 4):
+        self.max_bytes = max_bytes
+        self.entries_per_scope = entries_per_scope
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self._scopes: Dict[str, List[str]] = {}
+        # Sequence axes per model, as reported with its first stored state.
+        self._axes: Dict[str, Tuple[int, ...]] = {}
+
+    @staticmethod
+    def model_scope(model_name: str, scope: str) -> str:
+        return f"{model_name}|{scope}"
+
+    @staticmethod
+    def prefix_key(scope: str, tokens: Sequence[int]) -> str:
+        digest = hashlib.sha1(','.join(map(str, tokens)).encode()).hexdigest()
+        return f"{scope}:{digest}"
+
+    def lookup(self, model_name: str, scope: str, tokens: Sequence[int]) -> Tuple[Optional[object], int]:
+        """
+        Return (past_key_values, length) for the longest cached prefix of tokens.
+
+        length is capped below len(tokens) so there is always at least one new
+        token to feed the model.
+        """
+        scope = self.model_scope(model_name, scope)
+        best, best_length = None, 0
+        with self._lock:
+            for key in self._scopes.get(scope, ()):
+                entry = self._entries[key]
+                length = _common_prefix(entry.tokens, tokens)
+                if length > best_length:
+                    best, best_length = (key, entry), length
+            if best is not None:
+                self._entries.move_to_end(best[0])
+
+        best_length = min(best_length, len(tokens) - 1)
+        if best is None or best_length <= 0:
+            prefix_cache_lookups.inc(model=model_name, result='miss')
+            return None, 0
+
+        entry = best[1]
+        state = entry.state
+        if best_length < len(entry.tokens):
+            state = crop(state, best_length, self._axes.get(model_name, CACHE_SEQUENCE_AXES))
+        prefix_cache_lookups.inc(model=model_name, result='hit')
+        return state, best_length
+
+    def store(self, model_name: str, scope: str, tokens: Sequence[int], state,
+              axes: Optional[Tuple[int, ...]] = None):
+        """
+        Remember model_name's key/value state for tokens in scope.
+
+        axes are the sequence axes of the state's tensors (see sequence_axes);
+        None keeps those the model's states were stored with before.
+        """
+        if axes is not None:
+            self._axes[model_name] = axes
+        scope = self.model_scope(model_name, scope)
+        tokens = tuple(tokens)
+        size = tensor_bytes(state)
+        if size > self.max_bytes:
+            return
+        key = self.prefix_key(scope, tokens)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            keys = self._scopes.setdefault(scope, [])
+            # Older prefixes of the same text are superseded by this one.
+            for old_key in [k for k in keys if _is_prefix(self._entries[k].tokens, tokens)]:
+                self._remove(old_key)
+            while len(self._scopes.get(scope, ())) >= self.entries_per_scope:
+                self._remove(self._scopes[scope][0])
+
+            self._entries[key] = _Entry(scope, tokens, state, size)
+            self._scopes.setdefault(scope, []).append(key)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    @staticmethod
+    def record_tokens(model_name: str, reused: int, encoded: int):
+        prefix_cache_tokens.inc(reused, model=model_name, kind='reused')
+        prefix_cache_tokens.inc(encoded, model=model_name, kind='encoded')
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-model prefix hit ratio and prompt tokens saved in this process."""
+        stats = {}
+        for labels, count in prefix_cache_lookups.samples():
+            model = stats.setdefault(labels['model'], {'hit': 0, 'miss': 0, 'reused': 0, 'encoded': 0})
+            model[labels['result']] = count
+        for labels, count in prefix_cache_tokens.samples():
+            model = stats.setdefault(labels['model'], {'hit': 0, 'miss': 0, 'reused': 0, 'encoded': 0})
+            model[labels['kind']] = count
+        for model in stats.values():
+            lookups = model['hit'] + model['miss']
+            model['hit_ratio'] = model['hit'] / lookups if lookups else 0.0
+            model['tokens_saved'] = model['reused']
+        return stats
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+        keys = self._scopes[entry.scope]
+        keys.remove(key)
+        if not keys:
+            del self._scopes[entry.scope]
+
+
+def _common_prefix(a: Sequence[int], b: Sequence[int]) -> int:
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+def _is_prefix(prefix: Sequence[int], tokens: Sequence[int]) -> bool:
+    return len(prefix) <= len(tokens) and tuple(tokens[:len(prefix)]) == tuple(prefix)
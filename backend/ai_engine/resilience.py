@@ -0,0 +1,258 @@
+"""
+Protection for calls to the inference upstream.
+
+Each model gets a circuit breaker: after AI_BREAKER_FAILURE_THRESHOLD
+consecutive failures it opens and calls fail immediately, until
+AI_BREAKER_RESET_TIMEOUT has passed and a single probe call is let through
+(half-open). Timeouts follow the observed latency of each model, and when
+AI_HEDGE_ENABLED is set a duplicate request is sent if the first has not
+answered within the model's p95 latency.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from django.conf import settings
+
+from .metrics import Counter, Gauge, Histogram
+
+upstream_latency = Histogram(
+    'ai_upstream_latency_seconds',
+    'Latency of successful inference API calls.',
+    ('model',),
+)
+breaker_state = Gauge(
+    'ai_circuit_breaker_state',
+    'Circuit breaker state per model (0 closed, 1 half-open, 2 open).',
+    ('model',),
+)
+breaker_rejected = Counter(
+    'ai_circuit_breaker_rejected_total',
+    'Calls failed fast because the circuit was open.',
+    ('model',),
+)
+hedged_requests = Counter(
+    'ai_hedged_requests_total',
+    'Hedged duplicate requests by outcome (sent, won).',
+    ('model', 'outcome'),
+)
+
+# Latency samples needed before timeouts and hedging adapt to a model.
+MIN_LATENCY_SAMPLES = 20
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose circuit is open."""
+
+    def __init__(self, model_name: str):
+        super().__init__(f"Circuit open for {model_name}")
+        self.model_name = model_name
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Connection errors, timeouts, 5xx and 429 count against the breaker."""
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is None:
+        return True
+    return status >= 500 or status == 429
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open probe."""
+
+    CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, model_name: str, failure_threshold: int, reset_timeout: float):
+        self.model_name = model_name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at = 0.0
+        self._lock = threading.Lock()
+        breaker_state.set(0, model=model_name)
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    return False
+                self._set_state(self.HALF_OPEN)
+            elif now - self._probe_started_at < self.reset_timeout:
+                # One probe at a time; a probe that never reported is replaced.
+                return False
+            self._probe_started_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def _set_state(self, state: str):
+        self.state = state
+        breaker_state.set(self.STATE_VALUES[state], model=self.model_name)
+
+
+class UpstreamGuard:
+    """Per-model breakers, adaptive timeouts and hedging around upstream calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.HUGGINGFACE_POOL_MAXSIZE, thread_name_prefix='ai-hedge'
+        )
+
+    def breaker(self, model_name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model_name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(model_name)
+                if breaker is None:
+                    breaker = self._breakers[model_name] = CircuitBreaker(
+                        model_name, settings.AI_BREAKER_FAILURE_THRESHOLD, settings.AI_BREAKER_RESET_TIMEOUT
+                    )
+        return breaker
+
+    def timeout(self, model_name: str) -> float:
+        """Read timeout: a multiple of the model's p99 latency, within bounds."""
+        ceiling = settings.HUGGINGFACE_READ_TIMEOUT
+        if upstream_latency.count(model=model_name) < MIN_LATENCY_SAMPLES:
+            return ceiling
+        p99 = upstream_latency.quantile(0.99, model=model_name)
+        return min(max(p99 * settings.AI_TIMEOUT_MULTIPLIER, settings.AI_TIMEOUT_MIN), ceiling)
+
+    def hedge_delay(self, model_name: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None to send a single request."""
+        if not settings.AI_HEDGE_ENABLED or upstream_latency.count(model=model_name) < MIN_LATENCY_SAMPLES:
+            return None
+        return upstream_latency.quantile(0.95, model=model_name)
+
+    def call(self, model_name: str, fn: Callable[[float], Any], hedge: bool = True,
+             track_latency: bool = True) -> Any:
+        """Run fn(timeout) through the model's breaker, hedging if enabled."""
+        breaker = self._admit(model_name)
+        timeout = self.timeout(model_name)
+        start = time.perf_counter()
+        try:
+            delay = self.hedge_delay(model_name) if hedge else None
+            result = self._hedged(model_name, fn, timeout, delay) if delay else fn(timeout)
+        except Exception as e:
+            self._record_error(breaker, e)
+            raise
+        self._record_success(model_name, breaker, time.perf_counter() - start, track_latency)
+        return result
+
+    async def acall(self, model_name: str, fn: Callable[[float], Awaitable[Any]], hedge: bool = True,
+                    track_latency: bool = True) -> Any:
+        """Async variant of call()."""
+        breaker = self._admit(model_name)
+        timeout = self.timeout(model_name)
+        start = time.perf_counter()
+        try:
+            delay = self.hedge_delay(model_name) if hedge else None
+            result = await (self._ahedged(model_name, fn, timeout, delay) if delay else fn(timeout))
+        except Exception as e:
+            self._record_error(breaker, e)
+            raise
+        self._record_success(model_name, breaker, time.perf_counter() - start, track_latency)
+        return result
+
+    def _admit(self, model_name: str) -> CircuitBreaker:
+        breaker = self.breaker(model_name)
+        if not breaker.allow():
+            breaker_rejected.inc(model=model_name)
+            raise CircuitOpenError(model_name)
+        return breaker
+
+    @staticmethod
+    def _record_error(breaker: CircuitBreaker, error: Exception):
+        if is_upstream_failure(error):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    @staticmethod
+    def _record_success(model_name: str, breaker: CircuitBreaker, elapsed: float, track_latency: bool):
+        breaker.record_success()
+        if track_latency:
+            upstream_latency.observe(elapsed, model=model_name)
+
+    def _hedged(self, model_name: str, fn: Callable[[float], Any], timeout: float, delay: float) -> Any:
+        primary = self._executor.submit(fn, timeout)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        hedged_requests.inc(model=model_name, outcome='sent')
+        secondary = self._executor.submit(fn, timeout)
+        pending, error = {primary, secondary}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is secondary:
+                        hedged_requests.inc(model=model_name, outcome='won')
+                    # The other request finishes in the background; blocking calls can't be cut short.
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _ahedged(self, model_name: str, fn: Callable[[float], Awaitable[Any]], timeout: float,
+                       delay: float) -> Any:
+        primary = asyncio.ensure_future(fn(timeout))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+
+            hedged_requests.inc(model=model_name, outcome='sent')
+            secondary = asyncio.ensure_future(fn(timeout))
+            tasks.append(secondary)
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            hedged_requests.inc(model=model_name, outcome='won')
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+_guard = None
+_guard_lock = threading.Lock()
+
+
+def get_upstream_guard() -> UpstreamGuard:
+    """Return the process-wide upstream guard."""
+    global _guard
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                _guard = UpstreamGuard()
+    return _guard
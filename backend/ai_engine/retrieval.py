@@ -0,0 +1,413 @@
+"""
+Nearest-neighbour retrieval over TrainingData and accepted suggestions.
+
+Code is embedded by hashing identifier sub-words and token bigrams into a
+fixed number of signed dimensions (no model to load), and the unit vectors
+are kept in a memory-mapped float32 matrix under AI_RETRIEVAL_DIR. Rows are
+appended as records are saved; keys.txt names each row and is written last,
+so readers in other processes only see complete rows. A later row for the
+same key hides the earlier one, and deleted.txt lists the rows of deleted
+records; both are dropped by the next rebuild.
+
+Queries scan the whole matrix, or, once the index was rebuilt with IVF
+lists (manage.py build_retrieval_index --ivf-lists N), only the rows of the
+AI_RETRIEVAL_IVF_PROBES lists whose centroids are closest to the query.
+Keys read "<group>:<id>" (accepted suggestions are grouped per project), and
+a search limited to one group only scans that group's rows.
+"""
+import fcntl
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+query_duration = Histogram(
+    'ai_retrieval_query_seconds',
+    'Retrieval index query latency.',
+    ('mode',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+examples_used = Counter(
+    'ai_retrieval_examples_total',
+    'Retrieved examples added to generation prompts.',
+    ('kind',),
+)
+
+KEYS = 'keys.txt'
+DELETED = 'deleted.txt'
+VECTORS = 'vectors.f32'
+CENTROIDS = 'centroids.npy'
+ASSIGNMENTS = 'assignments.i32'
+
+TOKEN_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|\d+|[^\sA-Za-z0-9_]')
+SUBWORD_RE = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+
+
+def features(text: str) -> Dict[str, int]:
+    """Identifier sub-words and token bigrams of text, with their counts."""
+    counts: Dict[str, int] = {}
+    tokens = TOKEN_RE.findall(text)
+    for token in tokens:
+        if token[0].isalpha() or token[0] == '_':
+            for word in SUBWORD_RE.findall(token):
+                word = word.lower()
+                counts[word] = counts.get(word, 0) + 1
+    for first, second in zip(tokens, tokens[1:]):
+        bigram = f"{first.lower()} {second.lower()}"
+        counts[bigram] = counts.get(bigram, 0) + 1
+    return counts
+
+
+def embed(texts: Sequence[str], dimensions: int) -> np.ndarray:
+    """Unit-length hashed feature vectors, one row per text."""
+    vectors = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature, count in features(text).items():
+            digest = zlib.crc32(feature.encode())
+            sign = -1.0 if digest & 0x80000000 else 1.0
+            vectors[row, digest % dimensions] += sign * (1.0 + math.log(count))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def kmeans(vectors: np.ndarray, lists: int, iterations: int = 10, sample_size: int = 64) -> np.ndarray:
+    """Spherical k-means centroids trained on a sample of at most lists * sample_size rows."""
+    rng = np.random.default_rng(0)
+    count = len(vectors)
+    sample = np.asarray(vectors[np.sort(rng.choice(count, min(count, lists * sample_size), replace=False))])
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assigned = np.argmax(sample @ centroids.T, axis=1)
+        for index in range(lists):
+            members = sample[assigned == index]
+            if len(members):
+                centroids[index] = members.sum(axis=0)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+class RetrievalIndex:
+    """Append-only vector index shared by every process through AI_RETRIEVAL_DIR."""
+
+    def __init__(self, path, dimensions: int, probes: int = 8):
+        self.path = Path(path)
+        self.dimensions = dimensions
+        self.probes = probes
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._inode = None
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._groups: Dict[str, List[int]] = {}
+        self._keys_size = 0
+        self._deleted_size = 0
+        self._dead = np.zeros(0, dtype=bool)
+        self._vectors = np.zeros((0, self.dimensions), dtype=np.float32)
+        self._centroids = None
+        self._lists: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._keys) - int(self._dead[:len(self._keys)].sum())
+
+    def add(self, key: str, text: str):
+        """Index text under key, replacing any earlier row for key."""
+        self.add_many([(key, text)])
+
+    def add_many(self, items: Sequence[Tuple[str, str]]):
+        if not items:
+            return
+        vectors = embed([text for _, text in items], self.dimensions)
+        with self._write_lock(), self._lock:
+            self._refresh()
+            count = len(self._keys)
+            self._ensure_capacity(count + len(items))
+            block = np.memmap(
+                self.path / VECTORS, dtype=np.float32, mode='r+',
+                offset=count * self.dimensions * 4, shape=vectors.shape,
+            )
+            block[:] = vectors
+            block.flush()
+            del block
+            if self._centroids is not None:
+                assigned = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+                with open(self.path / ASSIGNMENTS, 'ab') as f:
+                    f.write(assigned.tobytes())
+            self._append(KEYS, [key for key, _ in items])
+            self._refresh()
+
+    def remove(self, key: str):
+        with self._write_lock(), self._lock:
+            self._refresh()
+            if key in self._rows:
+                self._append(DELETED, [str(self._rows[key])])
+                self._refresh()
+
+    def search(self, text: str, k: int = 5, group: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        The k closest live keys, as (key, cosine similarity).
+
+        group limits the search to keys of the form "<group>:<id>" and scans
+        just those rows.
+        """
+        start = time.perf_counter()
+        query = embed([text], self.dimensions)[0]
+        with self._lock:
+            self._refresh()
+            count = len(self._keys)
+            if not count:
+                return []
+            if group is not None:
+                rows = np.array(self._groups.get(group, ()), dtype=np.int64)
+                rows = rows[~self._dead[rows]]
+                scores = np.asarray(self._vectors[rows] @ query)
+                mode = 'group'
+            elif self._centroids is not None:
+                nearest = np.argsort(-(self._centroids @ query))[:self.probes]
+                rows = np.concatenate([self._lists[index] for index in nearest])
+                rows = rows[~self._dead[rows]]
+                scores = np.asarray(self._vectors[rows] @ query)
+                mode = 'ivf'
+            else:
+                rows = np.flatnonzero(~self._dead[:count])
+                scores = np.asarray(self._vectors[:count] @ query)[rows]
+                mode = 'flat'
+            keys = self._keys
+
+        wanted = min(len(rows), k)
+        results = []
+        if wanted:
+            top = np.argpartition(-scores, wanted - 1)[:wanted]
+            results = [(keys[rows[index]], float(scores[index])) for index in top[np.argsort(-scores[top])]]
+        query_duration.observe(time.perf_counter() - start, mode=mode)
+        return results
+
+    def rebuild(self, items: Iterable[Tuple[str, str]], ivf_lists: int = 0, chunk_size: int = 2000) -> int:
+        """Replace the index with items, optionally partitioned into ivf_lists lists."""
+        staging = self.path.with_name(self.path.name + '.new')
+        shutil.rmtree(staging, ignore_errors=True)
+        fresh = RetrievalIndex(staging, self.dimensions, self.probes)
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                fresh.add_many(chunk)
+                chunk = []
+        fresh.add_many(chunk)
+        count = len(fresh._keys)
+        if ivf_lists and count >= ivf_lists:
+            fresh._train(ivf_lists, chunk_size)
+
+        with self._write_lock(), self._lock:
+            retired = self.path.with_name(self.path.name + '.old')
+            shutil.rmtree(retired, ignore_errors=True)
+            if self.path.exists():
+                os.replace(self.path, retired)
+            os.replace(staging, self.path)
+            shutil.rmtree(retired, ignore_errors=True)
+            self._reset()
+        return count
+
+    def _train(self, lists: int, chunk_size: int):
+        vectors = self._vectors[:len(self._keys)]
+        centroids = kmeans(vectors, lists)
+        with open(self.path / ASSIGNMENTS, 'wb') as f:
+            for offset in range(0, len(vectors), chunk_size):
+                chunk = np.asarray(vectors[offset:offset + chunk_size])
+                f.write(np.argmax(chunk @ centroids.T, axis=1).astype(np.int32).tobytes())
+        np.save(self.path / CENTROIDS, centroids)
+
+    def _refresh(self):
+        """Pick up rows and tombstones written since the last call, by any process."""
+        try:
+            stat = (self.path / KEYS).stat()
+        except FileNotFoundError:
+            if self._inode is not None:
+                self._reset()
+            return
+        if stat.st_ino != self._inode:
+            # First load, or the index was rebuilt.
+            self._reset()
+            self._inode = stat.st_ino
+            if (self.path / CENTROIDS).exists():
+                self._centroids = np.load(self.path / CENTROIDS)
+                self._lists = [np.zeros(0, dtype=np.int64) for _ in range(len(self._centroids))]
+
+        if stat.st_size > self._keys_size:
+            added, self._keys_size = self._read_lines(KEYS, self._keys_size)
+            first = len(self._keys)
+            self._keys.extend(added)
+            self._map_vectors(len(self._keys))
+            self._dead = np.concatenate([self._dead, np.zeros(len(added), dtype=bool)])
+            for row, key in enumerate(added, first):
+                previous = self._rows.get(key)
+                if previous is not None:
+                    self._dead[previous] = True
+                self._rows[key] = row
+                self._groups.setdefault(key.rpartition(':')[0], []).append(row)
+            if self._centroids is not None:
+                self._extend_lists(first, len(self._keys))
+
+        deleted = self.path / DELETED
+        if deleted.exists() and deleted.stat().st_size > self._deleted_size:
+            removed, self._deleted_size = self._read_lines(DELETED, self._deleted_size)
+            for row in removed:
+                self._dead[int(row)] = True
+
+    def _read_lines(self, name: str, offset: int) -> Tuple[List[str], int]:
+        with open(self.path / name, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # A line still being written by another process is read next time.
+        end = data.rfind(b'\n') + 1
+        return data[:end].decode().splitlines(), offset + end
+
+    def _map_vectors(self, count: int):
+        if count > len(self._vectors):
+            capacity = (self.path / VECTORS).stat().st_size // (self.dimensions * 4)
+            self._vectors = np.memmap(
+                self.path / VECTORS, dtype=np.float32, mode='r', shape=(capacity, self.dimensions)
+            )
+
+    def _extend_lists(self, first: int, count: int):
+        assigned = np.fromfile(self.path / ASSIGNMENTS, dtype=np.int32, count=count - first, offset=first * 4)
+        order = np.argsort(assigned, kind='stable')
+        bounds = np.searchsorted(assigned[order], np.arange(len(self._lists) + 1))
+        for index in range(len(self._lists)):
+            rows = order[bounds[index]:bounds[index + 1]] + first
+            if len(rows):
+                self._lists[index] = np.concatenate([self._lists[index], rows])
+
+    def _ensure_capacity(self, rows: int):
+        path = self.path / VECTORS
+        size = path.stat().st_size if path.exists() else 0
+        needed = rows * self.dimensions * 4
+        if needed > size:
+            # Grow geometrically so appends don't resize the file each time.
+            with open(path, 'ab') as f:
+                f.truncate(max(needed, size * 2, 1024 * self.dimensions * 4))
+
+    def _append(self, name: str, lines: List[str]):
+        with open(self.path / name, 'a') as f:
+            f.write(''.join(line + '\n' for line in lines))
+
+    @contextmanager
+    def _write_lock(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.mkdir(exist_ok=True)
+        with open(self.path.with_name(self.path.name + '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def training_key(pk) -> str:
+    return f"training:{pk}"
+
+
+def suggestion_group(project_id) -> str:
+    return f"suggestion:{project_id}"
+
+
+def suggestion_key(project_id, pk) -> str:
+    """Accepted suggestions are grouped per project, so lookups can stay within one."""
+    return f"{suggestion_group(project_id)}:{pk}"
+
+
+def indexed_items(chunk_size: int = 2000) -> Iterable[Tuple[str, str]]:
+    """Every TrainingData row and accepted suggestion, streamed from the database."""
+    from .models import CodeSuggestion, TrainingData
+
+    for pk, content in TrainingData.objects.values_list('id', 'content').iterator(chunk_size=chunk_size):
+        yield training_key(pk), content
+    accepted = CodeSuggestion.objects.filter(is_accepted=True).values_list('id', 'project_id', 'context')
+    for pk, project_id, context in accepted.iterator(chunk_size=chunk_size):
+        yield suggestion_key(project_id, pk), context
+
+
+def related_examples(text: str, k: int, language: Optional[str] = None, project_id=None) -> List[str]:
+    """
+    Code from the k most relevant indexed records, best first.
+
+    TrainingData matches (in language, when given) are weighted by
+    quality_score. Their use is counted in ai_retrieval_examples_total, not
+    usage_count, which counts duplicate submissions (see dedup). Accepted
+    suggestions contribute their code only to prompts for their own
+    project_id, never to another project's.
+    """
+    from .models import CodeSuggestion, TrainingData
+
+    index = get_retrieval_index()
+    if index is None or k <= 0:
+        return []
+    hits = index.search(text, k * 2, group='training')
+    if project_id is not None:
+        hits += index.search(text, k, group=suggestion_group(project_id))
+    hits = [(key, score) for key, score in hits if score >= settings.AI_RETRIEVAL_MIN_SCORE]
+    if not hits:
+        return []
+
+    ids = {'training': [], 'suggestion': []}
+    for key, _ in hits:
+        ids.setdefault(key.split(':', 1)[0], []).append(key.rpartition(':')[2])
+    training = TrainingData.objects.filter(id__in=ids['training'])
+    if language:
+        training = training.filter(language__iexact=language)
+    records = {training_key(row.pk): row for row in training}
+    records.update({
+        suggestion_key(row.project_id, row.pk): row
+        for row in CodeSuggestion.objects.filter(id__in=ids['suggestion'], project_id=project_id, is_accepted=True)
+    })
+
+    ranked = []
+    for key, score in hits:
+        record = records.get(key)
+        if record is None:
+            continue
+        if isinstance(record, TrainingData):
+            ranked.append((score * (0.5 + 0.5 * min(max(record.quality_score, 0.0), 1.0)), key, record.content))
+        else:
+            ranked.append((score, key, record.suggestion))
+    ranked.sort(key=lambda item: -item[0])
+    ranked = ranked[:k]
+
+    for _, key, _ in ranked:
+        examples_used.inc(kind=key.split(':', 1)[0])
+    return [content for _, _, content in ranked]
+
+
+_retrieval_index: Optional[RetrievalIndex] = None
+_retrieval_index_lock = threading.Lock()
+
+
+def get_retrieval_index() -> Optional[RetrievalIndex]:
+    """Return the process-wide retrieval index, or None if disabled."""
+    global _retrieval_index
+    if not settings.AI_RETRIEVAL_ENABLED:
+        return None
+    if _retrieval_index is None:
+        with _retrieval_index_lock:
+            if _retrieval_index is None:
+                _retrieval_index = RetrievalIndex(
+                    settings.AI_RETRIEVAL_DIR, settings.AI_RETRIEVAL_DIMENSIONS, settings.AI_RETRIEVAL_IVF_PROBES,
+                )
+    return _retrieval_index
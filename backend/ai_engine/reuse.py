@@ -0,0 +1,83 @@
+"""
+Reuse of accepted suggestions.
+
+Before a completion goes to the model, the project's accepted suggestions
+are looked up in the retrieval index by context. A candidate is only
+reused when the last AI_REUSE_CONTEXT_LINES lines of both contexts (the code
+the completion continues) are at least AI_REUSE_MIN_SIMILARITY alike too,
+and when its acceptance_rate reaches AI_REUSE_MIN_ACCEPTANCE. Lookups are
+made on behalf of a user and only see projects accessible to them.
+"""
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from api.models import Project
+
+from .metrics import Counter
+from .models import CodeSuggestion
+from .retrieval import embed, get_retrieval_index, suggestion_group
+
+reuse_lookups = Counter(
+    'ai_suggestion_reuse_total',
+    'Accepted-suggestion lookups before calling the model, by result (hit, miss).',
+    ('result',),
+)
+
+
+def context_tail(context: str, lines: int) -> str:
+    return '\n'.join(context.rstrip().split('\n')[-lines:])
+
+
+def find_reusable(user, project_id, context: str, suggestion_type: str = 'completion',
+                  cursor_line: Optional[int] = None) -> Optional[CodeSuggestion]:
+    """
+    The best accepted suggestion of project_id for an almost identical context, if any.
+
+    None unless user is signed in and has access to the project. Only the
+    lines up to cursor_line (default: all) are compared; stored contexts are
+    assumed to end at their cursor.
+    """
+    index = get_retrieval_index()
+    if index is None or not settings.AI_REUSE_ENABLED or not project_id or not context.strip():
+        return None
+    if user is None or not user.is_authenticated:
+        return None
+    try:
+        if not Project.objects.accessible_to(user).filter(pk=project_id).exists():
+            return None
+    except ValidationError:
+        return None
+    if cursor_line is not None:
+        context = '\n'.join(context.split('\n')[:cursor_line + 1])
+
+    threshold = settings.AI_REUSE_MIN_SIMILARITY
+    hits = index.search(context, settings.AI_REUSE_CANDIDATES, group=suggestion_group(project_id))
+    ids = [key.rpartition(':')[2] for key, score in hits if score >= threshold]
+    best, best_rank = None, None
+    if ids:
+        candidates = CodeSuggestion.objects.filter(
+            id__in=ids,
+            project_id=project_id,
+            suggestion_type=suggestion_type,
+            is_accepted=True,
+            acceptance_rate__gte=settings.AI_REUSE_MIN_ACCEPTANCE,
+        )
+        lines = settings.AI_REUSE_CONTEXT_LINES
+        query = embed([context_tail(context, lines)], index.dimensions)[0]
+        for suggestion in candidates:
+            score = float(embed([context_tail(suggestion.context, lines)], index.dimensions)[0] @ query)
+            rank = (score, suggestion.acceptance_rate, suggestion.confidence_score)
+            if score >= threshold and (best_rank is None or rank > best_rank):
+                best, best_rank = suggestion, rank
+
+    reuse_lookups.inc(result='miss' if best is None else 'hit')
+    return best
+
+
+async def afind_reusable(user, project_id, context: str, suggestion_type: str = 'completion',
+                         cursor_line: Optional[int] = None) -> Optional[CodeSuggestion]:
+    """Async variant of find_reusable for use inside consumers."""
+    return await sync_to_async(find_reusable)(user, project_id, context, suggestion_type, cursor_line)
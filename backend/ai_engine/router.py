@@ -0,0 +1,324 @@
+"""
+Latency-aware model routing.
+
+The registry holds the active AIModel rows in memory and reloads them when
+the table changes, which every process notices from the row count and
+latest updated_at within REGISTRY_REFRESH_INTERVAL seconds. The router
+tracks EWMA latency, error rate and throughput per model and picks a model
+per request type among those meeting the type's latency SLO. Every
+AI_ROUTER_PERSIST_INTERVAL seconds each process writes its own statistics
+under performance_metrics["processes"], and the top-level figures are
+recomputed from the processes that reported recently.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the AI model generation counter.
+REGISTRY_REFRESH_INTERVAL = 5
+
+# Weight of the newest observation in the moving averages.
+EWMA_ALPHA = 0.2
+
+# Models erroring more often than this are only used when nothing else is left.
+MAX_ERROR_RATE = 0.5
+
+# Persist intervals after which a process that stopped reporting no longer counts.
+STALE_PROCESS_INTERVALS = 10
+
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ModelRegistry:
+    """Active AIModels, keyed by Hugging Face model id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Optional[Dict[str, object]] = None
+        self._generation = None
+        self._checked_at = 0.0
+
+    def models(self) -> Dict[str, object]:
+        models = self._fresh()
+        if models is not None:
+            return models
+
+        generation = self._current_generation()
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if self._models is None or generation != self._generation:
+                self._models = self._load()
+                self._generation = generation
+            return self._models
+
+    async def amodels(self) -> Dict[str, object]:
+        """Like models(), but refreshes off the event loop."""
+        models = self._fresh()
+        if models is not None:
+            return models
+        return await sync_to_async(self.models)()
+
+    def invalidate(self):
+        with self._lock:
+            self._models = None
+
+    def _fresh(self) -> Optional[Dict[str, object]]:
+        """Return the loaded models if they were checked recently enough."""
+        models = self._models
+        if models is not None and time.monotonic() - self._checked_at < REGISTRY_REFRESH_INTERVAL:
+            return models
+        return None
+
+    @staticmethod
+    def _current_generation():
+        # Read from the database, so every process sees every change whatever
+        # the cache backend. Saves (and deletes) move these; the router's
+        # performance_metrics writes use update(), which leaves updated_at alone.
+        from django.db.models import Count, Max
+        from .models import AIModel
+
+        try:
+            state = AIModel.objects.aggregate(count=Count('id'), changed=Max('updated_at'))
+        except Exception:
+            return None
+        return state['count'], state['changed']
+
+    @staticmethod
+    def _load() -> Dict[str, object]:
+        from .models import AIModel
+
+        return {model.huggingface_model_id: model for model in AIModel.objects.filter(is_active=True)}
+
+
+class ModelStats:
+    """Moving averages of one model's latency, error rate and throughput."""
+
+    __slots__ = ('latency', 'error_rate', 'throughput', 'requests', 'window_requests', 'window_started')
+
+    def __init__(self, persisted: Optional[Dict] = None):
+        # Latency and error rate start from the persisted figures of all
+        # processes; counts are this process's own.
+        persisted = persisted or {}
+        latency_ms = persisted.get('ewma_latency_ms')
+        self.latency = latency_ms / 1000 if latency_ms is not None else None
+        self.error_rate = persisted.get('error_rate', 0.0)
+        self.throughput = 0.0
+        self.requests = 0
+        self.window_requests = 0
+        self.window_started = time.monotonic()
+
+    def record(self, latency: float, error: bool):
+        if not error:
+            self.latency = latency if self.latency is None else (
+                EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency
+            )
+        self.error_rate = EWMA_ALPHA * float(error) + (1 - EWMA_ALPHA) * self.error_rate
+        self.requests += 1
+        self.window_requests += 1
+
+    def roll_window(self):
+        """Fold the requests since the last roll into the throughput average."""
+        now = time.monotonic()
+        elapsed = now - self.window_started
+        if elapsed > 0:
+            rate = self.window_requests / elapsed
+            self.throughput = EWMA_ALPHA * rate + (1 - EWMA_ALPHA) * self.throughput
+        self.window_requests = 0
+        self.window_started = now
+
+    def as_metrics(self) -> Dict:
+        return {
+            'ewma_latency_ms': round(self.latency * 1000, 2) if self.latency is not None else None,
+            'error_rate': round(self.error_rate, 4),
+            'throughput_rps': round(self.throughput, 4),
+            'requests': self.requests,
+            'updated_at': timezone.now().isoformat(),
+        }
+
+
+class ModelRouter:
+    """Picks a model per request type from live latency and error statistics."""
+
+    def __init__(self, registry: ModelRegistry):
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._stats: Dict[str, ModelStats] = {}
+        self._persister = None
+
+    def record(self, model_name: str, latency: float, error: bool = False):
+        """Record the outcome of one call to model_name."""
+        with self._lock:
+            stats = self._stats.get(model_name)
+            if stats is None:
+                stats = self._stats[model_name] = ModelStats(self._persisted(model_name))
+            stats.record(latency, error)
+        if self._persister is None or not self._persister.is_alive():
+            self._start_persister()
+
+    def route(self, model_type: str):
+        """Return the AIModel to use for model_type, or None if none is active."""
+        return self._choose(model_type, self.registry.models())
+
+    async def aroute(self, model_type: str):
+        return self._choose(model_type, await self.registry.amodels())
+
+    def model_name(self, model_type: str) -> str:
+        """Hugging Face id for model_type, falling back to settings.AI_MODELS."""
+        model = self.route(model_type)
+        return model.huggingface_model_id if model else settings.AI_MODELS[model_type]
+
+    async def amodel_name(self, model_type: str) -> str:
+        model = await self.aroute(model_type)
+        return model.huggingface_model_id if model else settings.AI_MODELS[model_type]
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: stats.as_metrics() for name, stats in self._stats.items()}
+
+    def persist(self):
+        """Merge this process's statistics into AIModel.performance_metrics."""
+        from django.db import close_old_connections, transaction
+        from .models import AIModel
+
+        with self._lock:
+            for stats in self._stats.values():
+                stats.roll_window()
+            snapshot = {name: stats.as_metrics() for name, stats in self._stats.items()}
+        if not snapshot:
+            return
+
+        max_age = STALE_PROCESS_INTERVALS * settings.AI_ROUTER_PERSIST_INTERVAL
+        close_old_connections()
+        try:
+            # The row lock keeps processes persisting at once from losing each other's entries.
+            with transaction.atomic():
+                rows = AIModel.objects.select_for_update().filter(
+                    huggingface_model_id__in=list(snapshot), is_active=True
+                )
+                for model in rows:
+                    merged = merge_metrics(
+                        model.performance_metrics, snapshot[model.huggingface_model_id], max_age
+                    )
+                    # update() skips post_save and updated_at, so routine writes don't reload anything.
+                    AIModel.objects.filter(pk=model.pk).update(performance_metrics=merged)
+        except Exception as e:
+            logger.error(f"Error persisting model performance metrics: {str(e)}")
+        finally:
+            close_old_connections()
+
+    def _choose(self, model_type: str, models: Dict[str, object]):
+        candidates = [model for model in models.values() if model.model_type == model_type]
+        if not candidates:
+            return None
+
+        from .resilience import get_upstream_guard
+
+        guard = get_upstream_guard()
+        slo = settings.AI_LATENCY_SLO_MS.get(model_type)
+        with self._lock:
+            scored = [(model, self._stats.get(model.huggingface_model_id)) for model in candidates]
+
+        def healthy(model, stats) -> bool:
+            if guard.breaker(model.huggingface_model_id).state == 'open':
+                return False
+            if stats is None:
+                return True
+            within_slo = slo is None or stats.latency is None or stats.latency * 1000 <= slo
+            return within_slo and stats.error_rate <= MAX_ERROR_RATE
+
+        def rank(item):
+            model, stats = item
+            latency = stats.latency if stats and stats.latency is not None else 0.0
+            error_rate = stats.error_rate if stats else 0.0
+            return (-model.configuration.get('priority', 0), error_rate, latency)
+
+        eligible = [item for item in scored if healthy(*item)]
+        if eligible:
+            return min(eligible, key=rank)[0]
+        # Nothing meets the SLO: take the fastest model that is left.
+        return min(
+            scored,
+            key=lambda item: item[1].latency if item[1] and item[1].latency is not None else float('inf')
+        )[0]
+
+    def _persisted(self, model_name: str) -> Optional[Dict]:
+        models = self.registry._fresh() or {}
+        model = models.get(model_name)
+        return model.performance_metrics if model is not None else None
+
+    def _start_persister(self):
+        with self._lock:
+            if self._persister is not None and self._persister.is_alive():
+                return
+            self._persister = threading.Thread(target=self._run, name='ai-router-persister', daemon=True)
+            self._persister.start()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.AI_ROUTER_PERSIST_INTERVAL)
+            self.persist()
+
+
+def merge_metrics(existing: Optional[Dict], metrics: Dict, max_age: float) -> Dict:
+    """
+    performance_metrics with this process's metrics merged in.
+
+    Requests and throughput are summed over the processes that reported in
+    the last max_age seconds; latency and error rate are their
+    request-weighted means.
+    """
+    from django.utils.dateparse import parse_datetime
+
+    processes = dict((existing or {}).get('processes') or {})
+    processes[PROCESS_ID] = metrics
+    cutoff = timezone.now().timestamp() - max_age
+    processes = {
+        name: entry for name, entry in processes.items()
+        if entry.get('updated_at') and parse_datetime(entry['updated_at']).timestamp() >= cutoff
+    }
+
+    def weighted_mean(field):
+        pairs = [(entry[field], max(entry.get('requests', 0), 1))
+                 for entry in processes.values() if entry.get(field) is not None]
+        if not pairs:
+            return None
+        return sum(value * weight for value, weight in pairs) / sum(weight for _, weight in pairs)
+
+    entries = list(processes.values())
+    latency_ms = weighted_mean('ewma_latency_ms')
+    return {
+        'ewma_latency_ms': round(latency_ms, 2) if latency_ms is not None else None,
+        'error_rate': round(weighted_mean('error_rate') or 0.0, 4),
+        'throughput_rps': round(sum(entry.get('throughput_rps', 0.0) for entry in entries), 4),
+        'requests': sum(entry.get('requests', 0) for entry in entries),
+        'updated_at': metrics['updated_at'],
+        'processes': processes,
+    }
+
+
+_registry = ModelRegistry()
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    return _registry
+
+
+def get_model_router() -> ModelRouter:
+    """Return the process-wide model router."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter(_registry)
+    return _router
@@ -0,0 +1,511 @@
+"""
+Template-based code generation for structured requests.
+
+Django models with a ``fields`` list, plain CRUD endpoints and form, table
+or detail components with typed ``props`` are rendered straight from
+templates in milliseconds. Each generator returns None when the request is
+free-form (behaviour described in prose, unknown field types, no clear
+resource name), and the caller falls back to the model.
+"""
+import keyword
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import Counter
+
+scaffold_requests = Counter(
+    'ai_scaffold_requests_total',
+    'Generation requests by kind and path (scaffold, model).',
+    ('kind', 'path'),
+)
+
+# Words that describe behaviour rather than structure; their presence means
+# the description needs the model.
+FREE_FORM_WORDS = {
+    'that', 'which', 'who', 'when', 'whenever', 'where', 'if', 'unless', 'should', 'must', 'so',
+    'calculate', 'calculates', 'compute', 'computes', 'validate', 'validates', 'send', 'sends',
+}
+# Words after which a description lists fields instead of naming the resource.
+LIST_WORDS = {'with', 'having', 'including', 'containing'}
+# Words that qualify which records or what behaviour is wanted; a resource name
+# is a bare noun phrase, so any of these (like numbers and participles) in it
+# means the description needs the model.
+QUALIFIER_WORDS = {
+    'and', 'or', 'by', 'via', 'from', 'using', 'through', 'without', 'except', 'only', 'per', 'each',
+    'every', 'between', 'within', 'above', 'below', 'over', 'under', 'after', 'before', 'since', 'until',
+    'into', 'in', 'on', 'at', 'recent', 'latest', 'newest', 'oldest', 'top', 'bottom', 'first', 'last',
+    'popular', 'active', 'inactive', 'current', 'my', 'their', 'other', 'returning', 'matching',
+}
+# Nouns whose singular is spelled like the plural.
+INVARIANT_PLURALS = {'news', 'series', 'species', 'means', 'headquarters', 'crossroads', 'diabetes',
+                     'physics', 'mathematics', 'economics', 'politics', 'athletics', 'logistics'}
+CRUD_WORDS = {'crud', 'list', 'create', 'retrieve', 'update', 'delete', 'manage', 'managing', 'endpoint',
+              'endpoints', 'api', 'rest', 'restful', 'viewset', 'read', 'edit'}
+COMPONENT_KINDS = {
+    'form': 'form', 'editor': 'form',
+    'table': 'table', 'list': 'table', 'grid': 'table',
+    'detail': 'detail', 'details': 'detail', 'card': 'detail', 'view': 'detail',
+}
+FILLER_WORDS = {'a', 'an', 'the', 'for', 'of', 'to', 'all', 'new', 'simple', 'basic', 'plain', 'django',
+                'model', 'models', 'react', 'component', 'create', 'generate', 'make', 'build', 'page',
+                'representing', 'store', 'storing', 'single'}
+
+# Field type -> (Django field, TypeScript type, HTML input type)
+FIELD_TYPES = {
+    'char': ('CharField', 'string', 'text'),
+    'string': ('CharField', 'string', 'text'),
+    'str': ('CharField', 'string', 'text'),
+    'text': ('TextField', 'string', 'textarea'),
+    'slug': ('SlugField', 'string', 'text'),
+    'email': ('EmailField', 'string', 'email'),
+    'url': ('URLField', 'string', 'url'),
+    'uuid': ('UUIDField', 'string', 'text'),
+    'integer': ('IntegerField', 'number', 'number'),
+    'int': ('IntegerField', 'number', 'number'),
+    'biginteger': ('BigIntegerField', 'number', 'number'),
+    'positiveinteger': ('PositiveIntegerField', 'number', 'number'),
+    'float': ('FloatField', 'number', 'number'),
+    'number': ('FloatField', 'number', 'number'),
+    'decimal': ('DecimalField', 'number', 'number'),
+    'boolean': ('BooleanField', 'boolean', 'checkbox'),
+    'bool': ('BooleanField', 'boolean', 'checkbox'),
+    'date': ('DateField', 'string', 'date'),
+    'datetime': ('DateTimeField', 'string', 'datetime-local'),
+    'time': ('TimeField', 'string', 'time'),
+    'json': ('JSONField', 'Record<string, unknown>', None),
+    'file': ('FileField', 'string', None),
+    'image': ('ImageField', 'string', None),
+    'foreignkey': ('ForeignKey', 'number', 'number'),
+    'fk': ('ForeignKey', 'number', 'number'),
+    'onetoone': ('OneToOneField', 'number', 'number'),
+    'manytomany': ('ManyToManyField', 'number[]', None),
+}
+RELATION_FIELDS = {'ForeignKey', 'OneToOneField', 'ManyToManyField'}
+STRING_FIELDS = {'CharField', 'TextField', 'SlugField', 'EmailField', 'URLField'}
+ON_DELETE = {'cascade': 'CASCADE', 'protect': 'PROTECT', 'set_null': 'SET_NULL', 'restrict': 'RESTRICT'}
+
+
+class Field:
+    """One normalized field spec."""
+
+    __slots__ = ('name', 'django_type', 'ts_type', 'input_type', 'spec')
+
+    def __init__(self, name: str, django_type: str, ts_type: str, input_type: Optional[str], spec: Dict):
+        self.name = name
+        self.django_type = django_type
+        self.ts_type = ts_type
+        self.input_type = input_type
+        self.spec = spec
+
+    @property
+    def required(self) -> bool:
+        return bool(self.spec.get('required', True))
+
+    @property
+    def label(self) -> str:
+        return self.spec.get('label') or self.name.replace('_', ' ').capitalize()
+
+    @property
+    def target(self) -> Optional[str]:
+        """Model reference of a relation field, as written in the generated code."""
+        if self.django_type not in RELATION_FIELDS:
+            return None
+        return _relation_target(self.spec.get('to') or self.spec.get('related_model'))
+
+    @property
+    def camel_name(self) -> str:
+        head, *rest = self.name.split('_')
+        return head + ''.join(part.capitalize() for part in rest)
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r'[A-Za-z][A-Za-z0-9]*', text or '')
+
+
+def _identifier(name) -> Optional[str]:
+    if not isinstance(name, str):
+        return None
+    name = re.sub(r'[\s\-]+', '_', name.strip())
+    name = re.sub(r'(?<=[a-z0-9])([A-Z])', r'_\1', name).lower()
+    if not re.fullmatch(r'[a-z_][a-z0-9_]*', name) or keyword.iskeyword(name):
+        return None
+    return name
+
+
+def _singular(word: str) -> str:
+    lower = word.lower()
+    if lower in INVARIANT_PLURALS:
+        return word
+    if lower.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if lower.endswith(('sses', 'xes', 'ches', 'shes')):
+        return word[:-2]
+    if lower.endswith('s') and not lower.endswith(('ss', 'us', 'is')) and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def _type_key(value) -> str:
+    key = re.sub(r'[\s_\-]', '', str(value or '')).lower()
+    return key[:-len('field')] if key.endswith('field') and key != 'field' else key
+
+
+def is_free_form(description: str) -> bool:
+    return any(word.lower() in FREE_FORM_WORDS for word in _words(description))
+
+
+def _is_noun(word: str) -> bool:
+    """False for numbers, qualifiers and past participles ("filtered", "paginated")."""
+    lower = word.lower()
+    if lower[:1].isdigit() or lower in QUALIFIER_WORDS:
+        return False
+    return not (lower.endswith('ed') and not lower.endswith('eed') and len(lower) > 4)
+
+
+def resource_name(description: str, extra_stopwords=(), strict: bool = False) -> Optional[str]:
+    """
+    CamelCase resource name from a short description, e.g. "Blog posts with
+    a title" -> "BlogPost". None when the description is free-form or the
+    name is not a bare noun phrase of at most three words. Unless strict,
+    a field list may follow the name ("with ...").
+    """
+    if is_free_form(description):
+        return None
+    name = []
+    for word in re.findall(r'[A-Za-z][A-Za-z0-9]*|\d[\w.]*', description or ''):
+        lower = word.lower()
+        if lower in LIST_WORDS:
+            if strict:
+                return None
+            break
+        if lower in FILLER_WORDS or lower in extra_stopwords:
+            continue
+        if not _is_noun(word):
+            return None
+        name.append(word)
+    if not name or len(name) > 3:
+        return None
+    name[-1] = _singular(name[-1])
+    return ''.join(word[:1].upper() + word[1:] for word in name)
+
+
+def parse_fields(fields) -> Optional[List[Field]]:
+    """Normalize a list of field specs, or None if any of them is not structured."""
+    if not isinstance(fields, list) or not fields:
+        return None
+    parsed, seen = [], set()
+    for spec in fields:
+        if isinstance(spec, str):
+            spec = {'name': spec, 'type': 'string'}
+        if not isinstance(spec, dict):
+            return None
+        name = _identifier(spec.get('name'))
+        types = FIELD_TYPES.get(_type_key(spec.get('type', 'string')))
+        if name is None or types is None or name in seen or name == 'id':
+            return None
+        target = str(spec.get('to') or spec.get('related_model') or '')
+        if types[0] in RELATION_FIELDS and target != 'self' and not resource_name(target):
+            return None
+        seen.add(name)
+        parsed.append(Field(name, *types, spec))
+    return parsed
+
+
+def parse_props(props) -> Optional[List[Field]]:
+    """Typed props ({name: type} or {name: {type: ...}}) as fields."""
+    if not isinstance(props, dict) or not props:
+        return None
+    specs = []
+    for name, value in props.items():
+        spec = dict(value) if isinstance(value, dict) else {'type': value}
+        spec['name'] = name
+        specs.append(spec)
+    fields = parse_fields(specs)
+    if fields is None or any(field.input_type is None for field in fields):
+        return None
+    return fields
+
+
+def _docstring(description: str) -> str:
+    text = ' '.join((description or '').split()).replace('"""', "'''").replace('\\', '')
+    return text[:1].upper() + text[1:] if text else ''
+
+
+def _relation_target(target: str) -> str:
+    if target.lower() in ('user', 'auth.user'):
+        return 'settings.AUTH_USER_MODEL'
+    if target == 'self' or '.' in target:
+        return repr(target)
+    return repr(resource_name(target))
+
+
+def _model_field(field: Field, related_name: Optional[str] = None) -> str:
+    spec = field.spec
+    args = []
+    if field.django_type in RELATION_FIELDS:
+        args.append(field.target)
+        if field.django_type != 'ManyToManyField':
+            on_delete = ON_DELETE.get(str(spec.get('on_delete', 'cascade')).lower(), 'CASCADE')
+            if not field.required and on_delete == 'CASCADE':
+                on_delete = 'SET_NULL'
+            args.append(f'on_delete=models.{on_delete}')
+        related_name = spec.get('related_name', related_name)
+        if related_name:
+            args.append(f'related_name={related_name!r}')
+    if field.django_type == 'CharField':
+        args.append(f"max_length={int(spec.get('max_length', 255))}")
+    elif field.django_type == 'DecimalField':
+        args.append(f"max_digits={int(spec.get('max_digits', 10))}")
+        args.append(f"decimal_places={int(spec.get('decimal_places', 2))}")
+    elif field.django_type in ('FileField', 'ImageField'):
+        args.append(f"upload_to={spec.get('upload_to', field.name + '/')!r}")
+    if spec.get('choices'):
+        choices = ', '.join(f"({choice!r}, {str(choice).replace('_', ' ').capitalize()!r})"
+                            for choice in spec['choices'])
+        args.append(f'choices=[{choices}]')
+    if spec.get('unique'):
+        args.append('unique=True')
+    if 'default' in spec:
+        args.append(f"default={spec['default']!r}")
+    elif field.django_type == 'BooleanField':
+        args.append('default=False')
+    if not field.required and field.django_type != 'BooleanField':
+        if field.django_type not in STRING_FIELDS and field.django_type != 'ManyToManyField':
+            args.append('null=True')
+        args.append('blank=True')
+    if spec.get('help_text'):
+        args.append(f"help_text={spec['help_text']!r}")
+    return f"    {field.name} = models.{field.django_type}({', '.join(args)})"
+
+
+def django_model(description: str, fields) -> Optional[str]:
+    """A Django model for a description and a list of field specs."""
+    parsed = parse_fields(fields)
+    name = resource_name(description)
+    if parsed is None or name is None:
+        return None
+
+    display = next((field.name for field in parsed if field.django_type in STRING_FIELDS), None)
+    # Several relations to one model need distinct reverse accessors.
+    targets = [field.target for field in parsed if field.target]
+    body = []
+    for field in parsed:
+        clashes = field.target and targets.count(field.target) > 1
+        body.append(_model_field(field, f'{_identifier(name)}_{field.name}_set' if clashes else None))
+    imports = ['from django.db import models']
+    if any('settings.AUTH_USER_MODEL' in line for line in body):
+        imports.insert(0, 'from django.conf import settings')
+    lines = imports + ['', '', f'class {name}(models.Model):']
+    docstring = _docstring(description)
+    if docstring:
+        lines += [f'    """{docstring}"""', '']
+    lines += body
+    lines += ['', '    def __str__(self):', f"        return {f'self.{display}' if display else 'str(self.pk)'}"]
+    return '\n'.join(lines) + '\n'
+
+
+def drf_serializer(name: str, fields: Optional[List[Field]] = None) -> str:
+    field_list = "'__all__'" if not fields else repr(['id'] + [field.name for field in fields])
+    return '\n'.join([
+        f'class {name}Serializer(serializers.ModelSerializer):',
+        '    class Meta:',
+        f'        model = {name}',
+        f'        fields = {field_list}',
+    ])
+
+
+def drf_viewset(name: str, read_only: bool = False) -> str:
+    base = 'ReadOnlyModelViewSet' if read_only else 'ModelViewSet'
+    return '\n'.join([
+        f'class {name}ViewSet(viewsets.{base}):',
+        f'    queryset = {name}.objects.all()',
+        f'    serializer_class = {name}Serializer',
+        '    permission_classes = [IsAuthenticated]',
+    ])
+
+
+def api_endpoint(description: str, method: str = 'GET', fields=None) -> Optional[str]:
+    """Serializer and viewset for a plain CRUD endpoint description."""
+    words = {word.lower() for word in _words(description)}
+    if not words & CRUD_WORDS:
+        return None
+    # Every word must be a CRUD word, filler or the resource: "orders filtered
+    # by status" or "top 10 products" describe a query the template can't write.
+    name = resource_name(description, CRUD_WORDS, strict=True)
+    if name is None:
+        return None
+
+    parsed = parse_fields(fields) if fields else None
+    read_only = (method or 'GET').upper() == 'GET' and not words & {'crud', 'create', 'update', 'delete',
+                                                                     'manage', 'managing', 'edit'}
+    return '\n'.join([
+        'from rest_framework import serializers, viewsets',
+        'from rest_framework.permissions import IsAuthenticated',
+        '',
+        f'from .models import {name}',
+        '',
+        '',
+        drf_serializer(name, parsed),
+        '',
+        '',
+        drf_viewset(name, read_only),
+    ]) + '\n'
+
+
+def _component_kind(description: str) -> Optional[Tuple[str, str]]:
+    kinds = [COMPONENT_KINDS[word.lower()] for word in _words(description) if word.lower() in COMPONENT_KINDS]
+    if len(set(kinds)) != 1:
+        return None
+    name = resource_name(description, COMPONENT_KINDS)
+    return (kinds[0], name) if name else None
+
+
+def _form_input(field: Field) -> List[str]:
+    value = f'values.{field.camel_name}'
+    if field.input_type == 'checkbox':
+        return [
+            '      <label>',
+            '        <input',
+            '          type="checkbox"',
+            f'          checked={{{value}}}',
+            f'          onChange={{(e) => update("{field.camel_name}", e.target.checked)}}',
+            '        />',
+            f'        {field.label}',
+            '      </label>',
+        ]
+    convert = 'Number(e.target.value)' if field.ts_type == 'number' else 'e.target.value'
+    tag = 'textarea' if field.input_type == 'textarea' else 'input'
+    attributes = [] if tag == 'textarea' else [f'          type="{field.input_type}"']
+    if field.required:
+        attributes.append('          required')
+    return [
+        '      <label>',
+        f'        {field.label}',
+        f'        <{tag}',
+        *attributes,
+        f'          value={{{value}}}',
+        f'          onChange={{(e) => update("{field.camel_name}", {convert})}}',
+        '        />',
+        '      </label>',
+    ]
+
+
+def _empty_value(field: Field) -> str:
+    return {'number': '0', 'boolean': 'false'}.get(field.ts_type, '""')
+
+
+def _display(field: Field, record: str) -> str:
+    value = f'{record}.{field.camel_name}'
+    if field.ts_type == 'boolean':
+        return f'{{{value} ? "Yes" : "No"}}'
+    return f'{{{value}}}'
+
+
+def react_component(description: str, props) -> Optional[str]:
+    """A form, table or detail component over typed props."""
+    parsed = parse_props(props)
+    detected = _component_kind(description)
+    if parsed is None or detected is None:
+        return None
+    kind, name = detected
+
+    interface = [f'export interface {name} {{']
+    interface += [f'  {field.camel_name}{"" if field.required else "?"}: {field.ts_type};' for field in parsed]
+    interface += ['}']
+
+    if kind == 'form':
+        body = [
+            "import React, { useState } from 'react';",
+            '',
+            *interface,
+            '',
+            f'interface {name}FormProps {{',
+            f'  initialValues?: Partial<{name}>;',
+            f'  onSubmit: (values: {name}) => void;',
+            '}',
+            '',
+            f'export default function {name}Form({{ initialValues, onSubmit }}: {name}FormProps) {{',
+            f'  const [values, setValues] = useState<{name}>({{',
+            *[f'    {field.camel_name}: {_empty_value(field)},' for field in parsed],
+            '    ...initialValues,',
+            '  });',
+            '',
+            f'  const update = <K extends keyof {name}>(key: K, value: {name}[K]) =>',
+            '    setValues((current) => ({ ...current, [key]: value }));',
+            '',
+            '  return (',
+            '    <form',
+            '      onSubmit={(e) => {',
+            '        e.preventDefault();',
+            '        onSubmit(values);',
+            '      }}',
+            '    >',
+            *[line for field in parsed for line in _form_input(field)],
+            '      <button type="submit">Save</button>',
+            '    </form>',
+            '  );',
+            '}',
+        ]
+    elif kind == 'table':
+        body = [
+            "import React from 'react';",
+            '',
+            *interface,
+            '',
+            f'interface {name}TableProps {{',
+            f'  items: {name}[];',
+            '}',
+            '',
+            f'export default function {name}Table({{ items }}: {name}TableProps) {{',
+            '  return (',
+            '    <table>',
+            '      <thead>',
+            '        <tr>',
+            *[f'          <th>{field.label}</th>' for field in parsed],
+            '        </tr>',
+            '      </thead>',
+            '      <tbody>',
+            '        {items.map((item, index) => (',
+            '          <tr key={index}>',
+            *[f'            <td>{_display(field, "item")}</td>' for field in parsed],
+            '          </tr>',
+            '        ))}',
+            '      </tbody>',
+            '    </table>',
+            '  );',
+            '}',
+        ]
+    else:
+        body = [
+            "import React from 'react';",
+            '',
+            *interface,
+            '',
+            f'export default function {name}Detail({{ item }}: {{ item: {name} }}) {{',
+            '  return (',
+            '    <dl>',
+            *[line for field in parsed for line in (
+                f'      <dt>{field.label}</dt>',
+                f'      <dd>{_display(field, "item")}</dd>',
+            )],
+            '    </dl>',
+            '  );',
+            '}',
+        ]
+    return '\n'.join(body) + '\n'
+
+
+def record(kind: str, scaffolded: bool):
+    scaffold_requests.inc(kind=kind, path='scaffold' if scaffolded else 'model')
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Per-kind request counts and the share served by templates in this process."""
+    stats = {}
+    for labels, count in scaffold_requests.samples():
+        kind = stats.setdefault(labels['kind'], {'scaffold': 0, 'model': 0})
+        kind[labels['path']] = count
+    for kind in stats.values():
+        total = kind['scaffold'] + kind['model']
+        kind['fast_path_share'] = kind['scaffold'] / total if total else 0.0
+    return stats
@@ -2,7 +2,9 @@
 Serializers for AI Engine models.
 """
 from rest_framework import serializers
-from .models import AIModel, CodeSuggestion, TrainingData
+from api.models import Project
+from .dedup import ingest
+from .models import AIModel, CodeSuggestion, GenerationJob, TrainingData
 
 
 class AIModelSerializer(serializers.ModelSerializer):
@@ -41,3 +43,35 @@ class TrainingDataSerializer(serializers.ModelSerializer):
             'quality_score', 'usage_count', 'created_at'
         ]
         read_only_fields = ['id', 'usage_count', 'created_at']
+    
+    def create(self, validated_data):
+        # A near-duplicate of a stored snippet is merged into it instead.
+        row, _ = ingest(**validated_data)
+        return row
+
+
+class GenerationJobSerializer(serializers.ModelSerializer):
+    """Serializer for GenerationJob."""
+    
+    class Meta:
+        model = GenerationJob
+        fields = [
+            'id', 'project', 'kind', 'idempotency_key', 'parameters', 'status',
+            'result', 'error', 'suggestion', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'result', 'error', 'suggestion',
+            'created_at', 'started_at', 'finished_at'
+        ]
+    
+    def validate_project(self, project):
+        user = self.context['request'].user
+        if project and not Project.objects.accessible_to(user).filter(pk=project.pk).exists():
+            raise serializers.ValidationError('Project not found')
+        return project
+    
+    def validate(self, attrs):
+        required = 'context' if attrs['kind'] == 'completion' else 'description'
+        if not attrs.get('parameters', {}).get(required):
+            raise serializers.ValidationError({'parameters': f'{required} is required'})
+        return attrs
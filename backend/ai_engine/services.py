@@ -1,19 +1,55 @@
 """
 AI Engine services for code generation and analysis.
 """
-import requests
+import asyncio
 import json
 import logging
-from typing import Dict, List, Optional
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Union
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from .backends import aiter_in_thread, get_backend_selector, get_local_backend
+from .batching import CompletionBatcher
+from .cache import PromptCache, get_prompt_cache
+from .clients import get_inference_client, get_async_inference_client
+from .context import (
+    PromptContext, add_examples, build_context, get_tokenizer, input_tokens, strip_prompt, trimmed_tokens,
+)
+from .metrics import Counter
 from .models import AIModel, CodeSuggestion, TrainingData
+from .resilience import get_upstream_guard
+from .retrieval import related_examples
+from .router import get_model_router
+from . import analysis, scaffolding
+from .singleflight import SingleFlight, AsyncSingleFlight
+from .telemetry import generated_tokens, observe_call, observe_payload, time_to_first_token
 
 logger = logging.getLogger(__name__)
 
+fallbacks = Counter(
+    'ai_fallbacks_total',
+    'Calls served by a fallback model after the primary failed or was unavailable.',
+    ('model', 'fallback'),
+)
+
 
 class HuggingFaceService:
     """Service for interacting with Hugging Face API."""
     
+    GENERATION_PARAMETERS = {
+        'max_new_tokens': 200,
+        'temperature': 0.7,
+        'do_sample': True,
+        'top_p': 0.95
+    }
+    
+    COMPLETION_PARAMETERS = {
+        'max_new_tokens': 100,
+        'temperature': 0.3,
+        'do_sample': True
+    }
+    
     def __init__(self):
         self.api_token = settings.HUGGINGFACE_API_TOKEN
         self.api_url = settings.HUGGINGFACE_API_URL
@@ -21,103 +57,585 @@ class HuggingFaceService:
             'Authorization': f'Bearer {self.api_token}',
             'Content-Type': 'application/json'
         }
+        self.client = get_inference_client()
+        self.backends = get_backend_selector()
+        self.guard = get_upstream_guard()
+        self.router = get_model_router()
+        self.flight = SingleFlight()
+        self.async_flight = AsyncSingleFlight()
+        self.batcher = None
+        if settings.AI_BATCH_ENABLED:
+            self.batcher = CompletionBatcher(
+                lambda model_name, inputs, parameters: self._send_batch(
+                    model_name, inputs, parameters, operation='complete'
+                ),
+                max_batch_size=settings.AI_BATCH_MAX_SIZE,
+                max_wait=settings.AI_BATCH_MAX_WAIT_MS / 1000,
+                max_concurrency=settings.AI_BATCH_MAX_CONCURRENCY,
+            )
     
-    def generate_code(self, prompt: str, model_name: str = 'bigcode/starcoder') -> Optional[str]:
-        """Generate code using Hugging Face model."""
+    def generate_code(self, prompt: str, model_name: Optional[str] = None, language: Optional[str] = None,
+                      project_id=None) -> Optional[str]:
+        """
+        Generate code, with the routed code_generation model unless model_name is given.
+        
+        language and project_id select the examples added to the prompt (see prepare_prompt).
+        """
         try:
-            url = f"{self.api_url}/{model_name}"
-            payload = {
-                'inputs': prompt,
-                'parameters': {
-                    'max_new_tokens': 200,
-                    'temperature': 0.7,
-                    'do_sample': True,
-                    'top_p': 0.95
-                }
-            }
-            
-            response = requests.post(url, headers=self.headers, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0:
-                return result[0].get('generated_text', '').replace(prompt, '').strip()
-            
-            return None
-            
+            model_name = model_name or self.router.model_name('code_generation')
+            prompt = self.prepare_prompt(prompt, model_name, 'generate', language=language,
+                                         project_id=project_id).text
+            return self._generate(prompt, model_name, self.GENERATION_PARAMETERS)
         except Exception as e:
             logger.error(f"Error generating code: {str(e)}")
             return None
     
-    def complete_code(self, context: str, model_name: str = 'Salesforce/codet5p-2b') -> Optional[str]:
-        """Complete code using Hugging Face model."""
+    def complete_code(self, context: Union[str, PromptContext], model_name: Optional[str] = None,
+                      scope: Optional[str] = None, cursor_line: Optional[int] = None) -> Optional[str]:
+        """
+        Complete code, with the routed code_completion model unless model_name is given.
+        
+        scope identifies the editor (e.g. session and file) so local models
+        can reuse the encoded prefix of its previous contexts. A str context
+        is trimmed to the model's input budget around cursor_line.
+        """
         try:
-            url = f"{self.api_url}/{model_name}"
-            payload = {
-                'inputs': context,
-                'parameters': {
-                    'max_new_tokens': 100,
-                    'temperature': 0.3,
-                    'do_sample': True
-                }
-            }
-            
-            response = requests.post(url, headers=self.headers, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0:
-                return result[0].get('generated_text', '').replace(context, '').strip()
-            
+            model_name = model_name or self.router.model_name('code_completion')
+            if not isinstance(context, PromptContext):
+                context = self.prepare_prompt(context, model_name, 'complete', cursor_line)
+            return self._generate(context.text, model_name, self.COMPLETION_PARAMETERS, batch=True, scope=scope)
+        except Exception as e:
+            logger.error(f"Error completing code: {str(e)}")
             return None
-            
+    
+    async def agenerate_code(self, prompt: str, model_name: Optional[str] = None, language: Optional[str] = None,
+                             project_id=None) -> Optional[str]:
+        """Async variant of generate_code for use inside consumers."""
+        try:
+            model_name = model_name or await self.router.amodel_name('code_generation')
+            prompt = (await self.aprepare_prompt(prompt, model_name, 'generate', language=language,
+                                                 project_id=project_id)).text
+            return await self._agenerate(prompt, model_name, self.GENERATION_PARAMETERS)
+        except Exception as e:
+            logger.error(f"Error generating code: {str(e)}")
+            return None
+    
+    async def acomplete_code(self, context: Union[str, PromptContext], model_name: Optional[str] = None,
+                             scope: Optional[str] = None, cursor_line: Optional[int] = None) -> Optional[str]:
+        """Async variant of complete_code for use inside consumers."""
+        try:
+            model_name = model_name or await self.router.amodel_name('code_completion')
+            if not isinstance(context, PromptContext):
+                context = await self.aprepare_prompt(context, model_name, 'complete', cursor_line)
+            return await self._agenerate(
+                context.text, model_name, self.COMPLETION_PARAMETERS, batch=True, scope=scope
+            )
         except Exception as e:
             logger.error(f"Error completing code: {str(e)}")
             return None
     
-    def analyze_code(self, code: str, model_name: str = 'microsoft/codebert-base') -> Dict:
-        """Analyze code for issues and suggestions."""
+    def stream_code(self, prompt: Union[str, PromptContext], model_name: Optional[str] = None,
+                    parameters: Optional[Dict] = None, scope: Optional[str] = None) -> Iterator[str]:
+        """Yield generated text incrementally as the model produces it."""
+        model_name = model_name or self.router.model_name('code_generation')
+        if not isinstance(prompt, PromptContext):
+            prompt = self.prepare_prompt(prompt, model_name, 'stream')
+        prompt = prompt.text
+        parameters = parameters or self.GENERATION_PARAMETERS
+        start = time.perf_counter()
+        local = self.backends.local_config(model_name)
+        if local is not None:
+            yield from self._observe_first_token(
+                get_local_backend().stream(model_name, prompt, parameters, local, scope), model_name, start
+            )
+            return
+        
+        def open_stream(timeout):
+            response = self.client.post(
+                f"{self.api_url}/{model_name}",
+                headers=self.headers,
+                payload={'inputs': prompt, 'parameters': parameters, 'stream': True},
+                stream=True,
+            )
+            try:
+                response.raise_for_status()
+            except Exception:
+                response.close()
+                raise
+            return response
+        
+        # Fail fast while the circuit is open; stream durations don't feed timeouts.
+        response = self.guard.call(model_name, open_stream, hedge=False, track_latency=False)
+        sent = len(response.request.body or b'')
         try:
-            # Mock analysis for now - in production, this would use actual AI models
-            analysis = {
-                'complexity_score': 0.7,
-                'maintainability_score': 0.8,
-                'security_issues': [],
-                'performance_suggestions': [
-                    'Consider using React.memo for this component',
-                    'Add error boundaries for better error handling'
-                ],
-                'code_smells': [],
-                'suggestions': [
-                    {
-                        'type': 'optimization',
-                        'message': 'Consider extracting this logic into a custom hook',
-                        'line': 15,
-                        'confidence': 0.85
-                    }
-                ]
-            }
+            if not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+                # Upstream does not stream this model; deliver the whole text at once.
+                result = response.json()
+                text = self._extract_text(result, prompt, model_name)
+                if text:
+                    time_to_first_token.observe(
+                        time.perf_counter() - start, model=model_name, operation='stream'
+                    )
+                    yield text
+                self._observe_stream(model_name, start, sent, len(response.content), generated_tokens(result))
+                return
             
-            return analysis
+            first, received, tokens = True, 0, 0
+            for line in response.iter_lines(decode_unicode=True):
+                received += len(line.encode()) + 1
+                token = self._parse_stream_event(line)
+                if token:
+                    if first:
+                        time_to_first_token.observe(
+                            time.perf_counter() - start, model=model_name, operation='stream'
+                        )
+                        first = False
+                    tokens += 1
+                    yield token
+            self._observe_stream(model_name, start, sent, received, tokens)
+        finally:
+            response.close()
+    
+    async def astream_code(self, prompt: Union[str, PromptContext], model_name: Optional[str] = None,
+                           parameters: Optional[Dict] = None,
+                           scope: Optional[str] = None) -> AsyncIterator[str]:
+        """Async variant of stream_code for use inside consumers."""
+        model_name = model_name or await self.router.amodel_name('code_generation')
+        if not isinstance(prompt, PromptContext):
+            prompt = await self.aprepare_prompt(prompt, model_name, 'stream')
+        prompt = prompt.text
+        parameters = parameters or self.GENERATION_PARAMETERS
+        start = time.perf_counter()
+        local = await self.backends.alocal_config(model_name)
+        if local is not None:
+            first = True
+            async for token in aiter_in_thread(
+                lambda: get_local_backend().stream(model_name, prompt, parameters, local, scope)
+            ):
+                if first:
+                    time_to_first_token.observe(
+                        time.perf_counter() - start, model=model_name, operation='stream'
+                    )
+                    first = False
+                yield token
+            return
+        
+        async def open_stream(timeout):
+            response = await get_async_inference_client().open_stream(
+                f"{self.api_url}/{model_name}",
+                headers=self.headers,
+                payload={'inputs': prompt, 'parameters': parameters, 'stream': True},
+            )
+            try:
+                response.raise_for_status()
+            except Exception:
+                await response.aclose()
+                raise
+            return response
+        
+        response = await self.guard.acall(model_name, open_stream, hedge=False, track_latency=False)
+        sent = len(response.request.content)
+        try:
+            if not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+                await response.aread()
+                result = response.json()
+                text = self._extract_text(result, prompt, model_name)
+                if text:
+                    time_to_first_token.observe(
+                        time.perf_counter() - start, model=model_name, operation='stream'
+                    )
+                    yield text
+                self._observe_stream(model_name, start, sent, len(response.content), generated_tokens(result))
+                return
             
+            first, received, tokens = True, 0, 0
+            async for line in response.aiter_lines():
+                received += len(line.encode()) + 1
+                token = self._parse_stream_event(line)
+                if token:
+                    if first:
+                        time_to_first_token.observe(
+                            time.perf_counter() - start, model=model_name, operation='stream'
+                        )
+                        first = False
+                    tokens += 1
+                    yield token
+            self._observe_stream(model_name, start, sent, received, tokens)
+        finally:
+            await response.aclose()
+    
+    @staticmethod
+    def _observe_first_token(tokens: Iterator[str], model_name: str, start: float) -> Iterator[str]:
+        first = True
+        for token in tokens:
+            if first:
+                time_to_first_token.observe(
+                    time.perf_counter() - start, model=model_name, operation='stream'
+                )
+                first = False
+            yield token
+    
+    @staticmethod
+    def _observe_stream(model_name: str, start: float, sent: int, received: int, tokens: Optional[int]):
+        observe_call(model_name, 'stream', 'remote', time.perf_counter() - start, tokens)
+        observe_payload(model_name, 'stream', sent, received)
+    
+    @staticmethod
+    def _parse_stream_event(line: str) -> Optional[str]:
+        """Return the token text carried by one server-sent event line."""
+        if not line or not line.startswith('data:'):
+            return None
+        try:
+            event = json.loads(line[5:])
+        except ValueError:
+            return None
+        token = event.get('token') or {}
+        if token.get('special'):
+            return None
+        return token.get('text')
+    
+    def prepare_prompt(self, text: str, model_name: str, operation: str = 'generate',
+                       cursor_line: Optional[int] = None, language: Optional[str] = None,
+                       project_id=None) -> PromptContext:
+        """
+        Trim text to model_name's input token budget, keeping the area around cursor_line.
+        
+        Generation prompts also get related examples from the retrieval index:
+        training data in language, and accepted suggestions of project_id only.
+        """
+        examples = self._examples(text, language, project_id) if operation == 'generate' else []
+        return self._build_prompt(
+            text, model_name, self.backends.config(model_name), operation, cursor_line, examples
+        )
+    
+    async def aprepare_prompt(self, text: str, model_name: str, operation: str = 'generate',
+                              cursor_line: Optional[int] = None, language: Optional[str] = None,
+                              project_id=None) -> PromptContext:
+        """Async variant of prepare_prompt; tokenizing runs in a worker thread."""
+        config = await self.backends.aconfig(model_name)
+        examples = []
+        if operation == 'generate':
+            examples = await sync_to_async(self._examples)(text, language, project_id)
+        return await asyncio.to_thread(
+            self._build_prompt, text, model_name, config, operation, cursor_line, examples
+        )
+    
+    @staticmethod
+    def _examples(text: str, language: Optional[str] = None, project_id=None) -> List[str]:
+        try:
+            return related_examples(text, settings.AI_RETRIEVAL_EXAMPLES, language, project_id)
         except Exception as e:
-            logger.error(f"Error analyzing code: {str(e)}")
-            return {}
+            logger.error(f"Error retrieving examples: {str(e)}")
+            return []
+    
+    @staticmethod
+    def _build_prompt(text: str, model_name: str, config: Dict, operation: str,
+                      cursor_line: Optional[int], examples: List[str] = ()) -> PromptContext:
+        budget = int(config.get('max_input_tokens') or settings.AI_CONTEXT_MAX_TOKENS)
+        tokenizer = get_tokenizer(model_name)
+        prompt = build_context(text, budget, tokenizer, cursor_line)
+        if prompt.trimmed:
+            trimmed_tokens.inc(prompt.original_tokens - prompt.input_tokens, model=model_name, operation=operation)
+        if examples:
+            prompt = add_examples(prompt, examples, budget, tokenizer)
+        input_tokens.observe(prompt.input_tokens, model=model_name, operation=operation)
+        return prompt
+    
+    def _generate(self, inputs: str, model_name: str, parameters: Dict,
+                  batch: bool = False, scope: Optional[str] = None) -> Optional[str]:
+        key = PromptCache.fingerprint(model_name, inputs, parameters)
+        operation = 'complete' if batch else 'generate'
+        cache = self._cache_for(parameters)
+        if cache is not None:
+            cached = cache.get(model_name, key)
+            if cached is not None:
+                return cached
+        
+        def fetch():
+            local = self.backends.local_config(model_name) if scope is not None else None
+            if local is not None:
+                # Prefix reuse works per prompt, so scoped local calls skip the batcher.
+                result = get_local_backend().submit(
+                    model_name, [inputs], parameters, local, scope, operation=operation
+                ).result()[0]
+            elif batch and self.batcher is not None:
+                result = self.batcher.submit(model_name, parameters, inputs)
+            else:
+                result = self._send_batch(model_name, [inputs], parameters, operation=operation)[0]
+            if cache is not None and result is not None:
+                cache.set(model_name, key, result)
+            return result
+        
+        # Identical concurrent calls share one upstream request.
+        return self.flight.do(key, fetch, model=model_name)
+    
+    async def _agenerate(self, inputs: str, model_name: str, parameters: Dict,
+                         batch: bool = False, scope: Optional[str] = None) -> Optional[str]:
+        key = PromptCache.fingerprint(model_name, inputs, parameters)
+        operation = 'complete' if batch else 'generate'
+        cache = self._cache_for(parameters)
+        if cache is not None:
+            cached = await cache.aget(model_name, key)
+            if cached is not None:
+                return cached
+        
+        async def fetch():
+            local = await self.backends.alocal_config(model_name)
+            if batch and self.batcher is not None and (local is None or scope is None):
+                result = await self.batcher.asubmit(model_name, parameters, inputs)
+            else:
+                result = await self._acall_model(model_name, inputs, parameters, scope, operation=operation)
+            if cache is not None and result is not None:
+                await cache.aset(model_name, key, result)
+            return result
+        
+        return await self.async_flight.do(key, fetch, model=model_name)
+    
+    async def _acall_model(self, model_name: str, inputs: str, parameters: Dict,
+                           scope: Optional[str] = None, tried: tuple = (),
+                           operation: str = 'generate') -> Optional[str]:
+        """Run one prompt locally or upstream, falling back to another model on failure."""
+        config = await self.backends.aconfig(model_name)
+        start = time.perf_counter()
+        if config.get('backend') == 'local':
+            cancelled = threading.Event()
+            future = get_local_backend().submit(
+                model_name, [inputs], parameters, config, scope, cancelled, operation=operation
+            )
+            try:
+                results = await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                # Stop a generation that has already started on the pool.
+                cancelled.set()
+                raise
+            except Exception:
+                self.router.record(model_name, time.perf_counter() - start, error=True)
+                raise
+            self.router.record(model_name, time.perf_counter() - start)
+            return results[0]
+        
+        async def post(timeout):
+            sent_at = time.perf_counter()
+            response = await get_async_inference_client().post(
+                f"{self.api_url}/{model_name}",
+                headers=self.headers,
+                payload={'inputs': inputs, 'parameters': parameters},
+                timeout=timeout,
+            )
+            response.raise_for_status()
+            result = response.json()
+            observe_call(model_name, operation, 'remote', time.perf_counter() - sent_at, generated_tokens(result))
+            observe_payload(model_name, operation, len(response.request.content), len(response.content))
+            return self._extract_text(result, inputs, model_name)
+        
+        try:
+            result = await self.guard.acall(model_name, post)
+        except Exception as e:
+            self.router.record(model_name, time.perf_counter() - start, error=True)
+            fallback = self._fallback_for(model_name, config, tried)
+            if fallback is None:
+                raise
+            logger.warning(f"Falling back from {model_name} to {fallback}: {str(e)}")
+            fallbacks.inc(model=model_name, fallback=fallback)
+            return await self._acall_model(
+                fallback, inputs, parameters, scope, tried + (model_name,), operation=operation
+            )
+        self.router.record(model_name, time.perf_counter() - start)
+        return result
+    
+    def _send_batch(self, model_name: str, inputs: List[str], parameters: Dict,
+                    tried: tuple = (), operation: str = 'generate') -> List[Optional[str]]:
+        """Run one or more prompts in a single call and return one text per prompt."""
+        config = self.backends.config(model_name)
+        start = time.perf_counter()
+        try:
+            if config.get('backend') == 'local':
+                results = get_local_backend().submit(
+                    model_name, inputs, parameters, config, operation=operation
+                ).result()
+            else:
+                results = self.guard.call(
+                    model_name,
+                    lambda timeout: self._post_batch(model_name, inputs, parameters, timeout, operation)
+                )
+        except Exception as e:
+            self.router.record(model_name, time.perf_counter() - start, error=True)
+            fallback = self._fallback_for(model_name, config, tried)
+            if fallback is None:
+                raise
+            logger.warning(f"Falling back from {model_name} to {fallback}: {str(e)}")
+            fallbacks.inc(model=model_name, fallback=fallback)
+            return self._send_batch(fallback, inputs, parameters, tried + (model_name,), operation)
+        self.router.record(model_name, time.perf_counter() - start)
+        return results
+    
+    @staticmethod
+    def _fallback_for(model_name: str, config: Dict, tried: tuple) -> Optional[str]:
+        """The model to try after model_name, from its AIModel or AI_FALLBACK_MODELS."""
+        fallback = config.get('fallback') or settings.AI_FALLBACK_MODELS.get(model_name)
+        if not fallback or fallback == model_name or fallback in tried:
+            return None
+        return fallback
+    
+    def _post_batch(self, model_name: str, inputs: List[str], parameters: Dict,
+                    timeout: float, operation: str = 'generate') -> List[Optional[str]]:
+        start = time.perf_counter()
+        response = self.client.post(
+            f"{self.api_url}/{model_name}",
+            headers=self.headers,
+            payload={'inputs': inputs[0] if len(inputs) == 1 else inputs, 'parameters': parameters},
+            timeout=(settings.HUGGINGFACE_CONNECT_TIMEOUT, timeout),
+        )
+        response.raise_for_status()
+        result = response.json()
+        observe_call(model_name, operation, 'remote', time.perf_counter() - start, generated_tokens(result))
+        observe_payload(model_name, operation, len(response.request.body or b''), len(response.content))
+        
+        if len(inputs) == 1:
+            return [self._extract_text(result, inputs[0], model_name)]
+        # Batched calls return one entry per input, each a dict or a list of dicts.
+        return [
+            self._extract_text(item if isinstance(item, list) else [item], text, model_name)
+            for item, text in zip(result, inputs)
+        ]
+    
+    @staticmethod
+    def _cache_for(parameters: Dict):
+        """Return the prompt cache if this call may be cached."""
+        cache = get_prompt_cache()
+        if cache is None or not cache.is_cacheable(parameters):
+            return None
+        return cache
+    
+    @staticmethod
+    def _extract_text(result, inputs: str, model_name: str) -> Optional[str]:
+        if isinstance(result, list) and len(result) > 0:
+            generated = result[0].get('generated_text', '')
+            return strip_prompt(generated, inputs, get_tokenizer(model_name)).strip()
+        return None
+
+
+_hf_service = None
+_hf_service_lock = threading.Lock()
+
+
+def get_huggingface_service() -> HuggingFaceService:
+    """Return the process-wide HuggingFaceService."""
+    global _hf_service
+    if _hf_service is None:
+        with _hf_service_lock:
+            if _hf_service is None:
+                _hf_service = HuggingFaceService()
+    return _hf_service
 
 
 class CodeGenerationService:
     """Service for AI-powered code generation."""
     
     def __init__(self):
-        self.hf_service = HuggingFaceService()
+        self.hf_service = get_huggingface_service()
     
-    def generate_react_component(self, description: str, props: Dict = None) -> Optional[str]:
+    def generate_react_component(self, description: str, props: Dict = None, project_id=None) -> Optional[str]:
         """Generate React component from description."""
+        scaffolded = self._scaffold('react_component', scaffolding.react_component(description, props))
+        if scaffolded:
+            return scaffolded
+        
+        prompt = self._react_component_prompt(description, props)
+        
+        generated_code = self.hf_service.generate_code(prompt, language='typescript', project_id=project_id)
+        
+        if generated_code:
+            # Clean up and format the generated code
+            return self._format_react_component(generated_code)
+        
+        return None
+    
+    async def agenerate_react_component(self, description: str, props: Dict = None,
+                                        project_id=None) -> Optional[str]:
+        """Async variant of generate_react_component for async views."""
+        scaffolded = self._scaffold('react_component', scaffolding.react_component(description, props))
+        if scaffolded:
+            return scaffolded
+        prompt = self._react_component_prompt(description, props)
+        generated_code = await self.hf_service.agenerate_code(prompt, language='typescript', project_id=project_id)
+        return self._format_react_component(generated_code) if generated_code else None
+    
+    def stream_react_component(self, description: str, props: Dict = None) -> Iterator[str]:
+        """Yield raw React component text as it is generated."""
+        scaffolded = self._scaffold('react_component', scaffolding.react_component(description, props))
+        if scaffolded:
+            yield scaffolded
+            return
+        prompt = self._react_component_prompt(description, props)
+        yield from self.hf_service.stream_code(prompt)
+    
+    async def astream_react_component(self, description: str, props: Dict = None) -> AsyncIterator[str]:
+        """Async variant of stream_react_component for async views."""
+        scaffolded = self._scaffold('react_component', scaffolding.react_component(description, props))
+        if scaffolded:
+            yield scaffolded
+            return
+        prompt = self._react_component_prompt(description, props)
+        async for delta in self.hf_service.astream_code(prompt):
+            yield delta
+    
+    def generate_django_model(self, description: str, fields: List[Dict] = None, project_id=None) -> Optional[str]:
+        """Generate Django model from description."""
+        scaffolded = self._scaffold('django_model', scaffolding.django_model(description, fields))
+        if scaffolded:
+            return scaffolded
+        
+        prompt = self._django_model_prompt(description, fields)
+        
+        generated_code = self.hf_service.generate_code(prompt, language='python', project_id=project_id)
+        
+        if generated_code:
+            return self._format_django_model(generated_code)
+        
+        return None
+    
+    async def agenerate_django_model(self, description: str, fields: List[Dict] = None,
+                                     project_id=None) -> Optional[str]:
+        """Async variant of generate_django_model for async views."""
+        scaffolded = self._scaffold('django_model', scaffolding.django_model(description, fields))
+        if scaffolded:
+            return scaffolded
+        prompt = self._django_model_prompt(description, fields)
+        generated_code = await self.hf_service.agenerate_code(prompt, language='python', project_id=project_id)
+        return self._format_django_model(generated_code) if generated_code else None
+    
+    def stream_django_model(self, description: str, fields: List[Dict] = None) -> Iterator[str]:
+        """Yield raw Django model text as it is generated."""
+        scaffolded = self._scaffold('django_model', scaffolding.django_model(description, fields))
+        if scaffolded:
+            yield scaffolded
+            return
+        prompt = self._django_model_prompt(description, fields)
+        yield from self.hf_service.stream_code(prompt)
+    
+    async def astream_django_model(self, description: str, fields: List[Dict] = None) -> AsyncIterator[str]:
+        """Async variant of stream_django_model for async views."""
+        scaffolded = self._scaffold('django_model', scaffolding.django_model(description, fields))
+        if scaffolded:
+            yield scaffolded
+            return
+        prompt = self._django_model_prompt(description, fields)
+        async for delta in self.hf_service.astream_code(prompt):
+            yield delta
+    
+    @staticmethod
+    def _scaffold(kind: str, code: Optional[str]) -> Optional[str]:
+        """Count a request as served by templates or by the model; return the template code."""
+        scaffolding.record(kind, code is not None)
+        return code
+    
+    def _react_component_prompt(self, description: str, props: Dict = None) -> str:
         props_str = ""
         if props:
             props_str = f"Props: {json.dumps(props, indent=2)}"
         
-        prompt = f"""
+        return f"""
 // Generate a React component based on this description:
 // {description}
 // {props_str}
@@ -125,22 +643,13 @@ class CodeGenerationService:
 import React from 'react';
 
 export default function Component("""
-        
-        generated_code = self.hf_service.generate_code(prompt, 'bigcode/starcoder')
-        
-        if generated_code:
-            # Clean up and format the generated code
-            return self._format_react_component(generated_code)
-        
-        return None
     
-    def generate_django_model(self, description: str, fields: List[Dict] = None) -> Optional[str]:
-        """Generate Django model from description."""
+    def _django_model_prompt(self, description: str, fields: List[Dict] = None) -> str:
         fields_str = ""
         if fields:
             fields_str = f"Fields: {json.dumps(fields, indent=2)}"
         
-        prompt = f"""
+        return f"""
 # Generate a Django model based on this description:
 # {description}
 # {fields_str}
@@ -149,16 +658,13 @@ from django.db import models
 
 class Model(models.Model):
     """
-        
-        generated_code = self.hf_service.generate_code(prompt, 'bigcode/starcoder')
-        
-        if generated_code:
-            return self._format_django_model(generated_code)
-        
-        return None
     
-    def generate_api_endpoint(self, description: str, method: str = 'GET') -> Optional[str]:
+    def generate_api_endpoint(self, description: str, method: str = 'GET', project_id=None) -> Optional[str]:
         """Generate API endpoint from description."""
+        scaffolded = self._scaffold('api_endpoint', scaffolding.api_endpoint(description, method))
+        if scaffolded:
+            return scaffolded
+        
         prompt = f"""
 # Generate a Django REST API endpoint:
 # Description: {description}
@@ -171,7 +677,7 @@ from rest_framework.decorators import action
 class APIView(viewsets.ModelViewSet):
     """
         
-        generated_code = self.hf_service.generate_code(prompt, 'bigcode/starcoder')
+        generated_code = self.hf_service.generate_code(prompt, language='python', project_id=project_id)
         
         if generated_code:
             return self._format_api_endpoint(generated_code)
@@ -216,61 +722,17 @@ class APIView(viewsets.ModelViewSet):
 
 
 class CodeAnalysisService:
-    """Service for AI-powered code analysis."""
-    
-    def __init__(self):
-        self.hf_service = HuggingFaceService()
+    """Service for code analysis."""
     
     def analyze_file(self, file_content: str, file_type: str) -> Dict:
-        """Analyze a file for issues and suggestions."""
-        analysis = self.hf_service.analyze_code(file_content)
-        
-        # Add file-specific analysis
-        if file_type == 'typescript':
-            analysis.update(self._analyze_typescript(file_content))
-        elif file_type == 'python':
-            analysis.update(self._analyze_python(file_content))
-        
-        return analysis
-    
-    def _analyze_typescript(self, code: str) -> Dict:
-        """Analyze TypeScript/React code."""
-        suggestions = []
-        
-        # Basic pattern matching - in production, use AST parsing
-        if 'useState' in code and 'useEffect' not in code:
-            suggestions.append({
-                'type': 'suggestion',
-                'message': 'Consider adding useEffect for side effects',
-                'confidence': 0.7
-            })
-        
-        if 'any' in code:
-            suggestions.append({
-                'type': 'warning',
-                'message': 'Avoid using "any" type, use specific types instead',
-                'confidence': 0.9
-            })
-        
-        return {'typescript_suggestions': suggestions}
-    
-    def _analyze_python(self, code: str) -> Dict:
-        """Analyze Python/Django code."""
-        suggestions = []
-        
-        # Basic pattern matching - in production, use AST parsing
-        if 'models.Model' in code and '__str__' not in code:
-            suggestions.append({
-                'type': 'suggestion',
-                'message': 'Add __str__ method to model for better representation',
-                'confidence': 0.8
-            })
-        
-        if 'objects.get(' in code and 'try:' not in code:
-            suggestions.append({
-                'type': 'warning',
-                'message': 'Consider using get_object_or_404 or try/except for .get() calls',
-                'confidence': 0.9
-            })
-        
-        return {'python_suggestions': suggestions}
+        """
+        Analyze a file for issues and suggestions.
+        
+        Results are cached by content hash and rule-set version (see
+        ai_engine.analysis), so re-analysing an unchanged file is a lookup.
+        """
+        try:
+            return analysis.analyze(file_content, file_type)
+        except Exception as e:
+            logger.error(f"Error analyzing code: {str(e)}")
+            return {}
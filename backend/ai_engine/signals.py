@@ -0,0 +1,92 @@
+"""
+Signal handlers for AI engine models.
+"""
+import logging
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from api.cache import get_response_cache
+from .dedup import needs_signature, store_signature
+from .retrieval import get_retrieval_index, suggestion_key, training_key
+from .router import get_model_registry
+from .models import AIModel, CodeSuggestion, TrainingData
+
+logger = logging.getLogger(__name__)
+
+# CodeSuggestion fields the retrieval index depends on.
+INDEXED_SUGGESTION_FIELDS = ('context', 'is_accepted')
+
+
+@receiver(post_save, sender=AIModel)
+@receiver(post_delete, sender=AIModel)
+def ai_model_changed(sender, instance, **kwargs):
+    get_model_registry().invalidate()
+    cache = get_response_cache()
+    if cache is not None:
+        cache.bump([cache.global_key('ai_models')])
+
+
+def update_retrieval_index(key, text=None):
+    """Add (or, without text, remove) key once the transaction commits."""
+    index = get_retrieval_index()
+    if index is None:
+        return
+
+    def apply():
+        try:
+            if text is None:
+                index.remove(key)
+            else:
+                index.add(key, text)
+        except Exception as e:
+            logger.error(f"Error updating retrieval index: {str(e)}")
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender=TrainingData)
+def training_data_saved(sender, instance, **kwargs):
+    # Rows not stored through dedup.ingest are only signed here; the
+    # dedup_training_data command merges them if they duplicate another row.
+    if needs_signature(instance):
+        store_signature(instance)
+    update_retrieval_index(training_key(instance.pk), instance.content)
+
+
+@receiver(post_delete, sender=TrainingData)
+def training_data_deleted(sender, instance, **kwargs):
+    update_retrieval_index(training_key(instance.pk))
+
+
+def _indexed_state(instance):
+    # Deferred fields are left unknown rather than loaded one row at a time.
+    if instance.get_deferred_fields() & set(INDEXED_SUGGESTION_FIELDS):
+        return None
+    return tuple(getattr(instance, field) for field in INDEXED_SUGGESTION_FIELDS)
+
+
+@receiver(post_init, sender=CodeSuggestion)
+def code_suggestion_loaded(sender, instance, **kwargs):
+    instance._indexed_state = _indexed_state(instance)
+
+
+@receiver(post_save, sender=CodeSuggestion)
+def code_suggestion_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Only re-index when the indexed text or the accepted flag changed.
+    if update_fields is not None and not set(update_fields) & set(INDEXED_SUGGESTION_FIELDS):
+        return
+    state = _indexed_state(instance)
+    previous, instance._indexed_state = instance._indexed_state, state
+    if not created and state is not None and state == previous:
+        return
+    key = suggestion_key(instance.project_id, instance.pk)
+    if instance.is_accepted:
+        update_retrieval_index(key, instance.context)
+    elif not created:
+        update_retrieval_index(key)
+
+
+@receiver(post_delete, sender=CodeSuggestion)
+def code_suggestion_deleted(sender, instance, **kwargs):
+    if instance.is_accepted:
+        update_retrieval_index(suggestion_key(instance.project_id, instance.pk))
@@ -0,0 +1,113 @@
+"""
+Single-flight coalescing of identical in-flight calls.
+
+When several callers ask for the same key at the same time, only the first
+(the leader) runs the call; the others wait for and share its result or
+exception. Once the call finishes the key is forgotten, so later callers
+start a fresh call.
+"""
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict
+
+from .metrics import Counter
+
+coalesced_calls = Counter(
+    'ai_singleflight_coalesced_total',
+    'Upstream calls saved by joining an identical in-flight call.',
+    ('model', 'mode'),
+)
+
+
+class _Flight:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent sync calls across threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any], model: str = '') -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            coalesced_calls.inc(model=model, mode='sync')
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent async calls on the same event loop.
+
+    The shared call runs as its own task and waiters are shielded from it,
+    so one waiter being cancelled does not cancel the call for the others.
+    When the last waiter is cancelled the call itself is cancelled, since
+    nobody is left to use its result.
+    """
+
+    def __init__(self):
+        self._flights = weakref.WeakKeyDictionary()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], model: str = '') -> Any:
+        loop = asyncio.get_running_loop()
+        flights = self._flights.setdefault(loop, {})
+
+        flight = flights.get(key)
+        if flight is None:
+            flight = flights[key] = _Flight(loop.create_task(fn()))
+            flight.task.add_done_callback(lambda done: self._forget(flights, key, flight))
+        else:
+            coalesced_calls.inc(model=model, mode='async')
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                self._forget(flights, key, flight)
+                flight.task.cancel()
+
+    @staticmethod
+    def _forget(flights: Dict[str, _Flight], key: str, flight: _Flight):
+        if flights.get(key) is flight:
+            del flights[key]
+        task = flight.task
+        if task.done() and not task.cancelled():
+            # Mark the exception as retrieved even if every waiter was cancelled.
+            task.exception()
@@ -0,0 +1,153 @@
+"""
+Background code generation jobs.
+
+A GenerationJob row is created by the API and run here by a Celery worker;
+the outcome is stored on the job (and as a CodeSuggestion when the job
+belongs to a project) and pushed to the user's ``generation_jobs`` group.
+"""
+import logging
+from datetime import timedelta
+from typing import Dict
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from fside_backend.celery import app
+from .models import CodeSuggestion, GenerationJob
+from .reuse import find_reusable
+from .router import get_model_router
+from .services import CodeGenerationService, get_huggingface_service
+
+logger = logging.getLogger(__name__)
+
+# kind -> (suggestion_type, language, result type, confidence_score)
+JOB_OUTPUTS = {
+    'completion': ('completion', None, 'completion', 0.9),
+    'django_model': ('generation', 'python', 'django_model', 0.85),
+    'react_component': ('generation', 'typescript', 'react_component', 0.80),
+    'api_endpoint': ('generation', 'python', 'api_endpoint', 0.80),
+}
+
+
+def job_queue(kind: str) -> str:
+    """Completions are interactive; everything else is bulk work."""
+    if kind == 'completion':
+        return settings.AI_JOB_INTERACTIVE_QUEUE
+    return settings.AI_JOB_BULK_QUEUE
+
+
+def enqueue_job(job: GenerationJob):
+    """Send the job to its queue once the surrounding transaction commits."""
+    transaction.on_commit(
+        lambda: run_generation_job.apply_async(args=[str(job.id)], queue=job_queue(job.kind))
+    )
+
+
+def job_group_name(user_id) -> str:
+    return f'generation_jobs_{user_id}'
+
+
+def job_payload(job: GenerationJob) -> Dict:
+    return {
+        'id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'result': job.result,
+        'error': job.error,
+        'suggestion': str(job.suggestion_id) if job.suggestion_id else None,
+    }
+
+
+@app.task(ignore_result=True, soft_time_limit=settings.AI_JOB_TIME_LIMIT,
+          time_limit=settings.AI_JOB_TIME_LIMIT + settings.AI_JOB_KILL_GRACE)
+def run_generation_job(job_id: str):
+    """
+    Run a pending job; duplicate messages for a live job are ignored.
+    
+    A job still 'running' past the hard time limit lost its worker (the soft
+    limit fails jobs that merely overrun), so a redelivered message takes it over.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.AI_JOB_TIME_LIMIT + settings.AI_JOB_KILL_GRACE)
+    claimed = GenerationJob.objects.filter(
+        Q(status='pending') | Q(status='running', started_at__lt=stale), id=job_id
+    ).update(status='running', started_at=timezone.now())
+    if not claimed:
+        return
+    
+    job = GenerationJob.objects.select_related('project').get(id=job_id)
+    try:
+        code = _generate(job)
+        if code:
+            _succeed(job, code)
+        else:
+            _fail(job, 'Failed to generate code')
+    except Exception as e:
+        logger.error(f"Error running generation job {job_id}: {str(e)}")
+        _fail(job, str(e))
+    
+    _notify(job)
+
+
+def _generate(job: GenerationJob):
+    params = job.parameters
+    if job.kind == 'completion':
+        reused = find_reusable(job.user, job.project_id, params.get('context', ''))
+        if reused is not None:
+            return reused.suggestion
+        return get_huggingface_service().complete_code(params.get('context', ''))
+    
+    service = CodeGenerationService()
+    if job.kind == 'django_model':
+        return service.generate_django_model(params.get('description'), params.get('fields', []), job.project_id)
+    if job.kind == 'react_component':
+        return service.generate_react_component(params.get('description'), params.get('props', {}), job.project_id)
+    return service.generate_api_endpoint(params.get('description'), params.get('method', 'GET'), job.project_id)
+
+
+def _succeed(job: GenerationJob, code: str):
+    suggestion_type, language, code_type, confidence_score = JOB_OUTPUTS[job.kind]
+    ai_model_type = 'code_completion' if job.kind == 'completion' else 'code_generation'
+    
+    with transaction.atomic():
+        ai_model = get_model_router().route(ai_model_type)
+        if job.project_id and ai_model:
+            job.suggestion = CodeSuggestion.objects.create(
+                project_id=job.project_id,
+                user_id=job.user_id,
+                ai_model=ai_model,
+                suggestion_type=suggestion_type,
+                context=job.parameters.get('description') or job.parameters.get('context', ''),
+                suggestion=code,
+                confidence_score=confidence_score
+            )
+        job.status = 'succeeded'
+        job.result = {
+            'generated_code': code,
+            'language': language or job.parameters.get('language', ''),
+            'type': code_type
+        }
+        job.finished_at = timezone.now()
+        job.save(update_fields=['suggestion', 'status', 'result', 'finished_at'])
+
+
+def _fail(job: GenerationJob, error: str):
+    job.status = 'failed'
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+
+
+def _notify(job: GenerationJob):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            job_group_name(job.user_id),
+            {'type': 'job_update', 'job': job_payload(job)}
+        )
+    except Exception as e:
+        # Clients can still poll the job.
+        logger.warning(f"Could not push generation job {job.id}: {str(e)}")
@@ -0,0 +1,77 @@
+"""
+Telemetry for model calls.
+
+Each backend reports its calls here, labelled by model and operation
+(generate, complete or stream): how long work queued before running, how
+long the call took, how many tokens it produced and how large its payloads
+were. Remote calls only report tokens when the upstream says how many it
+generated; streams count one token per event.
+"""
+from typing import Optional
+
+from .metrics import Counter, Histogram
+
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+queue_wait = Histogram(
+    'ai_queue_wait_seconds',
+    'Time a call waited for a batch or a local worker before running.',
+    ('model', 'operation'),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+call_duration = Histogram(
+    'ai_call_duration_seconds',
+    'Duration of model calls, from sending the request to the last byte.',
+    ('model', 'operation', 'backend'),
+)
+time_to_first_token = Histogram(
+    'ai_time_to_first_token_seconds',
+    'Time from sending a streaming request to receiving its first token.',
+    ('model', 'operation'),
+)
+tokens_per_second = Histogram(
+    'ai_output_tokens_per_second',
+    'Output tokens per second of model calls.',
+    ('model', 'operation', 'backend'),
+    buckets=(1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+output_tokens = Counter(
+    'ai_output_tokens_total',
+    'Tokens generated by model calls.',
+    ('model', 'operation', 'backend'),
+)
+payload_bytes = Histogram(
+    'ai_payload_bytes',
+    'Size of model call payloads by direction (request, response).',
+    ('model', 'operation', 'direction'),
+    buckets=PAYLOAD_BUCKETS,
+)
+
+
+def observe_call(model_name: str, operation: str, backend: str, elapsed: float,
+                 tokens: Optional[int] = None):
+    """Record one completed call and, when known, its output token rate."""
+    call_duration.observe(elapsed, model=model_name, operation=operation, backend=backend)
+    if tokens:
+        output_tokens.inc(tokens, model=model_name, operation=operation, backend=backend)
+        if elapsed > 0:
+            tokens_per_second.observe(tokens / elapsed, model=model_name, operation=operation, backend=backend)
+
+
+def observe_payload(model_name: str, operation: str, sent: int, received: int):
+    payload_bytes.observe(sent, model=model_name, operation=operation, direction='request')
+    payload_bytes.observe(received, model=model_name, operation=operation, direction='response')
+
+
+def generated_tokens(result) -> Optional[int]:
+    """Total details.generated_tokens of an inference response, if reported."""
+    items = result if isinstance(result, list) else [result]
+    total = 0
+    for item in items:
+        if isinstance(item, list):
+            item = item[0] if item else {}
+        details = item.get('details') if isinstance(item, dict) else None
+        if not details or 'generated_tokens' not in details:
+            return None
+        total += details['generated_tokens']
+    return total
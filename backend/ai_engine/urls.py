@@ -3,13 +3,22 @@ URL configuration for AI Engine app.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AIModelViewSet, CodeGenerationViewSet, CodeSuggestionViewSet
+from . import views
+from .views import AIModelViewSet, CodeGenerationViewSet, CodeSuggestionViewSet, GenerationJobViewSet
 
 router = DefaultRouter()
 router.register(r'models', AIModelViewSet)
 router.register(r'generate', CodeGenerationViewSet, basename='generate')
 router.register(r'suggestions', CodeSuggestionViewSet, basename='suggestions')
+router.register(r'jobs', GenerationJobViewSet, basename='jobs')
 
 urlpatterns = [
+    # Native async generation, for the ASGI application
+    path('generate/async/model/', views.agenerate_model, name='agenerate_model'),
+    path('generate/async/component/', views.agenerate_component, name='agenerate_component'),
+    path('generate/async/model/stream/', views.astream_model, name='astream_model'),
+    path('generate/async/component/stream/', views.astream_component, name='astream_component'),
+    # Prometheus scrape endpoint
+    path('metrics/', views.metrics, name='ai_metrics'),
     path('', include(router.urls)),
 ]
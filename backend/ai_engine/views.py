@@ -1,15 +1,30 @@
 """
 AI Engine API views.
 """
-from rest_framework import viewsets, status
+import functools
+import hmac
+import json
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions, mixins, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
 from api.models import Project
-from .models import AIModel, CodeSuggestion
+from api.renderers import ORJSONRenderer, EventStreamRenderer
+from .metrics import render_prometheus
+from .models import AIModel, CodeSuggestion, GenerationJob
 from .services import CodeGenerationService, CodeAnalysisService
-from .serializers import AIModelSerializer, CodeSuggestionSerializer
+from .serializers import AIModelSerializer, CodeSuggestionSerializer, GenerationJobSerializer
+from .router import get_model_router
+from .tasks import enqueue_job
 
 
 class AIModelViewSet(viewsets.ModelViewSet):
@@ -31,7 +46,11 @@ class CodeGenerationViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['post'])
     def generate_model(self, request):
-        """Generate Django model from schema description."""
+        """
+        Generate Django model from schema description.
+        
+        Runs as a background job (202 with the job) unless background is false.
+        """
         description = request.data.get('description')
         fields = request.data.get('fields', [])
         project_id = request.data.get('project_id')
@@ -42,17 +61,25 @@ class CodeGenerationViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if self._in_background(request):
+            return self._enqueue(request, 'django_model', {'description': description, 'fields': fields})
+        
         try:
-            generated_code = self.generation_service.generate_django_model(description, fields)
+            project = None
+            if project_id:
+                project = get_object_or_404(Project.objects.accessible_to(request.user), id=project_id)
+            
+            generated_code = self.generation_service.generate_django_model(
+                description, fields, project.id if project else None
+            )
             
             if generated_code:
                 # Save suggestion to database
-                if project_id:
-                    project = get_object_or_404(Project, id=project_id)
+                if project:
                     CodeSuggestion.objects.create(
                         project=project,
                         user=request.user,
-                        ai_model=AIModel.objects.filter(model_type='code_generation').first(),
+                        ai_model=get_model_router().route('code_generation'),
                         suggestion_type='generation',
                         context=description,
                         suggestion=generated_code,
@@ -78,7 +105,11 @@ class CodeGenerationViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['post'])
     def generate_component(self, request):
-        """Generate React component from wireframe/description."""
+        """
+        Generate React component from wireframe/description.
+        
+        Runs as a background job (202 with the job) unless background is false.
+        """
         description = request.data.get('description')
         props = request.data.get('props', {})
         project_id = request.data.get('project_id')
@@ -89,17 +120,25 @@ class CodeGenerationViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if self._in_background(request):
+            return self._enqueue(request, 'react_component', {'description': description, 'props': props})
+        
         try:
-            generated_code = self.generation_service.generate_react_component(description, props)
+            project = None
+            if project_id:
+                project = get_object_or_404(Project.objects.accessible_to(request.user), id=project_id)
+            
+            generated_code = self.generation_service.generate_react_component(
+                description, props, project.id if project else None
+            )
             
             if generated_code:
                 # Save suggestion to database
-                if project_id:
-                    project = get_object_or_404(Project, id=project_id)
+                if project:
                     CodeSuggestion.objects.create(
                         project=project,
                         user=request.user,
-                        ai_model=AIModel.objects.filter(model_type='code_generation').first(),
+                        ai_model=get_model_router().route('code_generation'),
                         suggestion_type='generation',
                         context=description,
                         suggestion=generated_code,
@@ -123,6 +162,179 @@ class CodeGenerationViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    
+    @staticmethod
+    def _in_background(request):
+        """Generation is a background job by default; background=false waits for the code."""
+        return request.data.get('background', True) not in (False, 'false', 'False', '0', 0)
+    
+    def _enqueue(self, request, kind, parameters):
+        """Run the generation as a background job and return it with 202."""
+        project_id = request.data.get('project_id')
+        projects = Project.objects.accessible_to(request.user)
+        project = get_object_or_404(projects, id=project_id) if project_id else None
+        job, created = create_generation_job(
+            request.user, kind, parameters, project,
+            request.headers.get('Idempotency-Key') or request.data.get('idempotency_key')
+        )
+        return Response(
+            GenerationJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+        )
+    
+    @action(detail=False, methods=['post'], renderer_classes=[ORJSONRenderer, EventStreamRenderer])
+    def generate_model_stream(self, request):
+        """Stream a generated Django model as server-sent events."""
+        description = request.data.get('description')
+        fields = request.data.get('fields', [])
+        
+        if not description:
+            return Response(
+                {'error': 'Description is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return self._stream_generation(
+            request,
+            self.generation_service.stream_django_model(description, fields),
+            self.generation_service._format_django_model,
+            language='python',
+            code_type='django_model',
+            confidence_score=0.85
+        )
+    
+    @action(detail=False, methods=['post'], renderer_classes=[ORJSONRenderer, EventStreamRenderer])
+    def generate_component_stream(self, request):
+        """Stream a generated React component as server-sent events."""
+        description = request.data.get('description')
+        props = request.data.get('props', {})
+        
+        if not description:
+            return Response(
+                {'error': 'Description is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return self._stream_generation(
+            request,
+            self.generation_service.stream_react_component(description, props),
+            self.generation_service._format_react_component,
+            language='typescript',
+            code_type='react_component',
+            confidence_score=0.80
+        )
+    
+    def _stream_generation(self, request, chunks, format_code, language, code_type, confidence_score):
+        """
+        Relay generated text as ``delta`` events, then a final ``done`` event
+        carrying the formatted code in the same shape as the blocking endpoints.
+        
+        This is the WSGI path: under ASGI, Django collects a sync iterator in
+        full before sending it, so events would arrive all at once. ASGI
+        clients use the generate/async/*/stream/ views instead.
+        """
+        description = request.data.get('description')
+        project_id = request.data.get('project_id')
+        projects = Project.objects.accessible_to(request.user)
+        project = get_object_or_404(projects, id=project_id) if project_id else None
+        user = request.user
+        
+        def events():
+            parts = []
+            try:
+                for delta in chunks:
+                    parts.append(delta)
+                    yield _sse({'delta': delta})
+            except Exception as e:
+                yield _sse({'error': str(e)}, event='error')
+                return
+            
+            generated_code = format_code(''.join(parts).strip())
+            if not generated_code:
+                yield _sse({'error': 'Failed to generate code'}, event='error')
+                return
+            
+            if project:
+                CodeSuggestion.objects.create(
+                    project=project,
+                    user=user,
+                    ai_model=get_model_router().route('code_generation'),
+                    suggestion_type='generation',
+                    context=description,
+                    suggestion=generated_code,
+                    confidence_score=confidence_score
+                )
+            
+            yield _sse({
+                'generated_code': generated_code,
+                'language': language,
+                'type': code_type
+            }, event='done')
+        
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+def create_generation_job(user, kind, parameters, project=None, idempotency_key=None):
+    """
+    Create and enqueue a job, or return the user's existing job for
+    idempotency_key. Returns (job, created).
+    """
+    idempotency_key = idempotency_key or None
+    if idempotency_key:
+        existing = GenerationJob.objects.filter(user=user, idempotency_key=idempotency_key).first()
+        if existing:
+            return existing, False
+    
+    try:
+        with transaction.atomic():
+            job = GenerationJob.objects.create(
+                user=user,
+                project=project,
+                kind=kind,
+                idempotency_key=idempotency_key,
+                parameters=parameters
+            )
+            enqueue_job(job)
+    except IntegrityError:
+        # A concurrent request with the same key won the race.
+        return GenerationJob.objects.get(user=user, idempotency_key=idempotency_key), False
+    return job, True
+
+
+class GenerationJobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Background generation jobs. POST returns the job immediately; poll it
+    here or listen for ``job_update`` messages on ws/generation-jobs/.
+    """
+    
+    serializer_class = GenerationJobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return GenerationJob.objects.filter(user=self.request.user)
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        job, created = create_generation_job(
+            request.user, data['kind'], data.get('parameters', {}), data.get('project'),
+            request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        )
+        return Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+        )
+
+
+def _sse(data, event=None):
+    """Encode one server-sent event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
 
 class CodeSuggestionViewSet(viewsets.ModelViewSet):
     """ViewSet for code suggestions."""
@@ -187,3 +399,223 @@ class CodeSuggestionViewSet(viewsets.ModelViewSet):
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+def _authenticated_user(request):
+    """Run the configured DRF authenticators against a plain Django request."""
+    drf_request = Request(
+        request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        user = drf_request.user
+    except exceptions.APIException:
+        return None
+    return user if user and user.is_authenticated else None
+
+
+def async_api_view(view):
+    """
+    Serve an async POST view with the same authentication as the DRF views.
+    
+    The view receives the parsed JSON body. Like APIView, it is exempt from
+    the CSRF middleware; SessionAuthentication enforces CSRF itself.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+        
+        user = await sync_to_async(_authenticated_user)(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user = user
+        
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        return await view(request, data, *args, **kwargs)
+    
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+async def _agenerate_response(request, data, generate, language, code_type, confidence_score):
+    """Async counterpart of the blocking generate_* actions, with the same responses."""
+    description = data.get('description')
+    project_id = data.get('project_id')
+    
+    if not description:
+        return JsonResponse({'error': 'Description is required'}, status=400)
+    
+    project = None
+    if project_id:
+        try:
+            project = await Project.objects.accessible_to(request.user).filter(id=project_id).afirst()
+        except ValidationError:
+            project = None
+        if project is None:
+            return JsonResponse({'detail': 'Not found.'}, status=404)
+    
+    try:
+        generated_code = await generate(description, project.id if project else None)
+        
+        if not generated_code:
+            return JsonResponse({'error': 'Failed to generate code'}, status=500)
+        
+        if project:
+            await CodeSuggestion.objects.acreate(
+                project=project,
+                user=request.user,
+                ai_model=await get_model_router().aroute('code_generation'),
+                suggestion_type='generation',
+                context=description,
+                suggestion=generated_code,
+                confidence_score=confidence_score
+            )
+        
+        return JsonResponse({
+            'generated_code': generated_code,
+            'language': language,
+            'type': code_type
+        })
+    
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_api_view
+async def agenerate_model(request, data):
+    """Generate a Django model without holding a worker thread while waiting."""
+    return await _agenerate_response(
+        request, data,
+        lambda description, project_id: CodeGenerationService().agenerate_django_model(
+            description, data.get('fields', []), project_id
+        ),
+        language='python',
+        code_type='django_model',
+        confidence_score=0.85
+    )
+
+
+@async_api_view
+async def agenerate_component(request, data):
+    """Generate a React component without holding a worker thread while waiting."""
+    return await _agenerate_response(
+        request, data,
+        lambda description, project_id: CodeGenerationService().agenerate_react_component(
+            description, data.get('props', {}), project_id
+        ),
+        language='typescript',
+        code_type='react_component',
+        confidence_score=0.80
+    )
+
+
+async def _astream_response(request, data, chunks, format_code, language, code_type, confidence_score):
+    """
+    Async counterpart of the streaming generate_*_stream actions, with the same events.
+    
+    chunks is called with the description once it is validated and must
+    return an async iterator of text.
+    """
+    description = data.get('description')
+    project_id = data.get('project_id')
+    
+    if not description:
+        return JsonResponse({'error': 'Description is required'}, status=400)
+    
+    project = None
+    if project_id:
+        try:
+            project = await Project.objects.accessible_to(request.user).filter(id=project_id).afirst()
+        except ValidationError:
+            project = None
+        if project is None:
+            return JsonResponse({'detail': 'Not found.'}, status=404)
+    
+    async def events():
+        parts = []
+        try:
+            async for delta in chunks(description):
+                parts.append(delta)
+                yield _sse({'delta': delta})
+        except Exception as e:
+            yield _sse({'error': str(e)}, event='error')
+            return
+        
+        generated_code = format_code(''.join(parts).strip())
+        if not generated_code:
+            yield _sse({'error': 'Failed to generate code'}, event='error')
+            return
+        
+        if project:
+            await CodeSuggestion.objects.acreate(
+                project=project,
+                user=request.user,
+                ai_model=await get_model_router().aroute('code_generation'),
+                suggestion_type='generation',
+                context=description,
+                suggestion=generated_code,
+                confidence_score=confidence_score
+            )
+        
+        yield _sse({
+            'generated_code': generated_code,
+            'language': language,
+            'type': code_type
+        }, event='done')
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@async_api_view
+async def astream_model(request, data):
+    """Stream a generated Django model as server-sent events, sent as they arrive under ASGI."""
+    service = CodeGenerationService()
+    return await _astream_response(
+        request, data,
+        lambda description: service.astream_django_model(description, data.get('fields', [])),
+        service._format_django_model,
+        language='python',
+        code_type='django_model',
+        confidence_score=0.85
+    )
+
+
+@async_api_view
+async def astream_component(request, data):
+    """Stream a generated React component as server-sent events, sent as they arrive under ASGI."""
+    service = CodeGenerationService()
+    return await _astream_response(
+        request, data,
+        lambda description: service.astream_react_component(description, data.get('props', {})),
+        service._format_react_component,
+        language='typescript',
+        code_type='react_component',
+        confidence_score=0.80
+    )
+
+
+@require_GET
+def metrics(request):
+    """
+    Expose this process's AI engine metrics in the Prometheus text format.
+    
+    Scrapers must send AI_METRICS_TOKEN as a bearer token. Without a
+    configured token, the endpoint is limited to staff users.
+    """
+    token = settings.AI_METRICS_TOKEN
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse(status=401)
+    else:
+        user = _authenticated_user(request)
+        if user is None:
+            return HttpResponse(status=401)
+        if not user.is_staff:
+            return HttpResponse(status=403)
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
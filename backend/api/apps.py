@@ -0,0 +1,14 @@
+"""
+App configuration for the core API.
+"""
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    """Core API app."""
+
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,278 @@
+"""
+Generation-counter response cache for read-heavy REST endpoints.
+
+Cached responses are keyed by (user, user generation, route, query params,
+generations of the projects the user can see). Writes never delete cached
+entries; signal handlers bump the relevant generation counter instead, which
+makes every key built from the old value unreachable. Invalidation is a
+single INCR and never scans keys; stale entries simply age out via the TTL.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import models
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+
+class LocalMemoryBackend:
+    """
+    Per-process backend. Only correct when a single process serves requests,
+    since generation bumps made in one process are invisible to the others.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+        # Generations live apart from the LRU so they are never evicted.
+        self._generations: Dict[str, int] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_generations(self, keys: List[str]) -> List[int]:
+        with self._lock:
+            return [self._generations.get(key, 0) for key in keys]
+
+    def bump(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+
+class RedisBackend:
+    """Shared backend for multi-process deployments."""
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self.client.set(key, value, ex=ttl)
+
+    def get_generations(self, keys: List[str]) -> List[int]:
+        if not keys:
+            return []
+        return [int(value or 0) for value in self.client.mget(keys)]
+
+    def bump(self, keys: Iterable[str]):
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(key)
+        pipe.execute()
+
+
+class ResponseCache:
+    """Builds generation-aware cache keys and stores rendered responses."""
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    # Generation keys
+
+    @staticmethod
+    def project_key(project_id) -> str:
+        return f"gen:project:{project_id}"
+
+    @staticmethod
+    def user_key(user_id) -> str:
+        return f"gen:user:{user_id}"
+
+    @staticmethod
+    def global_key(name: str) -> str:
+        return f"gen:global:{name}"
+
+    def bump(self, keys: Iterable[str]):
+        """Invalidate everything cached under the given generation keys."""
+        keys = list(keys)
+        if not keys:
+            return
+        try:
+            self.backend.bump(keys)
+        except Exception as e:
+            logger.error(f"Error bumping cache generations: {str(e)}")
+
+    def bump_projects(self, project_ids: Iterable):
+        self.bump(self.project_key(pk) for pk in project_ids if pk)
+
+    def bump_users(self, user_ids: Iterable):
+        self.bump(self.user_key(pk) for pk in user_ids if pk)
+
+    # Access sets
+
+    def accessible_project_ids(self, user, user_generation: int) -> List[str]:
+        """Return the ids of projects the user owns or is a member of."""
+        from .models import Project
+
+        key = f"access:{user.pk}:{user_generation}"
+        cached = self.backend.get(key)
+        if cached is not None:
+            return cached.decode().split(',') if cached else []
+
+        project_ids = sorted(
+            str(pk) for pk in Project.objects.filter(
+                models.Q(created_by=user) | models.Q(team_members=user)
+            ).values_list('id', flat=True).distinct()
+        )
+        self.backend.set(key, ','.join(project_ids).encode(), self.ttl)
+        return project_ids
+
+    def response_key(self, route: str, request, scope: str = 'project',
+                     extra_generations: Iterable[str] = ()) -> str:
+        """Build the cache key for a read on behalf of request.user."""
+        user = request.user
+        extra_generations = list(extra_generations)
+        user_generation, *extra = self.backend.get_generations(
+            [self.user_key(user.pk)] + extra_generations
+        )
+        parts = [route, str(user.pk), str(user_generation), *map(str, extra)]
+
+        if scope == 'project':
+            project_ids = self.accessible_project_ids(user, user_generation)
+            requested = request.query_params.get('project')
+            if requested in project_ids:
+                project_ids = [requested]
+            generations = self.backend.get_generations(
+                [self.project_key(pk) for pk in project_ids]
+            )
+            parts.extend(f"{pk}:{gen}" for pk, gen in zip(project_ids, generations))
+
+        parts.extend(f"{name}={value}" for name, value in sorted(request.query_params.lists()))
+        digest = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+        return f"resp:{route}:{digest}"
+
+    # Responses
+
+    def get_response(self, key: str) -> Optional[HttpResponse]:
+        value = self.backend.get(key)
+        if value is None:
+            return None
+        content_type, _, content = value.partition(b'\0')
+        return HttpResponse(content, content_type=content_type.decode())
+
+    def set_response(self, key: str, response):
+        value = response['Content-Type'].encode() + b'\0' + response.content
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            logger.error(f"Error storing cached response: {str(e)}")
+
+    # Statistics
+
+    def record(self, route: str, outcome: str):
+        with self._stats_lock:
+            counters = self._stats.setdefault(route, {'hit': 0, 'miss': 0})
+            counters[outcome] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return per-route hit/miss counters for this process."""
+        with self._stats_lock:
+            return {route: dict(counters) for route, counters in self._stats.items()}
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache, or None if disabled."""
+    global _response_cache
+    if _response_cache is None:
+        backend_name = settings.RESPONSE_CACHE_BACKEND
+        if backend_name == 'none':
+            return None
+        with _response_cache_lock:
+            if _response_cache is None:
+                if backend_name == 'redis':
+                    backend = RedisBackend(settings.RESPONSE_CACHE_REDIS_URL)
+                else:
+                    backend = LocalMemoryBackend()
+                _response_cache = ResponseCache(backend, settings.RESPONSE_CACHE_TTL)
+    return _response_cache
+
+
+def cached_response(route: str, request, handler, scope: str = 'project',
+                    extra_generations: Iterable[str] = (), variant: str = ''):
+    """
+    Serve handler() through the response cache.
+
+    ``scope = 'project'`` keys on the generations of the user's projects,
+    ``scope = 'user'`` on the user's own generation only.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return handler()
+
+    try:
+        key = cache.response_key(
+            f"{route}:{variant}", request, scope=scope, extra_generations=extra_generations
+        )
+        cached = cache.get_response(key)
+    except Exception as e:
+        logger.error(f"Error reading response cache: {str(e)}")
+        return handler()
+
+    if cached is not None:
+        cache.record(route, 'hit')
+        cached['X-Cache'] = 'HIT'
+        return cached
+
+    cache.record(route, 'miss')
+    response = handler()
+    if response.status_code == 200:
+        response.add_post_render_callback(lambda rendered: cache.set_response(key, rendered))
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+class CachedResponseMixin:
+    """ViewSet mixin serving list and retrieve from the response cache."""
+
+    cache_scope = 'project'
+    cache_generations = ()
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(super().retrieve, request, *args, **kwargs)
+
+    def _cached_response(self, handler, request, *args, **kwargs):
+        return cached_response(
+            f"{self.basename}-{self.action}",
+            request,
+            lambda: handler(request, *args, **kwargs),
+            scope=self.cache_scope,
+            extra_generations=self.cache_generations,
+            variant=f"{kwargs.get(self.lookup_field, '')}:{request.accepted_renderer.format}",
+        )
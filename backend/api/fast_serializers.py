@@ -0,0 +1,99 @@
+"""
+Lightweight read path for large list endpoints.
+
+ValuesSerializer compiles a ModelSerializer's read representation into a
+flat list of ``values_list()`` lookups plus per-column converters, so rows are
+built straight from database tuples without instantiating models or walking
+the serializer field machinery. The output matches the ModelSerializer's.
+"""
+from typing import Dict, FrozenSet, Iterable, List, Optional, Type
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .serializers import sparse_fieldset
+
+# Fields whose representation of a values_list() column is the column itself.
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.JSONField,
+)
+
+
+class ValuesSerializer:
+    """Compiled, read-only counterpart of a flat ModelSerializer."""
+
+    _compiled: Dict[tuple, 'ValuesSerializer'] = {}
+
+    def __init__(self, serializer_class: Type[serializers.ModelSerializer],
+                 fields: Optional[FrozenSet[str]] = None):
+        self.names = []
+        self.lookups = []
+        self.converters = []
+
+        for name, field in serializer_class().fields.items():
+            if field.write_only or (fields is not None and name not in fields):
+                continue
+            if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)):
+                raise TypeError(f"{serializer_class.__name__}.{name} cannot be read from values()")
+            if '.' in field.source or field.source == '*':
+                raise TypeError(f"{serializer_class.__name__}.{name} has an unsupported source")
+
+            index = len(self.names)
+            self.names.append(name)
+            self.lookups.append(field.source)
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    self.converters.append((index, field.pk_field.to_representation))
+            elif not isinstance(field, IDENTITY_FIELDS):
+                self.converters.append((index, field.to_representation))
+
+    @classmethod
+    def for_serializer(cls, serializer_class, fields: Optional[Iterable[str]] = None) -> 'ValuesSerializer':
+        """Return the cached compiled serializer for serializer_class and fields."""
+        if fields is not None:
+            # Drop unknown names so arbitrary query strings cannot grow the cache.
+            fields = frozenset(fields).intersection(cls.for_serializer(serializer_class).names)
+        key = (serializer_class, fields)
+        compiled = cls._compiled.get(key)
+        if compiled is None:
+            compiled = cls._compiled[key] = cls(serializer_class, fields)
+        return compiled
+
+    def values(self, queryset):
+        """Project queryset down to the columns this serializer reads."""
+        return queryset.values_list(*self.lookups)
+
+    def to_representation(self, rows) -> List[dict]:
+        """Convert tuples from values() into representation dicts."""
+        names = self.names
+        converters = self.converters
+        data = []
+        for row in rows:
+            if converters:
+                row = list(row)
+                for index, convert in converters:
+                    value = row[index]
+                    if value is not None:
+                        row[index] = convert(value)
+            data.append(dict(zip(names, row)))
+        return data
+
+
+class FastListMixin:
+    """ViewSet mixin serving list() through ValuesSerializer."""
+
+    def list(self, request, *args, **kwargs):
+        selected, _ = sparse_fieldset(request)
+        compiled = ValuesSerializer.for_serializer(self.get_serializer_class(), selected)
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.to_representation(page))
+
+        return Response(compiled.to_representation(queryset))
@@ -0,0 +1,98 @@
+"""
+Benchmark the stock and fast list rendering paths on seeded data.
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import ValuesSerializer
+from api.models import Project, TestResult, PerformanceMetric
+from api.renderers import ORJSONRenderer
+from api.serializers import TestResultSerializer, PerformanceMetricSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare ModelSerializer + JSONRenderer against ValuesSerializer + ORJSONRenderer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        # Seed inside a transaction that is always rolled back.
+        with transaction.atomic():
+            self._seed(rows)
+            for model, serializer_class in (
+                (TestResult, TestResultSerializer),
+                (PerformanceMetric, PerformanceMetricSerializer),
+            ):
+                self._compare(model, serializer_class, repeat)
+            transaction.set_rollback(True)
+
+    def _seed(self, rows):
+        user = User.objects.create(username='benchmark-list-rendering')
+        project = Project.objects.create(name='Benchmark', created_by=user)
+        TestResult.objects.bulk_create([
+            TestResult(
+                project=project,
+                test_suite=f'suite_{i % 10}',
+                test_name=f'test_case_{i}',
+                status=('passed', 'failed', 'skipped')[i % 3],
+                results={'assertions': i % 7, 'output': 'ok   done'},
+                coverage_data={'lines': 120 + i % 30, 'covered': 100 + i % 20},
+                execution_time=i * 0.013,
+                error_message='' if i % 3 else 'AssertionError: expected 1',
+            )
+            for i in range(rows)
+        ])
+        PerformanceMetric.objects.bulk_create([
+            PerformanceMetric(
+                project=project,
+                endpoint=f'/api/resource/{i % 25}/',
+                response_time=12.5 + i % 400,
+                memory_usage=0.25 * (i % 9),
+                cpu_usage=37.5,
+                request_count=1 + i % 5,
+                error_count=i % 11 == 0,
+            )
+            for i in range(rows)
+        ])
+
+    def _compare(self, model, serializer_class, repeat):
+        queryset = model.objects.all()
+        compiled = ValuesSerializer.for_serializer(serializer_class)
+        stock_renderer = JSONRenderer()
+        fast_renderer = ORJSONRenderer()
+
+        def stock():
+            return stock_renderer.render(serializer_class(queryset.all(), many=True).data)
+
+        def fast():
+            return fast_renderer.render(compiled.to_representation(compiled.values(queryset.all())))
+
+        stock_output, fast_output = stock(), fast()
+        if stock_output != fast_output:
+            raise CommandError(f'{model.__name__}: fast path output differs from stock output')
+
+        stock_time = self._time(stock, repeat)
+        fast_time = self._time(fast, repeat)
+        self.stdout.write(
+            f'{model.__name__:<18} stock {stock_time * 1000:8.2f} ms  '
+            f'fast {fast_time * 1000:8.2f} ms  '
+            f'speedup {stock_time / fast_time:5.1f}x  ({len(fast_output)} bytes)'
+        )
+
+    @staticmethod
+    def _time(func, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
@@ -4,9 +4,46 @@ Core API models for FSIDE Pro.
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.db.models.functions import Coalesce
 import uuid
 
 
+def _count_subquery(queryset, field):
+    """Correlated COUNT(*) of queryset rows whose ``field`` is the outer pk."""
+    return Coalesce(
+        models.Subquery(
+            queryset.filter(**{field: models.OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=models.Count('*'))
+            .values('count')[:1],
+            output_field=models.IntegerField(),
+        ),
+        0,
+    )
+
+
+class ProjectQuerySet(models.QuerySet):
+    """Query helpers for projects."""
+    
+    def accessible_to(self, user):
+        """Projects the user created or is a team member of."""
+        return self.filter(
+            models.Q(created_by=user) | models.Q(team_members=user)
+        ).distinct()
+    
+    def with_counters(self):
+        """Annotate file_count and team_member_count in the same query."""
+        return self.annotate(
+            file_count=_count_subquery(
+                FileChange.objects.filter(change_type__in=['create', 'update']), 'project'
+            ),
+            team_member_count=_count_subquery(
+                Project.team_members.through.objects.all(), 'project'
+            ),
+        )
+
+
 class Project(models.Model):
     """Project model for storing user projects."""
     
@@ -29,6 +66,8 @@ class Project(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     
+    objects = ProjectQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-updated_at']
     
@@ -121,7 +160,11 @@ class PerformanceMetric(models.Model):
     """Store performance metrics for projects."""
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='performance_metrics')
+    # Rows without a project are the backend's own metrics (see api.monitoring).
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name='performance_metrics',
+        null=True, blank=True
+    )
     endpoint = models.CharField(max_length=200)
     response_time = models.FloatField()
     memory_usage = models.FloatField()
@@ -0,0 +1,271 @@
+"""
+Self-monitoring for the HTTP and WebSocket stacks.
+
+Requests are sampled, measured (wall time, CPU time, RSS delta) and aggregated
+in-process per route template. A background thread flushes the aggregates to
+PerformanceMetric in batches so the request path never touches the database.
+"""
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_statm = {'pid': None, 'fd': None}
+
+
+def current_rss() -> int:
+    """Return the resident set size of this process in bytes (0 if unknown)."""
+    pid = os.getpid()
+    if _statm['pid'] != pid:
+        # /proc/self is resolved at open time, so reopen after a fork.
+        try:
+            _statm['fd'] = os.open('/proc/self/statm', os.O_RDONLY)
+        except OSError:
+            _statm['fd'] = None
+        _statm['pid'] = pid
+
+    fd = _statm['fd']
+    if fd is None:
+        return 0
+    try:
+        return int(os.pread(fd, 128, 0).split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def is_sampled() -> bool:
+    """Decide whether the current request should be measured."""
+    if not settings.PERFORMANCE_MONITORING_ENABLED:
+        return False
+    rate = settings.PERFORMANCE_SAMPLE_RATE
+    return rate >= 1.0 or random.random() < rate
+
+
+class Sample:
+    """Start stamps for one measured unit of work."""
+
+    __slots__ = ('wall', 'cpu', 'rss')
+
+    def __init__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        self.rss = current_rss()
+
+
+class MetricsAggregator:
+    """Aggregate samples per (route, project) and flush them periodically."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, Optional[str]], list] = {}
+        self._flusher = None
+        self._wake = threading.Event()
+
+    def record(self, sample: Sample, route: str, project_id: Optional[str] = None, error: bool = False):
+        """Close a sample and fold it into the bucket for its route."""
+        wall = time.perf_counter() - sample.wall
+        cpu = time.thread_time() - sample.cpu
+        rss_delta = current_rss() - sample.rss
+        key = (route, project_id)
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # [count, errors, wall seconds, cpu seconds, rss delta bytes]
+                bucket = self._buckets[key] = [0, 0, 0.0, 0.0, 0]
+            bucket[0] += 1
+            bucket[1] += error
+            bucket[2] += wall
+            bucket[3] += cpu
+            bucket[4] += rss_delta
+
+        if self._flusher is None or not self._flusher.is_alive():
+            self._start_flusher()
+
+    def drain(self) -> Dict[Tuple[str, Optional[str]], list]:
+        """Swap out the current buckets and return them."""
+        with self._lock:
+            buckets, self._buckets = self._buckets, {}
+        return buckets
+
+    def flush(self):
+        """Write all pending aggregates to PerformanceMetric."""
+        buckets = self.drain()
+        if not buckets:
+            return
+
+        from .models import Project, PerformanceMetric
+
+        close_old_connections()
+        try:
+            project_ids = {project_id for _, project_id in buckets if project_id}
+            known_projects = set()
+            if project_ids:
+                known_projects = {
+                    str(pk) for pk in
+                    Project.objects.filter(id__in=project_ids).values_list('id', flat=True)
+                }
+
+            scale = 1.0 / max(settings.PERFORMANCE_SAMPLE_RATE, 1e-6)
+            rows = []
+            for (route, project_id), (count, errors, wall, cpu, rss_delta) in buckets.items():
+                rows.append(PerformanceMetric(
+                    project_id=project_id if project_id in known_projects else None,
+                    endpoint=route[:200],
+                    response_time=wall / count * 1000,
+                    memory_usage=rss_delta / count / (1024 * 1024),
+                    cpu_usage=(cpu / wall * 100) if wall else 0.0,
+                    request_count=max(1, round(count * scale)),
+                    error_count=round(errors * scale),
+                ))
+
+            PerformanceMetric.objects.bulk_create(rows, batch_size=500)
+        except Exception as e:
+            logger.error(f"Error flushing performance metrics: {str(e)}")
+        finally:
+            close_old_connections()
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(
+                target=self._run, name='performance-metrics-flusher', daemon=True
+            )
+            self._flusher.start()
+
+    def _run(self):
+        interval = settings.PERFORMANCE_FLUSH_INTERVAL
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            self.flush()
+
+
+aggregator = MetricsAggregator()
+atexit.register(aggregator.flush)
+
+
+def _as_project_id(value) -> Optional[str]:
+    if not value:
+        return None
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+class PerformanceMonitoringMiddleware:
+    """
+    Django middleware that samples every HTTP request.
+
+    It is async-capable so async views keep a fully async stack under ASGI;
+    there, CPU time is that of the event loop thread while the request ran.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not is_sampled():
+            return self.get_response(request)
+
+        sample = Sample()
+        response = self.get_response(request)
+        self._record(request, response, sample)
+        return response
+
+    async def __acall__(self, request):
+        if not is_sampled():
+            return await self.get_response(request)
+
+        sample = Sample()
+        response = await self.get_response(request)
+        self._record(request, response, sample)
+        return response
+
+    @staticmethod
+    def _record(request, response, sample: Sample):
+        match = request.resolver_match
+        if match is not None:
+            route = match.route or match.view_name or '<unnamed>'
+            project_id = match.kwargs.get('project_id')
+        else:
+            route, project_id = '<unmatched>', None
+        if project_id is None:
+            project_id = request.GET.get('project') or request.GET.get('project_id')
+
+        aggregator.record(
+            sample,
+            f"{request.method} {route}",
+            _as_project_id(project_id),
+            error=response.status_code >= 500,
+        )
+
+
+class WebSocketMonitoringMiddleware:
+    """
+    ASGI middleware that samples inbound WebSocket messages.
+
+    A message is measured from the moment it is handed to the consumer until
+    the consumer asks for the next one. CPU time is that of the event loop
+    thread over the same span.
+    """
+
+    def __init__(self, inner, routes):
+        self.inner = inner
+        self.routes = routes
+
+    def _resolve(self, path: str) -> Tuple[str, Optional[str]]:
+        path = path.lstrip('/')
+        for route in self.routes:
+            match = route.pattern.regex.search(path)
+            if match:
+                return str(route.pattern), match.groupdict().get('project_id')
+        return '<unmatched>', None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'websocket' or not is_sampled():
+            return await self.inner(scope, receive, send)
+
+        route, project_id = self._resolve(scope['path'])
+        route = f"WS {route}"
+        project_id = _as_project_id(project_id)
+        pending = None
+
+        async def monitored_receive():
+            nonlocal pending
+            if pending is not None:
+                aggregator.record(pending, route, project_id)
+                pending = None
+            message = await receive()
+            if message['type'] == 'websocket.receive':
+                pending = Sample()
+            return message
+
+        try:
+            return await self.inner(scope, monitored_receive, send)
+        except Exception:
+            if pending is not None:
+                aggregator.record(pending, route, project_id, error=True)
+                pending = None
+            raise
@@ -0,0 +1,54 @@
+"""
+Renderers for the REST API.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson when it is installed.
+
+    Produces the same compact, non-ASCII-escaped output as the stock renderer,
+    including the U+2028/U+2029 escaping. Datetimes are handed to DRF's
+    encoder so they keep its format (milliseconds, ``Z`` for UTC), and
+    non-str dict keys are stringified as the json module does. Falls back to
+    the stock renderer for indented (browsable) output or when orjson is
+    unavailable.
+    """
+
+    _encoder = JSONEncoder()
+    _options = 0 if orjson is None else orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=self._encoder.default, option=self._options)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Renderer advertising ``text/event-stream`` for streaming endpoints.
+
+    Streaming views return a StreamingHttpResponse directly; this renderer
+    only handles plain Responses (such as validation errors) sent to clients
+    that accept event streams, emitting them as a single event.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b'data: ' + ORJSONRenderer().render(data) + b'\n\n'
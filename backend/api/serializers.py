@@ -1,11 +1,65 @@
 """
 Serializers for API models.
 """
+from typing import Optional, Set, Tuple
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from django.contrib.auth.models import User
 from .models import Project, FileChange, APIMapping, TestResult, PerformanceMetric, UserPreferences
 
 
+def _split_param(value: Optional[str]) -> Set[str]:
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def sparse_fieldset(request) -> Tuple[Optional[Set[str]], Set[str]]:
+    """
+    Parse ``?fields=`` and ``?expand=`` from a read request.
+
+    Returns (fields, expand); fields is None when no selection was requested.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    fields = request.query_params.get('fields')
+    return (_split_param(fields) if fields is not None else None,
+            _split_param(request.query_params.get('expand')))
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin honouring ``?fields=`` and ``?expand=`` on reads.
+
+    Without ``fields`` the representation is unchanged. With it, only the
+    listed fields are returned, and nested relations in ``expandable_fields``
+    collapse to primary keys unless they are also named in ``expand``.
+    """
+
+    expandable_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_top_level():
+            return fields
+
+        selected, expand = sparse_fieldset(self.context.get('request'))
+        if selected is None:
+            return fields
+
+        for name in list(fields):
+            if name not in selected:
+                del fields[name]
+            elif name in self.expandable_fields and name not in expand:
+                many = isinstance(fields[name], serializers.ListSerializer)
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many)
+        return fields
+
+    def _is_top_level(self):
+        parent = self.parent
+        return parent is None or (
+            isinstance(parent, serializers.ListSerializer) and parent.parent is None
+        )
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User model."""
     
@@ -15,12 +69,13 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'date_joined']
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Project model."""
     
     created_by = UserSerializer(read_only=True)
     team_members = UserSerializer(many=True, read_only=True)
     file_count = serializers.SerializerMethodField()
+    expandable_fields = ('created_by', 'team_members')
     
     class Meta:
         model = Project
@@ -32,13 +87,17 @@ class ProjectSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_file_count(self, obj):
+        if hasattr(obj, 'file_count'):
+            # Annotated by ProjectQuerySet.with_counters().
+            return obj.file_count
         return obj.file_changes.filter(change_type__in=['create', 'update']).count()
 
 
-class FileChangeSerializer(serializers.ModelSerializer):
+class FileChangeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for FileChange model."""
     
     author = UserSerializer(read_only=True)
+    expandable_fields = ('author',)
     
     class Meta:
         model = FileChange
@@ -49,7 +108,7 @@ class FileChangeSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'timestamp']
 
 
-class APIMappingSerializer(serializers.ModelSerializer):
+class APIMappingSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for APIMapping model."""
     
     class Meta:
@@ -62,7 +121,7 @@ class APIMappingSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class TestResultSerializer(serializers.ModelSerializer):
+class TestResultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for TestResult model."""
     
     class Meta:
@@ -75,7 +134,7 @@ class TestResultSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class PerformanceMetricSerializer(serializers.ModelSerializer):
+class PerformanceMetricSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for PerformanceMetric model."""
     
     class Meta:
@@ -87,7 +146,7 @@ class PerformanceMetricSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'timestamp']
 
 
-class UserPreferencesSerializer(serializers.ModelSerializer):
+class UserPreferencesSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for UserPreferences model."""
     
     class Meta:
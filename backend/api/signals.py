@@ -0,0 +1,75 @@
+"""
+Signal handlers bumping response cache generations.
+"""
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from .cache import get_response_cache
+from .models import Project, FileChange, APIMapping, TestResult, UserPreferences
+
+
+def _bump_projects(*project_ids):
+    cache = get_response_cache()
+    if cache is not None:
+        cache.bump_projects(project_ids)
+
+
+def _bump_users(*user_ids):
+    cache = get_response_cache()
+    if cache is not None:
+        cache.bump_users(user_ids)
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, **kwargs):
+    _bump_projects(instance.pk)
+    if created:
+        # The owner's access set just grew.
+        _bump_users(instance.created_by_id)
+
+
+@receiver(pre_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    # Membership rows are removed by cascade without m2m_changed, so collect
+    # the members while they still exist.
+    member_ids = list(instance.team_members.values_list('id', flat=True))
+    _bump_projects(instance.pk)
+    _bump_users(instance.created_by_id, *member_ids)
+
+
+@receiver(m2m_changed, sender=Project.team_members.through)
+def team_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # pk_set is None for clears, so capture the affected side up front.
+        if reverse:
+            instance._cleared_project_ids = list(instance.shared_projects.values_list('id', flat=True))
+        else:
+            instance._cleared_user_ids = list(instance.team_members.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # instance is a User, pk_set holds project ids.
+        project_ids = pk_set if pk_set is not None else getattr(instance, '_cleared_project_ids', [])
+        _bump_projects(*project_ids)
+        _bump_users(instance.pk)
+    else:
+        user_ids = pk_set if pk_set is not None else getattr(instance, '_cleared_user_ids', [])
+        _bump_projects(instance.pk)
+        _bump_users(*user_ids)
+
+
+@receiver(post_save, sender=FileChange)
+@receiver(post_delete, sender=FileChange)
+@receiver(post_save, sender=APIMapping)
+@receiver(post_delete, sender=APIMapping)
+@receiver(post_save, sender=TestResult)
+@receiver(post_delete, sender=TestResult)
+def project_child_changed(sender, instance, **kwargs):
+    _bump_projects(instance.project_id)
+
+
+@receiver(post_save, sender=UserPreferences)
+@receiver(post_delete, sender=UserPreferences)
+def preferences_changed(sender, instance, **kwargs):
+    _bump_users(instance.user_id)
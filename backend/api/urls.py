@@ -5,7 +5,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ProjectViewSet, FileChangeViewSet, APIMappingViewSet,
-    TestResultViewSet, PerformanceMetricViewSet, UserPreferencesViewSet
+    TestResultViewSet, PerformanceMetricViewSet, UserPreferencesViewSet,
+    workspace_bootstrap
 )
 
 router = DefaultRouter()
@@ -18,5 +19,6 @@ router.register(r'user-preferences', UserPreferencesViewSet, basename='userprefe
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('workspace/bootstrap/', workspace_bootstrap, name='workspace_bootstrap'),
     path('auth/', include('rest_framework.urls')),
 ]
@@ -1,30 +1,88 @@
 """
 API views for FSIDE Pro.
 """
-from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import action
+from rest_framework import viewsets, status, permissions, serializers
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from .models import Project, FileChange, APIMapping, TestResult, PerformanceMetric, UserPreferences
 from .serializers import (
     ProjectSerializer, FileChangeSerializer, APIMappingSerializer,
     TestResultSerializer, PerformanceMetricSerializer, UserPreferencesSerializer,
-    UserSerializer
+    UserSerializer, sparse_fieldset
 )
+from ai_engine.models import AIModel
+from ai_engine.serializers import AIModelSerializer
+from collaboration.models import CollaborationSession
+from .cache import CachedResponseMixin, cached_response, get_response_cache
+from .fast_serializers import FastListMixin
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class SparseFieldsetMixin:
+    """
+    Push the serializer's selected fields down to the SQL query on reads.
+
+    Selected columns go through ``.only()``, nested relations are joined or
+    prefetched, and relations that are not part of the output are left alone.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+
+        selected, _ = sparse_fieldset(self.request)
+        model = queryset.model
+        only, select_related, prefetch_related = [model._meta.pk.name], [], []
+
+        for field in self.get_serializer().fields.values():
+            source = field.source
+            if source == '*' or '.' in source:
+                continue
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                continue
+
+            if model_field.many_to_many or model_field.one_to_many:
+                if isinstance(field, serializers.ManyRelatedField):
+                    # Only primary keys are rendered, so skip the related rows.
+                    related = model_field.related_model
+                    prefetch_related.append(Prefetch(source, queryset=related.objects.only(related._meta.pk.name)))
+                else:
+                    prefetch_related.append(source)
+            else:
+                only.append(source)
+                if isinstance(field, serializers.BaseSerializer):
+                    select_related.append(source)
+
+        if selected is not None:
+            queryset = queryset.only(*only)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
+class ProjectViewSet(CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for Project model."""
     
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Project.objects.filter(
-            models.Q(created_by=self.request.user) |
-            models.Q(team_members=self.request.user)
-        ).distinct()
+        queryset = Project.objects.accessible_to(self.request.user)
+        
+        selected, _ = sparse_fieldset(self.request)
+        if selected is None or 'file_count' in selected:
+            queryset = queryset.with_counters()
+        
+        return queryset
     
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -77,7 +135,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
             )
 
 
-class FileChangeViewSet(viewsets.ModelViewSet):
+class FileChangeViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for FileChange model."""
     
     serializer_class = FileChangeSerializer
@@ -102,7 +160,7 @@ class FileChangeViewSet(viewsets.ModelViewSet):
         serializer.save(author=self.request.user)
 
 
-class APIMappingViewSet(viewsets.ModelViewSet):
+class APIMappingViewSet(CachedResponseMixin, FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for APIMapping model."""
     
     serializer_class = APIMappingSerializer
@@ -216,7 +274,7 @@ class APIMappingViewSet(viewsets.ModelViewSet):
         })
 
 
-class TestResultViewSet(viewsets.ModelViewSet):
+class TestResultViewSet(CachedResponseMixin, FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for TestResult model."""
     
     serializer_class = TestResultSerializer
@@ -238,7 +296,7 @@ class TestResultViewSet(viewsets.ModelViewSet):
         return queryset.filter(project_id__in=user_projects)
 
 
-class PerformanceMetricViewSet(viewsets.ModelViewSet):
+class PerformanceMetricViewSet(FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for PerformanceMetric model."""
     
     serializer_class = PerformanceMetricSerializer
@@ -304,14 +362,83 @@ class PerformanceMetricViewSet(viewsets.ModelViewSet):
         })
 
 
-class UserPreferencesViewSet(viewsets.ModelViewSet):
+class UserPreferencesViewSet(CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for UserPreferences model."""
     
     serializer_class = UserPreferencesSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_scope = 'user'
     
     def get_queryset(self):
         return UserPreferences.objects.filter(user=self.request.user)
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def workspace_bootstrap(request):
+    """
+    Everything the IDE needs at startup in one response.
+    
+    Runs a fixed number of queries regardless of how many projects or
+    sessions the user has, and is cached per user until one of the
+    underlying rows changes.
+    """
+    cache = get_response_cache()
+    generations = [cache.global_key('ai_models')] if cache is not None else []
+    
+    return cached_response(
+        'workspace-bootstrap',
+        request,
+        lambda: Response(_bootstrap_payload(request.user)),
+        extra_generations=generations,
+    )
+
+
+def _bootstrap_payload(user):
+    preferences = UserPreferences.objects.filter(user=user).first()
+    
+    projects = list(
+        Project.objects.accessible_to(user)
+        .with_counters()
+        .select_related('created_by')
+        .prefetch_related('team_members')
+    )
+    
+    sessions = (
+        CollaborationSession.objects.filter(participants=user, is_active=True)
+        .select_related('project')
+        .prefetch_related(
+            Prefetch('participants', queryset=User.objects.only('id', 'username'))
+        )
+    )
+    
+    ai_models = AIModel.objects.filter(is_active=True)
+    
+    return {
+        'user': UserSerializer(user).data,
+        'preferences': UserPreferencesSerializer(preferences).data if preferences else None,
+        'projects': [
+            dict(data, team_member_count=project.team_member_count)
+            for project, data in zip(projects, ProjectSerializer(projects, many=True).data)
+        ],
+        'collaboration_sessions': [
+            {
+                'id': session.id,
+                'project': {
+                    'id': session.project.id,
+                    'name': session.project.name
+                },
+                'participants': [
+                    {'username': participant.username, 'id': participant.id}
+                    for participant in session.participants.all()
+                ],
+                'active_file': session.active_file,
+                'created_at': session.created_at
+            }
+            for session in sessions
+        ],
+        'ai_models': AIModelSerializer(ai_models, many=True).data,
+    }
@@ -0,0 +1,14 @@
+"""
+App configuration for real-time collaboration.
+"""
+from django.apps import AppConfig
+
+
+class CollaborationConfig(AppConfig):
+    """Collaboration app."""
+
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'collaboration'
+
+    def ready(self):
+        from . import signals  # noqa: F401
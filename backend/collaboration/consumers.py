@@ -1,13 +1,29 @@
 """
 WebSocket consumers for real-time collaboration.
 """
+import asyncio
 import json
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from api.models import Project
+from ai_engine.metrics import Counter
+from ai_engine.reuse import afind_reusable
+from ai_engine.services import get_huggingface_service
+from ai_engine.tasks import job_group_name
 from .models import CollaborationSession, RealtimeEdit
 
+logger = logging.getLogger(__name__)
+
+suggestion_requests = Counter(
+    'ai_suggestion_requests_total',
+    'Live suggestion requests by outcome (completed, superseded, cancelled, disconnected).',
+    ('outcome',),
+)
+
 
 class CollaborationConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for real-time collaboration."""
@@ -167,11 +183,25 @@ class CollaborationConsumer(AsyncWebsocketConsumer):
 
 
 class AISuggestionsConsumer(AsyncWebsocketConsumer):
-    """WebSocket consumer for live AI suggestions."""
+    """
+    WebSocket consumer for live AI suggestions.
+    
+    Requests are debounced and at most one is in flight per file: a newer
+    request for the same file supersedes (cancels) the older one, as does an
+    explicit ``cancel`` message.
+    """
     
     async def connect(self):
+        # Suggestions cost upstream inference; anonymous sockets get none.
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        
         self.session_id = self.scope['url_route']['kwargs']['session_id']
         self.room_group_name = f'ai_suggestions_{self.session_id}'
+        # file_path -> (request_id, task) for the request currently in flight
+        self.pending_requests = {}
         
         # Join room group
         await self.channel_layer.group_add(
@@ -182,6 +212,12 @@ class AISuggestionsConsumer(AsyncWebsocketConsumer):
         await self.accept()
     
     async def disconnect(self, close_code):
+        if not hasattr(self, 'room_group_name'):
+            return
+        
+        for _, task in list(self.pending_requests.values()):
+            self.cancel_task(task, 'disconnected')
+        
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -193,29 +229,169 @@ class AISuggestionsConsumer(AsyncWebsocketConsumer):
         message_type = data.get('type')
         
         if message_type == 'request_suggestions':
-            await self.handle_suggestion_request(data)
+            self.schedule_suggestion_request(data)
+        elif message_type == 'cancel':
+            self.cancel_suggestion_request(data)
+    
+    def schedule_suggestion_request(self, data):
+        """Start a request in the background, superseding the file's previous one."""
+        file_path = data.get('file_path', '')
+        previous = self.pending_requests.pop(file_path, None)
+        if previous is not None:
+            self.cancel_task(previous[1], 'superseded')
+        
+        task = asyncio.ensure_future(self.debounced_suggestion_request(data))
+        task.outcome = 'completed'
+        self.pending_requests[file_path] = (data.get('request_id'), task)
+        task.add_done_callback(lambda done: self.suggestion_request_done(file_path, done))
+    
+    def cancel_suggestion_request(self, data):
+        """Cancel by request_id, or everything pending for file_path."""
+        request_id = data.get('request_id')
+        for file_path, (pending_id, task) in list(self.pending_requests.items()):
+            if request_id is not None and pending_id != request_id:
+                continue
+            if request_id is None and file_path != data.get('file_path', ''):
+                continue
+            del self.pending_requests[file_path]
+            self.cancel_task(task, 'cancelled')
+    
+    @staticmethod
+    def cancel_task(task, outcome):
+        # Cancellation reaches the upstream HTTP call or local generation
+        # unless another caller is sharing it (see AsyncSingleFlight).
+        if not task.done():
+            task.outcome = outcome
+            task.cancel()
+    
+    def suggestion_request_done(self, file_path, task):
+        pending = self.pending_requests.get(file_path)
+        if pending is not None and pending[1] is task:
+            del self.pending_requests[file_path]
+        suggestion_requests.inc(outcome=task.outcome)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error handling suggestion request: {str(task.exception())}")
+    
+    async def debounced_suggestion_request(self, data):
+        # Requests superseded during the debounce window never reach the model.
+        await asyncio.sleep(settings.AI_SUGGESTION_DEBOUNCE_MS / 1000)
+        await self.handle_suggestion_request(data)
     
     async def handle_suggestion_request(self, data):
         """Handle AI suggestion requests."""
-        # Mock AI suggestions - in production, integrate with AI service
-        suggestions = [
-            {
+        context = data.get('context', '')
+        suggestions = []
+        usage = None
+        
+        # A near-identical context the project already accepted needs no model call.
+        reused = None
+        project = await self.get_accessible_project(data.get('project_id')) if context else None
+        if project is not None:
+            reused = await afind_reusable(
+                self.scope['user'], project.id, context, cursor_line=self.cursor_line(data)
+            )
+        if reused is not None:
+            suggestions.append({
                 'type': 'completion',
-                'text': 'const [state, setState] = useState()',
-                'confidence': 0.9,
-                'position': data.get('position', {})
-            },
-            {
-                'type': 'suggestion',
-                'text': 'Add error handling',
-                'confidence': 0.8,
-                'description': 'Consider adding try-catch block'
-            }
-        ]
+                'text': reused.suggestion,
+                'confidence': reused.confidence_score,
+                'position': data.get('position', {}),
+                'source': 'reuse',
+                'suggestion_id': str(reused.id)
+            })
+        elif context:
+            service = get_huggingface_service()
+            model_name = await service.router.amodel_name('code_completion')
+            prompt = await service.aprepare_prompt(context, model_name, 'complete', self.cursor_line(data))
+            usage = prompt.usage()
+            if data.get('stream'):
+                completion = await self.stream_completion(prompt, model_name, data)
+            else:
+                # Collaborators asking for the same completion at the same time
+                # share one upstream call (see HuggingFaceService).
+                completion = await service.acomplete_code(
+                    prompt, model_name, scope=self.completion_scope(data)
+                )
+            if completion:
+                suggestions.append({
+                    'type': 'completion',
+                    'text': completion,
+                    'confidence': 0.9,
+                    'position': data.get('position', {})
+                })
         
         # Send suggestions back
         await self.send(text_data=json.dumps({
             'type': 'ai_suggestions',
             'suggestions': suggestions,
-            'context': data.get('context', '')
+            'context': context,
+            'usage': usage,
+            'request_id': data.get('request_id')
+        }))
+    
+    @database_sync_to_async
+    def get_accessible_project(self, project_id):
+        """The project with project_id if the socket's user can access it, else None."""
+        if not project_id:
+            return None
+        try:
+            return Project.objects.accessible_to(self.scope['user']).filter(id=project_id).first()
+        except ValidationError:
+            return None
+    
+    def completion_scope(self, data):
+        """Identify the editor a request comes from, for prefix reuse."""
+        return f"{self.session_id}:{data.get('file_path', '')}"
+    
+    @staticmethod
+    def cursor_line(data):
+        """The 0-based context line of the cursor (position.line is 1-based), if sent."""
+        position = data.get('position') or {}
+        try:
+            return max(0, int(position['line']) - 1)
+        except (KeyError, TypeError, ValueError):
+            return None
+    
+    async def stream_completion(self, prompt, model_name, data):
+        """Forward completion tokens as ai_suggestion_delta frames as they arrive."""
+        service = get_huggingface_service()
+        chunks = []
+        try:
+            async for delta in service.astream_code(
+                prompt, model_name, service.COMPLETION_PARAMETERS, scope=self.completion_scope(data)
+            ):
+                chunks.append(delta)
+                await self.send(text_data=json.dumps({
+                    'type': 'ai_suggestion_delta',
+                    'delta': delta,
+                    'request_id': data.get('request_id'),
+                    'position': data.get('position', {})
+                }))
+        except Exception as e:
+            logger.error(f"Error streaming completion: {str(e)}")
+        
+        return ''.join(chunks).strip()
+
+
+class GenerationJobConsumer(AsyncWebsocketConsumer):
+    """Pushes the signed-in user's background generation job updates."""
+    
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        
+        self.group_name = job_group_name(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+    
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+    
+    async def job_update(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'job_update',
+            'job': event['job']
         }))
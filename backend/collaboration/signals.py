@@ -0,0 +1,39 @@
+"""
+Signal handlers bumping response cache generations for session changes.
+"""
+from django.db.models.signals import post_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+from api.cache import get_response_cache
+from .models import CollaborationSession
+
+
+def _bump_participants(session, *extra_user_ids):
+    cache = get_response_cache()
+    if cache is None:
+        return
+    participant_ids = list(session.participants.values_list('id', flat=True))
+    cache.bump_users([*participant_ids, *extra_user_ids])
+
+
+@receiver(post_save, sender=CollaborationSession)
+@receiver(pre_delete, sender=CollaborationSession)
+def session_changed(sender, instance, **kwargs):
+    _bump_participants(instance)
+
+
+@receiver(m2m_changed, sender=CollaborationSession.participants.through)
+def participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse:
+        _bump_participants(instance, *(pk_set or ()))
+        return
+
+    # instance is a User joining or leaving sessions.
+    if pk_set is not None:
+        sessions = CollaborationSession.objects.filter(pk__in=pk_set)
+    else:
+        sessions = instance.collaboration_sessions.all()
+    for session in sessions:
+        _bump_participants(session, instance.pk)
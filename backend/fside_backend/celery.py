@@ -0,0 +1,16 @@
+"""
+Celery application for FSIDE Pro background jobs.
+
+Start workers per queue so bulk generation cannot starve completions:
+    celery -A fside_backend worker -Q interactive
+    celery -A fside_backend worker -Q bulk
+"""
+
+import os
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fside_backend.settings')
+
+app = Celery('fside_backend')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
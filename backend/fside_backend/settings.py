@@ -47,6 +47,7 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'api.monitoring.PerformanceMonitoringMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -139,7 +140,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
@@ -166,7 +167,17 @@ CHANNEL_LAYERS = {
 
 # AI Integration settings
 HUGGINGFACE_API_TOKEN = os.getenv('HUGGINGFACE_API_TOKEN')
-HUGGINGFACE_API_URL = 'https://api-inference.huggingface.co/models'
+HUGGINGFACE_API_URL = os.getenv('HUGGINGFACE_API_URL', 'https://api-inference.huggingface.co/models')
+
+# Pooled inference client (ai_engine.clients)
+HUGGINGFACE_POOL_CONNECTIONS = int(os.getenv('HUGGINGFACE_POOL_CONNECTIONS', '4'))
+HUGGINGFACE_POOL_MAXSIZE = int(os.getenv('HUGGINGFACE_POOL_MAXSIZE', '32'))
+HUGGINGFACE_CONNECT_TIMEOUT = float(os.getenv('HUGGINGFACE_CONNECT_TIMEOUT', '3.05'))
+HUGGINGFACE_READ_TIMEOUT = float(os.getenv('HUGGINGFACE_READ_TIMEOUT', '30'))
+HUGGINGFACE_MAX_RETRIES = int(os.getenv('HUGGINGFACE_MAX_RETRIES', '2'))
+HUGGINGFACE_RETRY_BACKOFF = float(os.getenv('HUGGINGFACE_RETRY_BACKOFF', '0.25'))
+# The async client serves every in-flight generation of an ASGI process.
+HUGGINGFACE_ASYNC_MAX_CONNECTIONS = int(os.getenv('HUGGINGFACE_ASYNC_MAX_CONNECTIONS', '512'))
 
 # AI Models configuration
 AI_MODELS = {
@@ -176,6 +187,119 @@ AI_MODELS = {
     'text_generation': 'microsoft/DialoGPT-medium',
 }
 
+# Prompt fingerprint cache (ai_engine.cache). Calls sampled above
+# AI_CACHE_MAX_TEMPERATURE are never cached.
+AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', 'True').lower() == 'true'
+AI_CACHE_REDIS_URL = os.getenv('AI_CACHE_REDIS_URL', f"redis://{os.getenv('REDIS_HOST', 'localhost')}:6379/2")
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', '3600'))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '2048'))
+AI_CACHE_MAX_BYTES = int(os.getenv('AI_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+AI_CACHE_MAX_TEMPERATURE = float(os.getenv('AI_CACHE_MAX_TEMPERATURE', '0.3'))
+
+# Completion micro-batching (ai_engine.batching)
+AI_BATCH_ENABLED = os.getenv('AI_BATCH_ENABLED', 'True').lower() == 'true'
+AI_BATCH_MAX_SIZE = int(os.getenv('AI_BATCH_MAX_SIZE', '8'))
+AI_BATCH_MAX_WAIT_MS = float(os.getenv('AI_BATCH_MAX_WAIT_MS', '5'))
+AI_BATCH_MAX_CONCURRENCY = int(os.getenv('AI_BATCH_MAX_CONCURRENCY', '8'))
+
+# Upstream protection (ai_engine.resilience). Read timeouts adapt to
+# AI_TIMEOUT_MULTIPLIER x observed p99 latency, capped at
+# HUGGINGFACE_READ_TIMEOUT. A model that fails falls back to
+# AIModel.configuration["fallback"] or the entry here, which may be a local model.
+AI_BREAKER_FAILURE_THRESHOLD = int(os.getenv('AI_BREAKER_FAILURE_THRESHOLD', '5'))
+AI_BREAKER_RESET_TIMEOUT = float(os.getenv('AI_BREAKER_RESET_TIMEOUT', '30'))
+AI_TIMEOUT_MULTIPLIER = float(os.getenv('AI_TIMEOUT_MULTIPLIER', '3'))
+AI_TIMEOUT_MIN = float(os.getenv('AI_TIMEOUT_MIN', '2'))
+AI_HEDGE_ENABLED = os.getenv('AI_HEDGE_ENABLED', 'False').lower() == 'true'
+AI_FALLBACK_MODELS = {}
+
+# Model routing (ai_engine.router). Among the active AIModels of a type, the
+# highest configuration["priority"] whose EWMA latency meets the type's SLO
+# wins; each process merges its stats into AIModel.performance_metrics every
+# AI_ROUTER_PERSIST_INTERVAL seconds.
+AI_LATENCY_SLO_MS = {
+    'code_completion': 500,
+    'code_generation': 10000,
+    'code_analysis': 2000,
+    'text_generation': 5000,
+}
+AI_ROUTER_PERSIST_INTERVAL = int(os.getenv('AI_ROUTER_PERSIST_INTERVAL', '60'))
+
+# Local CPU inference (ai_engine.backends). An AIModel runs locally when its
+# configuration has "backend": "local"; AI_LOCAL_NUM_THREADS=0 splits the
+# cores evenly between workers.
+AI_LOCAL_WORKERS = int(os.getenv('AI_LOCAL_WORKERS', '1'))
+AI_LOCAL_NUM_THREADS = int(os.getenv('AI_LOCAL_NUM_THREADS', '0'))
+AI_LOCAL_QUANTIZE = os.getenv('AI_LOCAL_QUANTIZE', 'False').lower() == 'true'
+AI_LOCAL_PRELOAD = os.getenv('AI_LOCAL_PRELOAD', 'False').lower() == 'true'
+AI_LOCAL_TIMEOUT = float(os.getenv('AI_LOCAL_TIMEOUT', '60'))
+
+# Key/value state reuse between consecutive local completions (ai_engine.prefix_cache)
+AI_PREFIX_CACHE_ENABLED = os.getenv('AI_PREFIX_CACHE_ENABLED', 'True').lower() == 'true'
+AI_PREFIX_CACHE_MAX_BYTES = int(os.getenv('AI_PREFIX_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# AI call telemetry (ai_engine.telemetry), scraped from /api/ai/metrics/.
+# When set, scrapers must send AI_METRICS_TOKEN as a bearer token; when
+# empty, only signed-in staff users can read the endpoint.
+AI_METRICS_TOKEN = os.getenv('AI_METRICS_TOKEN', '')
+
+# Prompt token budget (ai_engine.context), unless AIModel.configuration sets
+# max_input_tokens. Without Hugging Face tokenizers, counts are approximate.
+AI_CONTEXT_MAX_TOKENS = int(os.getenv('AI_CONTEXT_MAX_TOKENS', '1536'))
+AI_CONTEXT_HF_TOKENIZERS = os.getenv('AI_CONTEXT_HF_TOKENIZERS', 'True').lower() == 'true'
+
+# Retrieval of related TrainingData and accepted suggestions (ai_engine.retrieval).
+# Rebuild with `manage.py build_retrieval_index`; --ivf-lists partitions large indexes.
+AI_RETRIEVAL_ENABLED = os.getenv('AI_RETRIEVAL_ENABLED', 'True').lower() == 'true'
+AI_RETRIEVAL_DIR = Path(os.getenv('AI_RETRIEVAL_DIR', str(BASE_DIR / 'retrieval')))
+AI_RETRIEVAL_DIMENSIONS = int(os.getenv('AI_RETRIEVAL_DIMENSIONS', '256'))
+AI_RETRIEVAL_IVF_PROBES = int(os.getenv('AI_RETRIEVAL_IVF_PROBES', '8'))
+AI_RETRIEVAL_EXAMPLES = int(os.getenv('AI_RETRIEVAL_EXAMPLES', '2'))
+AI_RETRIEVAL_MIN_SCORE = float(os.getenv('AI_RETRIEVAL_MIN_SCORE', '0.35'))
+
+# Near-duplicate TrainingData (ai_engine.dedup). Changing the permutations,
+# bands or shingle size invalidates stored signatures: rerun
+# `manage.py dedup_training_data --resign`. 16 bands of 8 rows catch pairs
+# from a Jaccard similarity of about 0.7; AI_DEDUP_THRESHOLD confirms them.
+AI_DEDUP_PERMUTATIONS = int(os.getenv('AI_DEDUP_PERMUTATIONS', '128'))
+AI_DEDUP_BANDS = int(os.getenv('AI_DEDUP_BANDS', '16'))
+AI_DEDUP_SHINGLE_SIZE = int(os.getenv('AI_DEDUP_SHINGLE_SIZE', '5'))
+AI_DEDUP_THRESHOLD = float(os.getenv('AI_DEDUP_THRESHOLD', '0.85'))
+AI_DEDUP_MAX_CANDIDATES = int(os.getenv('AI_DEDUP_MAX_CANDIDATES', '100'))
+
+# Answering completions with a project's accepted suggestions (ai_engine.reuse).
+# Suggestions rated below AI_REUSE_MIN_ACCEPTANCE are never reused.
+AI_REUSE_ENABLED = os.getenv('AI_REUSE_ENABLED', 'True').lower() == 'true'
+AI_REUSE_MIN_SIMILARITY = float(os.getenv('AI_REUSE_MIN_SIMILARITY', '0.92'))
+AI_REUSE_MIN_ACCEPTANCE = float(os.getenv('AI_REUSE_MIN_ACCEPTANCE', '0.3'))
+AI_REUSE_CONTEXT_LINES = int(os.getenv('AI_REUSE_CONTEXT_LINES', '12'))
+AI_REUSE_CANDIDATES = int(os.getenv('AI_REUSE_CANDIDATES', '5'))
+
+# Static code analysis (ai_engine.analysis). Results are cached per process by
+# content hash and rule-set version; disabling rules changes the version.
+AI_ANALYSIS_DISABLED_RULES = [
+    name.strip() for name in os.getenv('AI_ANALYSIS_DISABLED_RULES', '').split(',') if name.strip()
+]
+AI_ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('AI_ANALYSIS_CACHE_MAX_ENTRIES', '2000'))
+AI_ANALYSIS_CACHE_MAX_BYTES = int(os.getenv('AI_ANALYSIS_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+AI_ANALYSIS_CACHE_TTL = int(os.getenv('AI_ANALYSIS_CACHE_TTL', '3600'))
+
+# Live suggestions (collaboration.consumers.AISuggestionsConsumer)
+AI_SUGGESTION_DEBOUNCE_MS = float(os.getenv('AI_SUGGESTION_DEBOUNCE_MS', '75'))
+
+# Self-monitoring (api.monitoring)
+PERFORMANCE_MONITORING_ENABLED = os.getenv('PERFORMANCE_MONITORING_ENABLED', 'True').lower() == 'true'
+PERFORMANCE_SAMPLE_RATE = float(os.getenv('PERFORMANCE_SAMPLE_RATE', '1.0'))
+PERFORMANCE_FLUSH_INTERVAL = int(os.getenv('PERFORMANCE_FLUSH_INTERVAL', '60'))
+
+# Response cache (api.cache). 'locmem' is per process and only safe with a
+# single worker; use 'redis' when running several.
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'locmem' if DEBUG else 'redis')
+RESPONSE_CACHE_REDIS_URL = os.getenv(
+    'RESPONSE_CACHE_REDIS_URL', f"redis://{os.getenv('REDIS_HOST', 'localhost')}:6379/1"
+)
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '300'))
+
 # Celery configuration
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
@@ -183,6 +307,20 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_DEFAULT_QUEUE = 'bulk'
+# Generation tasks are long; don't let one worker reserve a backlog of them.
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Background generation jobs (ai_engine.tasks). Completions go to the
+# interactive queue, everything else to bulk.
+AI_JOB_INTERACTIVE_QUEUE = os.getenv('AI_JOB_INTERACTIVE_QUEUE', 'interactive')
+AI_JOB_BULK_QUEUE = os.getenv('AI_JOB_BULK_QUEUE', 'bulk')
+# Seconds a job may run before it is failed (soft limit), and extra seconds
+# before its worker process is killed. A redelivered message (acks_late)
+# takes over a job left 'running' for longer than both, whose worker died.
+AI_JOB_TIME_LIMIT = int(os.getenv('AI_JOB_TIME_LIMIT', '300'))
+AI_JOB_KILL_GRACE = int(os.getenv('AI_JOB_KILL_GRACE', '30'))
 
 # Spectacular settings for API documentation
 SPECTACULAR_SETTINGS = {